@@ -1,12 +1,21 @@
 import os
-import joblib
+import tempfile
+import time
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-from src.planner import latest_supervised_rows, forecast_table, scenario_table, add_deltas
+from src.artifacts import baseline_forecast, context_rows, load_bundle, load_residuals, model_version, scenario_cache
+from src.budget import allocate_budget
+from src.conformal import residuals_path
+from src.planner import MAX_SWEEP_BYTES, scenario_table, scenario_sweep
+from src.store import default_daily_path
 
-DATA_PATH = "data/processed/ads_daily.parquet"
+rerun_start = time.perf_counter()
+
+DATA_PATH = default_daily_path()
 MODEL_PATH = "artifacts/models/forecaster_clicks.joblib"
+RESIDUALS_PATH = residuals_path("clicks")
 
 st.set_page_config(page_title="Ads Planning Forecaster", layout="wide")
 st.title("Ads Planning Forecaster")
@@ -21,10 +30,12 @@ if not os.path.exists(MODEL_PATH):
     st.error("Missing model. Run: python -m scripts.train_forecaster")
     st.stop()
 
-df = pd.read_parquet(DATA_PATH)
-df["date"] = pd.to_datetime(df["date"])
-
-bundle = joblib.load(MODEL_PATH)
+# Dataset, model and context rows are process-wide cached resources,
+# invalidated when the underlying files change
+t0 = time.perf_counter()
+bundle = load_bundle(MODEL_PATH)
+residuals = load_residuals(RESIDUALS_PATH)
+load_ms = (time.perf_counter() - t0) * 1000
 
 # --- Sidebar controls ---
 with st.sidebar:
@@ -36,10 +47,16 @@ with st.sidebar:
 
     custom_name = st.text_input("Scenario name", "Custom Scenario")
 
+    coverage = st.slider("Interval coverage", 0.5, 0.99, 0.9, 0.01, disabled=residuals is None)
+    if residuals is None:
+        st.caption("Prediction intervals need backtest residuals. Run: python -m scripts.backtest")
+
     run_btn = st.button("Run Forecast", type="primary")
 
 # --- Build base prediction rows (latest day context) ---
-base = latest_supervised_rows(df, target="clicks")
+t0 = time.perf_counter()
+base = context_rows(DATA_PATH, target=bundle.target, feature_cols=bundle.feature_cols)
+context_ms = (time.perf_counter() - t0) * 1000
 
 if base.empty:
     st.error("Not enough data to build lag/rolling features yet (need at least ~14 days).")
@@ -50,7 +67,9 @@ latest_context_date = pd.to_datetime(base["date"].max()).date()
 st.subheader("Baseline Forecast (Next-day Clicks)")
 st.write(f"Model context date: **{latest_context_date}** (forecasting next day)")
 
-baseline = forecast_table(bundle, base)
+baseline = baseline_forecast(MODEL_PATH, DATA_PATH, residuals_path=RESIDUALS_PATH, coverage=coverage)
+if residuals is not None:
+    st.caption(f"pred_clicks_lo / pred_clicks_hi: {coverage:.0%} conformal interval from backtest residuals")
 st.dataframe(baseline, use_container_width=True)
 
 # --- Run scenarios ---
@@ -64,8 +83,17 @@ if run_btn:
     }
 
     st.subheader("Scenario Comparison")
-    scen = scenario_table(bundle, base, scenarios)
-    scen = add_deltas(scen)
+    t0 = time.perf_counter()
+    cache = scenario_cache()
+    scen = scenario_table(
+        bundle, base, scenarios, deltas=True, residuals=residuals, coverage=coverage,
+        cache=cache, model_key=model_version(MODEL_PATH),
+    )
+    stats = cache.stats()
+    st.caption(
+        f"Scenario prediction: {(time.perf_counter() - t0) * 1000:.0f} ms "
+        f"(cache hit rate {stats['hit_rate']:.0%}, {stats['entries']} cached scenarios)"
+    )
 
     # Display tidy table
     st.dataframe(
@@ -86,3 +114,78 @@ if run_btn:
     st.subheader("Total Predicted Clicks by Scenario")
     totals = scen.groupby("scenario", as_index=False)["pred_clicks"].sum()
     st.bar_chart(totals.set_index("scenario")["pred_clicks"])
+
+# --- Sensitivity surface ---
+st.subheader("Sensitivity Surface (Impressions x CTR)")
+st.write("The grid is computed once per model/context; sliders only select slices of the stored surface.")
+
+grid_points = st.select_slider("Grid resolution", options=[11, 21, 41], value=21)
+sweep_key = (model_version(MODEL_PATH), str(latest_context_date), grid_points)
+
+if st.session_state.get("sweep_key") != sweep_key:
+    # Large portfolios keep the per-campaign surfaces in a memory-mapped file instead of RAM
+    sweep_path = None
+    if grid_points ** 2 * len(base) * 4 > MAX_SWEEP_BYTES:
+        sweep_dir = st.session_state.setdefault("sweep_dir", tempfile.mkdtemp(prefix="sweep_"))
+        sweep_path = os.path.join(sweep_dir, f"sweep_{grid_points}_{time.time_ns()}.npy")
+    if st.session_state.get("sweep_path"):
+        os.remove(st.session_state["sweep_path"])  # the previous surface is replaced below
+    st.session_state["sweep_path"] = sweep_path
+    st.session_state["sweep"] = scenario_sweep(
+        bundle,
+        base,
+        {
+            "impressions": np.linspace(0.5, 1.5, grid_points),
+            "ctr": np.linspace(0.5, 1.5, grid_points),
+        },
+        out_path=sweep_path,
+    )
+    st.session_state["sweep_key"] = sweep_key
+
+sweep = st.session_state["sweep"]
+surface_of = st.selectbox("Surface for", ["Portfolio total"] + list(sweep.campaigns))
+surface = sweep.surface_frame(None if surface_of == "Portfolio total" else surface_of)
+
+ctr_axis = sweep.axes["ctr"]
+ctr_pick = st.select_slider("CTR multiplier slice", options=[round(float(v), 3) for v in ctr_axis], value=round(float(ctr_axis[len(ctr_axis) // 2]), 3))
+slice_df = surface[np.isclose(surface["ctr"], ctr_pick)]
+st.line_chart(slice_df.set_index("impressions")["pred_clicks"])
+
+st.dataframe(
+    surface.pivot(index="impressions", columns="ctr", values="pred_clicks"),
+    use_container_width=True,
+)
+
+# --- Budget allocation ---
+st.subheader("Budget Allocation")
+st.write("Redistribute next-day spend across campaigns to maximize predicted clicks.")
+
+current_spend = float(base["cost"].sum())
+col_a, col_b = st.columns(2)
+with col_a:
+    budget_mult = st.slider("Total budget vs current spend", 0.5, 1.5, 1.0, 0.05)
+with col_b:
+    mult_range = st.slider("Per-campaign spend multiplier range", 0.0, 3.0, (0.5, 1.5), 0.05)
+
+if st.button("Optimize allocation"):
+    try:
+        alloc = allocate_budget(
+            bundle,
+            base,
+            total_budget=current_spend * budget_mult,
+            min_mult=mult_range[0],
+            max_mult=mult_range[1],
+        )
+    except ValueError as e:
+        st.error(str(e))
+    else:
+        st.write(
+            f"Budget **{current_spend * budget_mult:,.2f}** | "
+            f"predicted clicks **{alloc['base_clicks'].sum():,.0f} → {alloc['pred_clicks'].sum():,.0f}**"
+        )
+        st.dataframe(alloc, use_container_width=True)
+
+st.caption(
+    f"Rerun latency: {(time.perf_counter() - rerun_start) * 1000:.0f} ms "
+    f"(model load {load_ms:.0f} ms, context rows {context_ms:.0f} ms)"
+)
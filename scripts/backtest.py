@@ -1,66 +1,310 @@
+import argparse
 import os
+import time
+
 import numpy as np
 import pandas as pd
 
-from src.features import make_supervised_frame
-from src.model import train_forecaster
-from src.metrics import mae, rmse, mape
+from src import profiling
+from src.conformal import ResidualStore, residuals_path
+from src.feature_cache import cached_supervised_frame
+from src.shared_pool import shared_array, shared_map
+from src.store import default_daily_path
+from src.model import feature_columns, make_regressor
+from src.metrics import MetricsAccumulator
+
+DATA_PATH = default_daily_path()
+
+
+# Per-fold breakdowns merged over all folds: attrs key -> key column
+BREAKDOWNS = {"by_campaign": "campaign", "by_dow": "dow", "by_horizon": "horizon"}
+
+
+def _score_cutoff(bounds) -> dict:
+    train_end, test_end, cut_day = bounds
+    X, y, g, day = shared_array("X"), shared_array("y"), shared_array("g"), shared_array("day")
+
+    model = make_regressor()
+    model.fit(X[:train_end], y[:train_end])
+    y_pred = model.predict(X[train_end:test_end])
+    y_true = y[train_end:test_end]
+    test_day = day[train_end:test_end]
 
-DATA_PATH = "data/processed/ads_daily.parquet"
+    # Fold totals come from the per-campaign pass; each breakdown is a partial for the caller to merge
+    acc = MetricsAccumulator().update(y_true, y_pred, groups=g[train_end:test_end])
+    totals = acc.totals()
+    return {
+        "n_train": train_end,
+        "n_test": totals["n"],
+        "mae": totals["mae"],
+        "rmse": totals["rmse"],
+        "mape": totals["mape"],
+        "residuals": (y_true - y_pred).astype(np.float32),
+        "by_campaign": acc,
+        # Day 0 of the epoch was a Thursday; 0 = Monday as in pandas
+        "by_dow": MetricsAccumulator().update(y_true, y_pred, groups=(test_day + 3) % 7),
+        "by_horizon": MetricsAccumulator().update(y_true, y_pred, groups=test_day - cut_day + 1),
+    }
 
+
+def backtest_cutoffs(
+    dates: np.ndarray,
+    horizon_days: int = 1,
+    min_train_days: int = 45,
+    step_days: int = 7,
+) -> list:
+    """
+    (cutoff, train_end, test_end) per backtest fold over date-sorted rows:
+    rows [0, train_end) train, rows [train_end, test_end) test.
+    """
+    dates = pd.DatetimeIndex(dates)
+    start_date = dates.min() + pd.Timedelta(days=min_train_days)
+    end_date = dates.max() - pd.Timedelta(days=horizon_days)
+
+    folds = []
+    cut = start_date
+    while cut <= end_date:
+        train_end = int(dates.searchsorted(cut, side="left"))
+        test_end = int(dates.searchsorted(cut + pd.Timedelta(days=step_days), side="left"))
+        if train_end > 0 and test_end > train_end:
+            folds.append((cut, train_end, test_end))
+        cut += pd.Timedelta(days=step_days)
+    return folds
+
+
+@profiling.traced("rolling_backtest")
 def rolling_backtest(
     sup: pd.DataFrame,
     target: str,
     horizon_days: int = 1,
     min_train_days: int = 45,
     step_days: int = 7,
+    workers: int = 1,
+    residuals_out: str = None,
 ) -> pd.DataFrame:
-    sup = sup.sort_values("date").reset_index(drop=True)
+    """
+    Expanding-window backtest. Folds are contiguous row ranges of the
+    date-sorted frame; with workers > 1 they run in a process pool that
+    memory-maps one shared copy of the feature matrix. Results are identical
+    and in the same order for any worker count.
 
-    start_date = sup["date"].min() + pd.Timedelta(days=min_train_days)
-    end_date = sup["date"].max() - pd.Timedelta(days=horizon_days)
+    With residuals_out, the out-of-sample residuals of every fold are saved
+    there as a ResidualStore of one-step-ahead residuals per campaign.
+    Metrics over all folds broken down by campaign, day of week (0 =
+    Monday) and horizon are in attrs["by_campaign"], attrs["by_dow"] and
+    attrs["by_horizon"]. Horizon is days past the cutoff (1 = the first
+    test day), i.e. how stale the model is; every prediction still uses
+    actual lags.
+    """
+    sup = sup.sort_values("date", kind="stable").reset_index(drop=True)
+    folds = backtest_cutoffs(sup["date"].to_numpy(), horizon_days, min_train_days, step_days)
 
-    results = []
+    g, campaigns = pd.factorize(sup["campaign"].astype(str), sort=True)
+    arrays = {
+        "X": sup[feature_columns(sup, target)].to_numpy(dtype=np.float64),
+        "y": sup[target].to_numpy(dtype=np.float64),
+        "g": g,
+        "day": sup["date"].to_numpy(dtype="datetime64[D]").astype(np.int64),
+    }
+    bounds = [
+        (train_end, test_end, np.datetime64(cut, "D").astype(np.int64)) for cut, train_end, test_end in folds
+    ]
+
+    workers = workers if len(bounds) > 1 else 1
+    with shared_map(arrays, workers, prefix="backtest_") as run:
+        with profiling.span("backtest_folds", folds=len(bounds), workers=workers):
+            scores = run(_score_cutoff, bounds)
+
+    residuals = [score.pop("residuals") for score in scores]
+    if residuals_out is not None and folds:
+        with profiling.span("save_residuals"):
+            save_residuals(sup, folds, residuals, residuals_out)
+
+    tables = {}
+    for attr, name in BREAKDOWNS.items():
+        acc = MetricsAccumulator()
+        for score in scores:
+            acc.merge(score.pop(attr))
+        tables[attr] = acc.finalize(name)
+    by_campaign = tables["by_campaign"]
+    by_campaign["campaign"] = campaigns[by_campaign["campaign"].to_numpy(dtype=np.int64)]
+
+    results = [{"cutoff": cut.date(), **score} for (cut, _, _), score in zip(folds, scores)]
+    out = pd.DataFrame(results)
+    out.attrs.update(tables)
+    return out
+
+
+def save_residuals(sup: pd.DataFrame, folds: list, residuals: list, path: str) -> ResidualStore:
+    """
+    Build a ResidualStore from per-fold test residuals of the date-sorted
+    frame and save it. Every test row is predicted from actual lags, i.e.
+    one step ahead however many days it lies past the cutoff, so all
+    residuals are stored at horizon 1 and grouped by campaign only.
+    """
+    campaigns = sup["campaign"].astype(str).to_numpy()
+    rows = np.concatenate([np.arange(train_end, test_end) for _, train_end, test_end in folds])
+    horizons = np.ones(len(rows), dtype=np.int64)
+
+    store = ResidualStore.from_residuals(campaigns[rows], horizons, np.concatenate(residuals))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    store.save(path)
+    return store
 
-    cut = start_date
-    while cut <= end_date:
-        train_df = sup[sup["date"] < cut].copy()
-        test_df = sup[(sup["date"] >= cut) & (sup["date"] < cut + pd.Timedelta(days=step_days))].copy()
 
-        if len(test_df) == 0 or len(train_df) == 0:
-            cut += pd.Timedelta(days=step_days)
-            continue
+def quantile_bin_edges(X: np.ndarray, max_bins: int = 255) -> list:
+    """
+    Per-feature bin edges at quantiles of X (at most max_bins bins). Edges
+    sit midway between observed values, so every bin holds rows of X.
+    """
+    qs = np.linspace(0, 1, max_bins + 1)[1:-1]
+    edges = []
+    for j in range(X.shape[1]):
+        col = X[:, j]
+        uniq = np.unique(col)
+        if len(uniq) <= max_bins:
+            edges.append((uniq[:-1] + uniq[1:]) / 2)
+        else:
+            cuts = np.unique(np.searchsorted(uniq, np.quantile(col, qs, method="inverted_cdf")))
+            cuts = cuts[cuts > 0]
+            edges.append((uniq[cuts - 1] + uniq[cuts]) / 2)
+    return edges
 
-        bundle = train_forecaster(train_df, target=target)
-        preds = bundle.predict(test_df)
 
-        y_true = test_df[target].to_numpy()
-        y_pred = preds
+def bin_codes(X: np.ndarray, edges: list) -> np.ndarray:
+    codes = np.empty(X.shape, dtype=np.uint8)
+    for j, e in enumerate(edges):
+        codes[:, j] = np.searchsorted(e, X[:, j], side="right")
+    return codes
 
+
+@profiling.traced("warm_start_backtest")
+def warm_start_backtest(
+    sup: pd.DataFrame,
+    target: str,
+    horizon_days: int = 1,
+    min_train_days: int = 45,
+    step_days: int = 7,
+    extra_iter: int = 50,
+    max_bins: int = 255,
+) -> pd.DataFrame:
+    """
+    Expanding-window backtest that reuses the boosted trees between
+    consecutive cutoffs: the first fold fits the full model and each later
+    fold continues boosting with `extra_iter` more trees via warm_start.
+    The regressor is rolling_backtest's, early stopping included.
+
+    HistGradientBoosting rebins its input on every fit and scores the
+    existing trees on the new bins, so on raw features the earlier trees'
+    splits drift as the window grows. The model is therefore fit on uint8
+    codes from edges fitted once on the first training window; every code
+    already occurs there, so each refit bins them the same way (up to the
+    row subsample sklearn bins from on very large windows). This keeps warm
+    start consistent; it does not save binning work.
+    """
+    sup = sup.sort_values("date", kind="stable").reset_index(drop=True)
+    folds = backtest_cutoffs(sup["date"].to_numpy(), horizon_days, min_train_days, step_days)
+    if not folds:
+        return pd.DataFrame([])
+
+    X = sup[feature_columns(sup, target)].to_numpy(dtype=np.float64)
+    y = sup[target].to_numpy(dtype=np.float64)
+
+    edges = quantile_bin_edges(X[:folds[0][1]], max_bins=max_bins)
+    codes = np.empty(X.shape, dtype=np.uint8)
+    n_binned = 0
+
+    model = make_regressor(warm_start=True)
+    results = []
+    for i, (cut, train_end, test_end) in enumerate(folds):
+        if test_end > n_binned:
+            codes[n_binned:test_end] = bin_codes(X[n_binned:test_end], edges)
+            n_binned = test_end
+
+        if i > 0:
+            model.max_iter += extra_iter
+        model.fit(codes[:train_end], y[:train_end])
+
+        y_pred = model.predict(codes[train_end:test_end])
+        totals = MetricsAccumulator().update(y[train_end:test_end], y_pred).totals()
         results.append({
             "cutoff": cut.date(),
-            "n_train": len(train_df),
-            "n_test": len(test_df),
-            "mae": mae(y_true, y_pred),
-            "rmse": rmse(y_true, y_pred),
-            "mape": mape(y_true, y_pred),
+            "n_train": train_end,
+            "n_test": totals["n"],
+            "mae": totals["mae"],
+            "rmse": totals["rmse"],
+            "mape": totals["mape"],
         })
 
-        cut += pd.Timedelta(days=step_days)
-
     return pd.DataFrame(results)
 
+
+def compare_warm_start(sup: pd.DataFrame, target: str, workers: int = 1, **kwargs) -> pd.DataFrame:
+    """
+    Run full refits and the warm-start mode on the same folds and report
+    per-cutoff accuracy differences (warm - full) and wall time.
+    """
+    extra_iter = kwargs.pop("extra_iter", 50)
+
+    t0 = time.perf_counter()
+    full = rolling_backtest(sup, target=target, workers=workers, **kwargs)
+    t_full = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    warm = warm_start_backtest(sup, target=target, extra_iter=extra_iter, **kwargs)
+    t_warm = time.perf_counter() - t0
+
+    out = full.merge(warm[["cutoff", "mae", "rmse", "mape"]], on="cutoff", suffixes=("_full", "_warm"))
+    for m in ["mae", "rmse", "mape"]:
+        out[f"{m}_delta"] = out[f"{m}_warm"] - out[f"{m}_full"]
+    out.attrs["seconds_full"] = t_full
+    out.attrs["seconds_warm"] = t_warm
+    return out
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Rolling backtest of the clicks forecaster.")
+    parser.add_argument("--workers", type=int, default=1, help="Process pool size (1 = serial)")
+    parser.add_argument("--step-days", type=int, default=7)
+    parser.add_argument("--warm-start", action="store_true", help="Continue boosting between cutoffs instead of refitting")
+    parser.add_argument("--extra-iter", type=int, default=50, help="Boosting iterations added per cutoff in warm-start mode")
+    parser.add_argument("--compare-warm-start", action="store_true", help="Report warm-start accuracy against full refits")
+    parser.add_argument("--profile", default=None, help=f"Record stage timings to this trace file (or set {profiling.ENV_VAR})")
+    args = parser.parse_args()
+    profiling.configure(args.profile)
+
     if not os.path.exists(DATA_PATH):
         raise FileNotFoundError(f"Missing {DATA_PATH}. Run: python -m scripts.build_dataset")
 
-    df = pd.read_parquet(DATA_PATH)
-    df["date"] = pd.to_datetime(df["date"])
-
     target = "clicks"
-    sup = make_supervised_frame(df, target=target, group_col="campaign")
+    sup = cached_supervised_frame(DATA_PATH, target=target, group_col="campaign")
 
-    bt = rolling_backtest(sup, target=target, horizon_days=1, min_train_days=45, step_days=7)
+    if args.compare_warm_start:
+        cmp = compare_warm_start(
+            sup, target=target, workers=args.workers, extra_iter=args.extra_iter,
+            horizon_days=1, min_train_days=45, step_days=args.step_days,
+        )
+        print("\nWarm start vs full refit (delta = warm - full):")
+        print(cmp[["cutoff", "mae_full", "mae_warm", "mae_delta", "rmse_delta", "mape_delta"]])
+        print(f"Full refits: {cmp.attrs['seconds_full']:.2f}s | Warm start: {cmp.attrs['seconds_warm']:.2f}s")
+
+        os.makedirs("artifacts/forecasts", exist_ok=True)
+        out_csv = "artifacts/forecasts/backtest_warm_vs_full_clicks.csv"
+        cmp.to_csv(out_csv, index=False)
+        print(f"\nSaved comparison to: {out_csv}")
+        return
+
+    if args.warm_start:
+        bt = warm_start_backtest(
+            sup, target=target, horizon_days=1, min_train_days=45, step_days=args.step_days,
+            extra_iter=args.extra_iter,
+        )
+    else:
+        bt = rolling_backtest(
+            sup, target=target, horizon_days=1, min_train_days=45, step_days=args.step_days, workers=args.workers,
+            residuals_out=residuals_path(target),
+        )
+        print(f"Saved conformal residuals to: {residuals_path(target)}")
     print("\nBacktest summary:")
     print(bt.describe(include="all"))
 
@@ -69,6 +313,12 @@ def main():
     bt.to_csv(out_csv, index=False)
     print(f"\nSaved backtest results to: {out_csv}")
 
+    for attr, name in BREAKDOWNS.items():
+        if attr in bt.attrs:
+            by_csv = f"artifacts/forecasts/backtest_{attr}_clicks.csv"
+            bt.attrs[attr].to_csv(by_csv, index=False)
+            print(f"Saved per-{name} metrics to: {by_csv}")
+
     # Optional plot
     try:
         import matplotlib.pyplot as plt
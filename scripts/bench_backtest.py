@@ -0,0 +1,38 @@
+import argparse
+import time
+
+import pandas as pd
+
+from scripts.backtest import rolling_backtest
+from scripts.bench_features import synthetic_daily
+from src.features import make_supervised_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmark for the parallel rolling backtest.")
+    parser.add_argument("--campaigns", type=int, default=200)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--step-days", type=int, default=7)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    sup = make_supervised_frame(synthetic_daily(args.campaigns, args.days), target="clicks")
+    print(f"Supervised rows: {len(sup):,} | step_days={args.step_days}")
+
+    baseline, t_base = None, None
+    for w in args.workers:
+        t0 = time.perf_counter()
+        bt = rolling_backtest(sup, target="clicks", step_days=args.step_days, workers=w)
+        elapsed = time.perf_counter() - t0
+
+        if baseline is None:
+            baseline, t_base = bt, elapsed
+        else:
+            pd.testing.assert_frame_equal(bt, baseline, check_exact=True)
+        print(f"workers={w:<3d} folds={len(bt):<4d} {elapsed:8.2f}s  speedup {t_base / elapsed:5.2f}x")
+
+    print("All worker counts produced identical results.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import time
+
+import numpy as np
+
+from scripts.bench_suite import measure
+from src.feature_block import make_feature_block
+from src.features import make_supervised_frame
+from src.model import ForecastBundle, make_regressor
+from src.synthetic import synthetic_daily
+
+
+def _best(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Float32 feature block vs DataFrame: memory and predict latency.")
+    parser.add_argument("--campaigns", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--train-rows", type=int, default=100_000, help="Rows used to fit the two bundles")
+    parser.add_argument("--max-iter", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    df = synthetic_daily(args.campaigns, args.days)
+    print(f"Input rows: {len(df):,} ({args.campaigns:,} campaigns x {args.days} days)")
+
+    sup, t_frame, peak_frame = measure(lambda: make_supervised_frame(df, target="clicks"))
+    blk, t_block, peak_block = measure(lambda: make_feature_block(df, target="clicks"))
+    frame_mb = sup.memory_usage(deep=True).sum() / 1024 ** 2
+    block_mb = (blk.nbytes + blk.campaigns.nbytes) / 1024 ** 2
+
+    print(f"\n{'':28s} {'DataFrame':>12s} {'float32 block':>14s}")
+    print(f"{'build seconds':28s} {t_frame:12.2f} {t_block:14.2f}")
+    print(f"{'build peak alloc MB':28s} {peak_frame:12.1f} {peak_block:14.1f}")
+    print(f"{'resident size MB':28s} {frame_mb:12.1f} {block_mb:14.1f}")
+
+    # Same hyperparameters for both so only the input path differs
+    n_train = min(args.train_rows, len(sup))
+    train_df, train_blk = sup.iloc[:n_train], blk.rows(slice(0, n_train))
+
+    def fit_frame():
+        X = train_df[blk.feature_cols].to_numpy()
+        model = make_regressor(max_iter=args.max_iter).fit(X, train_df["clicks"].to_numpy())
+        return ForecastBundle(model=model, feature_cols=blk.feature_cols, target="clicks")
+
+    def fit_block():
+        model = make_regressor(max_iter=args.max_iter).fit(train_blk.values, train_blk.y)
+        return ForecastBundle(model=model, feature_cols=blk.feature_cols, target="clicks", dtype="float32")
+
+    b64, t_fit64, peak_fit64 = measure(fit_frame)
+    b32, t_fit32, peak_fit32 = measure(fit_block)
+    print(f"{'fit seconds':28s} {t_fit64:12.2f} {t_fit32:14.2f}")
+    print(f"{'fit peak alloc MB':28s} {peak_fit64:12.1f} {peak_fit32:14.1f}")
+
+    print(f"\n{'predict (input prep + model)':28s} {'DataFrame ms':>12s} {'block ms':>14s} {'prep only':>22s}")
+    for n in (1, 100, 10_000, len(sup)):
+        rows_df, rows_blk = sup.iloc[-n:], blk.rows(slice(len(blk) - n, None))
+        t_df = _best(lambda: b64.predict(rows_df), args.repeat)
+        t_blk = _best(lambda: b32.predict(rows_blk), args.repeat)
+        prep_df = _best(lambda: b64.model_input(rows_df), args.repeat)
+        prep_blk = _best(lambda: b32.model_input(rows_blk), args.repeat)
+        print(
+            f"{n:>26,} rows {t_df * 1000:12.2f} {t_blk * 1000:14.2f}"
+            f"   {prep_df * 1000:8.2f} vs {prep_blk * 1000:8.3f} ms"
+        )
+
+    agree = np.array_equal(b32.predict(blk.rows(slice(0, 1000))), b32.predict(sup.iloc[:1000]))
+    print(f"\nfloat32 bundle gives identical predictions from the block and the DataFrame: {agree}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.feature_plan import FeaturePlan
+from src.feature_state import FeatureState
+from src.features import make_supervised_frame
+from src.model import feature_columns, train_forecaster
+from src.synthetic import synthetic_daily
+
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark plan-driven feature building against the full frame.")
+    parser.add_argument("--campaigns", type=int, default=2_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--train-campaigns", type=int, default=200, help="Campaigns used to fit the pruned model")
+    parser.add_argument("--prune", type=float, default=0.99)
+    parser.add_argument("--target", default="clicks")
+    args = parser.parse_args()
+
+    df = synthetic_daily(args.campaigns, args.days)
+    print(f"Input rows: {len(df):,} ({args.campaigns:,} campaigns x {args.days} days)")
+
+    train = make_supervised_frame(df[df["campaign"].isin(df["campaign"].unique()[:args.train_campaigns])], args.target)
+    bundle, t_fit = _timed(train_forecaster, train, args.target, prune=args.prune)
+    n_all = len(feature_columns(train, args.target))
+    print(f"Pruned fit ({args.prune:.0%} of split gain): {len(bundle.feature_cols)} of {n_all} features, {t_fit:.1f}s")
+
+    # Training-size frame: full build vs the bundle's plan
+    full, t_full = _timed(make_supervised_frame, df, target=args.target)
+    full_plan = FeaturePlan.from_columns(feature_columns(full, args.target), args.target)
+    every, t_every = _timed(full_plan.build, df)
+    planned, t_plan = _timed(bundle.plan.build, df)
+
+    pd.testing.assert_frame_equal(every, full[every.columns], check_exact=True)
+    cols = ["date", "campaign", args.target] + bundle.feature_cols
+    pd.testing.assert_frame_equal(planned, full[cols], check_exact=True)
+
+    # Next-day context rows from per-campaign state
+    state = FeatureState.from_daily(df, target=args.target)
+    ctx_full, t_ctx_full = _timed(state.latest_rows)
+    ctx_plan, t_ctx_plan = _timed(state.latest_rows, bundle.feature_cols)
+    assert np.array_equal(bundle.predict(ctx_full), bundle.predict(ctx_plan))
+
+    print(f"make_supervised_frame:   {t_full:8.3f}s  {full.shape[1]} columns")
+    print(f"Full plan build:         {t_every:8.3f}s  (identical frame)")
+    print(f"Pruned plan build:       {t_plan:8.3f}s  {planned.shape[1]} columns, {t_full / t_plan:.1f}x faster")
+    print(f"Context rows, full:      {t_ctx_full * 1000:8.1f}ms  {ctx_full.shape[1]} columns")
+    print(f"Context rows, planned:   {t_ctx_plan * 1000:8.1f}ms  {ctx_plan.shape[1]} columns (identical predictions)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import time
+
+import pandas as pd
+
+from scripts.bench_features import synthetic_daily
+from src.feature_state import FeatureState
+from src.features import make_supervised_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental FeatureState against a full rebuild.")
+    parser.add_argument("--campaigns", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--target", default="clicks")
+    args = parser.parse_args()
+
+    df = synthetic_daily(args.campaigns, args.days)
+    last = df["date"].max()
+    history, new_day = df[df["date"] < last], df[df["date"] == last]
+    print(f"Input rows: {len(df):,} ({args.campaigns:,} campaigns x {args.days} days)")
+
+    t0 = time.perf_counter()
+    sup = make_supervised_frame(df, target=args.target)
+    ref = sup[sup["date"] == sup["date"].max()].reset_index(drop=True)
+    t_full = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    state = FeatureState.from_daily(history, target=args.target)
+    t_init = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    state.update(new_day)
+    t_update = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    got = state.latest_rows()
+    t_rows = time.perf_counter() - t0
+
+    pd.testing.assert_frame_equal(got, ref, check_exact=True)
+
+    print(f"Full rebuild + filter: {t_full:8.3f}s")
+    print(f"State from history:    {t_init:8.3f}s (one-off)")
+    print(f"Append one day:        {t_update:8.3f}s")
+    print(f"Latest rows:           {t_rows:8.3f}s")
+    print(f"Per-forecast speedup:  {t_full / (t_update + t_rows):8.1f}x  (outputs identical)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import time
+
+import numpy as np
+
+from src.feature_block import make_feature_block
+from src.flat_trees import export_forest
+from src.model import ForecastBundle, make_regressor
+from src.synthetic import synthetic_daily
+
+
+def _best(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flattened-tree evaluator vs sklearn predict at several batch sizes.")
+    parser.add_argument("--campaigns", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 100, 100_000])
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    blk = make_feature_block(synthetic_daily(args.campaigns, args.days), target="clicks")
+    model = make_regressor(early_stopping=False).fit(blk.values, blk.y)
+    bundle = ForecastBundle(model=model, feature_cols=blk.feature_cols, target="clicks", dtype="float32")
+
+    t0 = time.perf_counter()
+    forest = export_forest(model)
+    print(f"Exported {forest.n_trees} trees ({len(forest.value):,} nodes, depth {forest.depth}) "
+          f"in {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    rng = np.random.default_rng(0)
+    print(f"\n{'rows':>9s} {'sklearn ms':>12s} {'flat ms':>10s} {'speedup':>9s}  identical")
+    for n in args.rows:
+        X = blk.values[rng.integers(0, len(blk), size=n)]
+        t_sk = _best(lambda: bundle.predict_array(X, engine="sklearn"), args.repeat)
+        t_flat = _best(lambda: bundle.predict_array(X, engine="flat"), args.repeat)
+        same = np.array_equal(bundle.predict_array(X, engine="sklearn"), bundle.predict_array(X, engine="flat"))
+        print(f"{n:>9,} {t_sk * 1000:12.3f} {t_flat * 1000:10.3f} {t_sk / t_flat:8.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
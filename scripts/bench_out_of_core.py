@@ -0,0 +1,156 @@
+"""
+Peak RSS of in-memory vs out-of-core training on a synthetic store larger
+than the memory budget.
+
+Every training path runs in a child process whose heap may grow by at
+most --memory-mb beyond what the imported libraries already reserve
+(RLIMIT_DATA). File mappings don't count against that limit, which is
+what the out-of-core path relies on, so a path that needs more memory
+than the budget fails with MemoryError instead of pushing the machine
+into the OOM killer.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.features import make_supervised_frame
+from src.model import train_forecaster
+from src.out_of_core import DiskMatrix, build_disk_matrix, train_out_of_core
+from src.store import campaign_bucket, read_daily, write_partitions
+from src.synthetic import synthetic_daily
+
+PATHS = {
+    "in-memory": "read_daily + make_supervised_frame + train_forecaster",
+    "disk-matrix": "stream campaign batches into the on-disk float32 matrix",
+    "out-of-core": "stream to disk matrix, fit on every row",
+    "out-of-core-sample": "stream to disk matrix, fit on a seeded subsample",
+}
+
+
+def write_store(root: str, n_campaigns: int, n_days: int, buckets: int, seed: int = 0) -> int:
+    """
+    Bucketed synthetic store written one campaign bucket at a time, so the
+    full dataset is never in memory. Returns the number of daily rows.
+    """
+    names = np.array([f"camp {i + 1}" for i in range(n_campaigns)], dtype=object)
+    bucket = campaign_bucket(names, buckets)
+    rows = 0
+    for k in range(buckets):
+        members = names[bucket == k]
+        if len(members) == 0:
+            continue
+        df = synthetic_daily(len(members), n_days, seed=seed + k)
+        df["campaign"] = df["campaign"].map({f"camp {j + 1}": c for j, c in enumerate(members)})
+        write_partitions(df, root, buckets=buckets, part_name=f"part-{k}", replace=False)
+        rows += len(df)
+    return rows
+
+
+def limit_heap(budget_mb: int) -> None:
+    """Allow the data segment to grow by `budget_mb` from its current (post-import) size."""
+    with open("/proc/self/status") as f:
+        vm_data_kb = next(int(line.split()[1]) for line in f if line.startswith("VmData:"))
+    limit = (vm_data_kb + budget_mb * 1024) * 1024
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+
+def run_child(mode: str, data: str, matrix: str, target: str, max_rows) -> dict:
+    t0 = time.perf_counter()
+    result = {"path": mode, "status": "ok", "fit_rows": None, "build_s": None}
+    try:
+        if mode == "in-memory":
+            sup = make_supervised_frame(read_daily(data), target=target)
+            result["build_s"] = time.perf_counter() - t0
+            result["fit_rows"] = len(sup)
+            train_forecaster(sup, target=target)
+        else:
+            if os.path.exists(os.path.join(matrix, "meta.json")):
+                disk = DiskMatrix.open(matrix)
+            else:
+                disk = build_disk_matrix(data, target, matrix)
+            result["build_s"] = time.perf_counter() - t0
+            if mode == "disk-matrix":
+                result["fit_rows"] = 0
+                result["seconds"] = result["build_s"]
+                result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                return result
+            sample = max_rows if mode == "out-of-core-sample" else None
+            result["fit_rows"] = min(disk.n_rows, sample or disk.n_rows)
+            train_out_of_core(disk, max_rows=sample)
+    except MemoryError:
+        result["status"] = "MemoryError"
+    result["seconds"] = time.perf_counter() - t0
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak RSS of in-memory and out-of-core training.")
+    parser.add_argument("--campaigns", type=int, default=8_000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--buckets", type=int, default=16)
+    parser.add_argument("--memory-mb", type=int, default=1024, help="Heap budget (RLIMIT_DATA) for each training run")
+    parser.add_argument("--max-rows", type=int, default=500_000, help="Subsample size for the sampled out-of-core fit")
+    parser.add_argument("--paths", nargs="+", default=list(PATHS), choices=list(PATHS))
+    parser.add_argument("--target", default="clicks")
+    parser.add_argument("--workdir", default=None, help="Where the store and matrix go (default: a temp dir, removed after)")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--data", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        limit_heap(args.memory_mb)
+        matrix = os.path.join(args.workdir, "matrix")
+        print(json.dumps(run_child(args.child, args.data, matrix, args.target, args.max_rows)))
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_ooc_")
+    store = os.path.join(workdir, "ads_daily")
+    try:
+        t0 = time.perf_counter()
+        rows = write_store(store, args.campaigns, args.days, args.buckets)
+        store_mb = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(store) for f in files) / 1024 ** 2
+        # make_supervised_frame: ~39 float64 columns per row; train_forecaster adds a float64 copy of 36 of them
+        frame_mb = rows * (39 + 36) * 8 / 1024 ** 2
+        print(f"Store: {rows:,} daily rows ({args.campaigns:,} campaigns x {args.days} days, "
+              f"{args.buckets} buckets), {store_mb:,.0f} MB on disk, written in {time.perf_counter() - t0:.0f}s")
+        print(f"In-memory frame + model input: ~{frame_mb:,.0f} MB, "
+              f"{frame_mb / args.memory_mb:.1f}x the {args.memory_mb:,} MB budget\n")
+
+        results = []
+        for mode in args.paths:
+            cmd = [
+                sys.executable, "-m", "scripts.bench_out_of_core", "--child", mode, "--data", store,
+                "--workdir", workdir, "--memory-mb", str(args.memory_mb), "--max-rows", str(args.max_rows),
+                "--target", args.target,
+            ]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            lines = proc.stdout.strip().splitlines()
+            if proc.returncode != 0 or not lines:
+                results.append({"path": mode, "status": f"exit {proc.returncode}"})
+                print(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "")
+            else:
+                results.append(json.loads(lines[-1]))
+            print(f"{mode}: {results[-1]['status']}")
+
+        table = pd.DataFrame(results).set_index("path")
+        table.insert(0, "what", [PATHS[m] for m in table.index])
+        with pd.option_context("display.width", 160, "display.max_columns", 10, "display.float_format", "{:,.1f}".format):
+            print()
+            print(table)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
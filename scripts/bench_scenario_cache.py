@@ -0,0 +1,75 @@
+import argparse
+import tempfile
+import time
+
+import pandas as pd
+
+from scripts.bench_features import synthetic_daily
+from scripts.bench_scenarios import random_scenarios
+from src.feature_state import FeatureState
+from src.features import make_supervised_frame
+from src.model import train_forecaster
+from src.planner import ScenarioCache, scenario_table
+
+# The planner's standard set, as in scripts/scenario_analysis.py and the app
+PRESETS = {
+    "Impressions +20%": {"impressions": 1.2},
+    "Impressions -20%": {"impressions": 0.8},
+    "CTR -10%": {"ctr": 0.9},
+    "CTR +10%": {"ctr": 1.1},
+}
+
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scenario_table with and without the scenario result cache.")
+    parser.add_argument("--campaigns", type=int, default=5_000)
+    parser.add_argument("--scenarios", type=int, default=200, help="Random scenarios besides the presets")
+    parser.add_argument("--new", type=int, default=20, help="Unseen scenarios in the mixed request")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--train-rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    df = synthetic_daily(args.campaigns, args.days)
+    sup = make_supervised_frame(df, target="clicks")
+    bundle = train_forecaster(sup.sample(min(args.train_rows, len(sup)), random_state=0), target="clicks")
+    base = FeatureState.from_daily(df, target="clicks").latest_rows()
+    scenarios = {**PRESETS, **random_scenarios(args.scenarios)}
+    fresh = {f"New {k}": v for k, v in random_scenarios(args.new, seed=1).items()}
+    mixed = {**scenarios, **fresh}
+    print(f"{len(scenarios):,} scenarios (+{len(fresh)} new in the mixed request) x {len(base):,} campaigns")
+
+    uncached, t_uncached = _timed(scenario_table, bundle, base, mixed)
+
+    with tempfile.TemporaryDirectory(prefix="scenario_cache_") as tmp:
+        cache = ScenarioCache(path=tmp)
+        _, t_cold = _timed(scenario_table, bundle, base, scenarios, cache=cache)
+        _, t_warm = _timed(scenario_table, bundle, base, scenarios, cache=cache)
+        cached, t_mixed = _timed(scenario_table, bundle, base, mixed, cache=cache)
+        memory_stats = cache.stats()
+
+        # A new process: same model and context, results read back from disk
+        restarted = ScenarioCache(path=tmp)
+        reloaded, t_disk = _timed(scenario_table, bundle, base, mixed, cache=restarted)
+        disk_stats = restarted.stats()
+
+    pd.testing.assert_frame_equal(cached, uncached, check_exact=True)
+    pd.testing.assert_frame_equal(reloaded, uncached, check_exact=True)
+
+    print(f"No cache (mixed request):      {t_uncached * 1000:8.1f}ms")
+    print(f"Cold cache:                    {t_cold * 1000:8.1f}ms")
+    print(f"Warm cache (all hits):         {t_warm * 1000:8.1f}ms  {t_uncached / t_warm:.1f}x faster")
+    print(f"Mixed ({len(fresh)} new predicted):     {t_mixed * 1000:8.1f}ms")
+    print(f"Restarted, read from disk:     {t_disk * 1000:8.1f}ms")
+    print(f"In-memory cache: {memory_stats['hits']} hits, {memory_stats['misses']} misses "
+          f"({memory_stats['hit_rate']:.0%}), {memory_stats['bytes'] / 1024 ** 2:.1f} MB")
+    print(f"Restarted cache: {disk_stats['disk_hits']} disk hits ({disk_stats['hit_rate']:.0%})  (outputs identical)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from scripts.backtest import rolling_backtest
+from src.features import make_supervised_frame
+from src.model import train_forecaster
+from src.planner import latest_supervised_rows, scenario_table
+from src.synthetic import synthetic_daily
+
+OUT_DIR = "artifacts/benchmarks"
+STAGES = ("generate", "features", "train", "predict", "scenarios", "backtest")
+
+SCENARIOS = {
+    "Impressions +20%": {"impressions": 1.2},
+    "Impressions -20%": {"impressions": 0.8},
+    "CTR +10%": {"ctr": 1.1},
+    "CTR -10%": {"ctr": 0.9},
+    "Combined": {"impressions": 1.1, "ctr": 1.05},
+}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def max_rss_mb() -> float:
+    """Process peak resident set size so far (ru_maxrss is KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(fn, repeat: int = 1, memory: bool = True):
+    """
+    Best-of-`repeat` wall time of fn(), then (optionally) one extra run under
+    tracemalloc for peak Python/NumPy allocations, so tracing overhead never
+    leaks into the timings. Returns (result, seconds, peak_mb or None).
+    """
+    times = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        finally:
+            tracemalloc.stop()
+    return result, min(times), peak_mb
+
+
+def run_size(n_campaigns: int, n_days: int, stages, seed: int = 0, repeat: int = 1, memory: bool = True, backtest_step: int = 28) -> list:
+    """
+    Run the pipeline stages for one grid point. Stages not selected still run
+    (untimed) when a later selected stage needs their output.
+    """
+    target = "clicks"
+    needed = max(STAGES.index(s) for s in stages)
+    records = []
+    state = {}
+
+    steps = {
+        "generate": lambda: synthetic_daily(n_campaigns, n_days, seed=seed),
+        "features": lambda: make_supervised_frame(state["generate"], target=target),
+        "train": lambda: train_forecaster(state["features"], target=target),
+        "predict": lambda: state["train"].predict(state["features"]),
+        "scenarios": lambda: scenario_table(state["train"], latest_supervised_rows(state["generate"], target=target), SCENARIOS),
+        "backtest": lambda: rolling_backtest(
+            state["features"], target=target, min_train_days=min(45, n_days // 2), step_days=backtest_step,
+        ),
+    }
+    rows_of = {
+        "generate": lambda: len(state["generate"]),
+        "features": lambda: len(state["generate"]),
+        "train": lambda: len(state["features"]),
+        "predict": lambda: len(state["features"]),
+        "scenarios": lambda: (len(SCENARIOS) + 1) * n_campaigns,
+        "backtest": lambda: int(state["backtest"]["n_test"].sum()),
+    }
+
+    for stage in STAGES[:needed + 1]:
+        if stage in stages:
+            state[stage], seconds, peak_mb = measure(steps[stage], repeat=repeat, memory=memory)
+            rows = rows_of[stage]()
+            records.append({
+                "campaigns": n_campaigns,
+                "days": n_days,
+                "stage": stage,
+                "rows": rows,
+                "seconds": seconds,
+                "rows_per_sec": rows / seconds if seconds > 0 else None,
+                "peak_mb": peak_mb,
+                "max_rss_mb": max_rss_mb(),
+            })
+            print(
+                f"{n_campaigns:>7,} x {n_days:<4d} {stage:<10s} {seconds:9.3f}s  {rows:>12,} rows"
+                + (f"  peak {peak_mb:9.1f} MB" if peak_mb is not None else "")
+            )
+        else:
+            state[stage] = steps[stage]()
+    return records
+
+
+def compare(results: list, baseline_path: str, threshold: float = 1.2) -> pd.DataFrame:
+    """Per (size, stage) time and memory ratios against an earlier results file."""
+    with open(baseline_path) as f:
+        base = pd.DataFrame(json.load(f)["results"])
+    cur = pd.DataFrame(results)
+    keys = ["campaigns", "days", "stage"]
+    out = cur[keys + ["seconds", "peak_mb"]].merge(base[keys + ["seconds", "peak_mb"]], on=keys, suffixes=("", "_base"))
+    out["time_ratio"] = out["seconds"] / out["seconds_base"]
+    out["mem_ratio"] = out["peak_mb"].astype(float) / out["peak_mb_base"].astype(float)
+    out["regression"] = (out["time_ratio"] > threshold) | (out["mem_ratio"] > threshold)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time and memory-profile each pipeline stage on seeded synthetic data across a size grid.",
+    )
+    parser.add_argument("--campaigns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--days", type=int, nargs="+", default=[90, 365])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per stage (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--backtest-step", type=int, default=28, help="Days between backtest cutoffs")
+    parser.add_argument("--max-rows", type=int, default=5_000_000, help="Skip grid points with more input rows")
+    parser.add_argument("--out", default=None, help=f"Results JSON (default: {OUT_DIR}/bench_<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to report ratios against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Ratio flagged as a regression")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = []
+    for n_days in args.days:
+        for n_campaigns in args.campaigns:
+            if n_campaigns * n_days > args.max_rows:
+                print(f"{n_campaigns:>7,} x {n_days:<4d} skipped ({n_campaigns * n_days:,} rows > --max-rows)")
+                continue
+            results += run_size(
+                n_campaigns, n_days, args.stages, seed=args.seed, repeat=args.repeat,
+                memory=not args.no_memory, backtest_step=args.backtest_step,
+            )
+
+    payload = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "sklearn": sklearn.__version__,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    out_path = args.out or os.path.join(OUT_DIR, f"bench_{commit}.json")
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"\nSaved benchmark results to: {out_path}")
+
+    if args.compare:
+        cmp = compare(results, args.compare, threshold=args.threshold)
+        print(f"\nAgainst {args.compare} (ratio = current / baseline):")
+        print(cmp[["campaigns", "days", "stage", "seconds", "seconds_base", "time_ratio", "mem_ratio", "regression"]].to_string(index=False))
+        if cmp["regression"].any():
+            print(f"\n{int(cmp['regression'].sum())} stage(s) slower or larger than {args.threshold:.2f}x baseline.")
+
+
+if __name__ == "__main__":
+    main()
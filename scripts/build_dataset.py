@@ -1,9 +1,16 @@
+import argparse
 import os
-import pandas as pd
+import time
+
 import numpy as np
+import pandas as pd
+
+from src import profiling
+from src.store import DAILY_DIR, DAILY_FILE, stored_dates, write_partitions
 
 RAW_PATH = "data/raw/ads.csv"
-OUT_PATH = "data/processed/ads_daily.parquet"
+OUT_PATH = DAILY_FILE
+OUT_DIR = DAILY_DIR
 
 # Your file only has month + day (no year). Choose a year for the time series.
 # You can change this to 2023/2025 etc. It won't affect modeling logic.
@@ -25,94 +32,166 @@ MONTH_MAP = {
 }
 
 
-def parse_month_day_to_date(df: pd.DataFrame) -> pd.Series:
-    if "month" not in df.columns or "day" not in df.columns:
-        raise ValueError("Expected columns 'month' and 'day' in the raw dataset.")
+# Raw export columns -> standard schema
+COL_CAMPAIGN = "campaign_number"
+VALUE_COLS = {
+    "displays": "impressions",
+    "clicks": "clicks",
+    "cost": "cost",
+    "post_click_conversions": "conversions",
+}
+COUNT_COLS = ["impressions", "clicks", "conversions"]
+
+# Only the label columns are pinned; numeric columns are inferred (float64
+# when clean) so dirty cells like "1,200" are coerced in aggregate_chunk
+# instead of failing the read
+RAW_DTYPES = {
+    "month": "category",
+    "day": None,
+    COL_CAMPAIGN: "category",
+    "displays": None,
+    "cost": None,
+    "clicks": None,
+    "post_click_conversions": None,
+}
+
+CHUNK_ROWS = 1_000_000
 
-    m = df["month"].astype(str).str.strip().str.lower()
-    d = pd.to_numeric(df["day"], errors="coerce")
 
-    # Map month names -> month number
-    m_num = m.map(MONTH_MAP)
+def _month_codes(month: pd.Series) -> np.ndarray:
+    """Month numbers for a categorical month column (names mapped once per category)."""
+    cat = month.astype("category").cat
+    names = pd.Index(cat.categories.astype(str)).str.strip().str.lower()
+    lookup = names.map(MONTH_MAP).to_numpy(dtype=np.float64, na_value=np.nan)
 
-    bad_month = m_num.isna()
-    bad_day = d.isna()
+    codes = cat.codes.to_numpy()
+    m_num = np.where(codes >= 0, lookup[codes], np.nan)
 
-    if bad_month.any():
-        samples = df.loc[bad_month, "month"].head(10).tolist()
+    bad = np.isnan(m_num)
+    if bad.any():
+        samples = month[bad].head(10).tolist()
         raise ValueError(f"Unrecognized month values (sample): {samples}")
+    return m_num.astype(np.int64)
+
+
+def parse_month_day_to_date(df: pd.DataFrame) -> pd.Series:
+    if "month" not in df.columns or "day" not in df.columns:
+        raise ValueError("Expected columns 'month' and 'day' in the raw dataset.")
 
+    m_num = _month_codes(df["month"])
+    d = pd.to_numeric(df["day"], errors="coerce").to_numpy(dtype=np.float64)
+
+    bad_day = np.isnan(d)
     if bad_day.any():
         samples = df.loc[bad_day, "day"].head(10).tolist()
         raise ValueError(f"Unrecognized day values (sample): {samples}")
-
-    # Build YYYY-MM-DD
-    date_str = (
-        pd.Series([YEAR] * len(df)).astype(str)
-        + "-"
-        + m_num.astype(int).astype(str).str.zfill(2)
-        + "-"
-        + d.astype(int).astype(str).str.zfill(2)
-    )
-
-    dt = pd.to_datetime(date_str, errors="coerce")
-    if dt.isna().any():
-        bad = dt.isna()
-        samples = date_str[bad].head(10).tolist()
+    d = d.astype(np.int64)
+
+    # YEAR-MM-01 + (day - 1), computed on datetime64 codes (no string round-trip)
+    month_start = np.datetime64(f"{YEAR}-01", "M") + (m_num - 1)
+    month_len = ((month_start + 1).astype("datetime64[D]") - month_start.astype("datetime64[D]")).astype(np.int64)
+    bad = (d < 1) | (d > month_len)
+    if bad.any():
+        samples = [f"{YEAR}-{m:02d}-{dd:02d}" for m, dd in zip(m_num[bad][:10], d[bad][:10])]
         raise ValueError(f"Failed to parse some dates (sample): {samples}")
 
-    return dt
+    dt = month_start.astype("datetime64[D]") + (d - 1)
+    return pd.Series(dt.astype("datetime64[ns]"), index=df.index)
 
 
-def main():
-    if not os.path.exists(RAW_PATH):
-        raise FileNotFoundError(f"Missing {RAW_PATH}. Put your dataset CSV at data/raw/ads.csv")
-
-    df = pd.read_csv(RAW_PATH)
+def aggregate_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Clean one raw chunk and pre-aggregate it to (date, campaign) sums."""
+    for c in [COL_CAMPAIGN] + list(VALUE_COLS):
+        if c not in chunk.columns:
+            raise ValueError(f"Expected column '{c}' not found. Available: {chunk.columns.tolist()}")
 
-    # Drop empty unnamed columns
-    df = df.loc[:, ~df.columns.str.contains(r"^Unnamed", na=False)]
+    # Strip campaign labels once per category; missing values become "nan" as before
+    camp = chunk[COL_CAMPAIGN].astype("category").cat
+    labels = pd.Index(camp.categories.astype(str)).str.strip().append(pd.Index(["nan"]))
+    uniq_codes, uniq_labels = pd.factorize(labels)
+    codes = uniq_codes[camp.codes.to_numpy()]  # code -1 picks the trailing "nan"
 
-    print("Raw columns:", df.columns.tolist())
-    print("Raw preview:\n", df.head(3))
+    out = pd.DataFrame({
+        "date": parse_month_day_to_date(chunk).to_numpy(),
+        "campaign": pd.Categorical.from_codes(codes, categories=uniq_labels),
+    })
+    for raw, std in VALUE_COLS.items():
+        # Clean unparseable / weird negative / missing values before aggregating
+        values = pd.to_numeric(chunk[raw], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        out[std] = np.clip(np.nan_to_num(values, nan=0.0), 0, None)
+
+    agg = out.groupby(["date", "campaign"], observed=True, sort=False).sum()
+    agg = agg.reset_index()
+    agg["campaign"] = agg["campaign"].astype(str)
+    return agg
+
+
+def _merge_partials(parts: list) -> pd.DataFrame:
+    merged = pd.concat(parts, ignore_index=True)
+    return merged.groupby(["date", "campaign"], as_index=False, sort=True).sum()
+
+
+def read_raw_daily(raw_path: str, chunksize: int = CHUNK_ROWS) -> tuple:
+    """
+    Stream the raw CSV in chunks with pinned dtypes, pre-aggregating each
+    chunk by (date, campaign). Partial aggregates are merged as they
+    accumulate, so memory is bounded by the number of distinct
+    (date, campaign) pairs rather than the raw row count.
+    Returns (daily frame, raw row count).
+    """
+    header = pd.read_csv(raw_path, nrows=0).columns
+    missing = [c for c in RAW_DTYPES if c not in header]
+    if missing:
+        raise ValueError(f"Expected columns {missing} not found. Available: {header.tolist()}")
+
+    parts, n_rows, part_rows = [], 0, 0
+    dtypes = {c: t for c, t in RAW_DTYPES.items() if t is not None}
+    reader = pd.read_csv(raw_path, usecols=list(RAW_DTYPES), dtype=dtypes, chunksize=chunksize)
+    for chunk in reader:
+        n_rows += len(chunk)
+        with profiling.span("aggregate_chunk", rows=len(chunk)):
+            agg = aggregate_chunk(chunk)
+        parts.append(agg)
+        part_rows += len(agg)
+        # Fold partials back down once they outgrow a chunk
+        if len(parts) > 1 and part_rows > chunksize:
+            with profiling.span("merge_partials", rows=part_rows):
+                parts = [_merge_partials(parts)]
+            part_rows = len(parts[0])
+
+    if not parts:
+        raise ValueError(f"{raw_path} has no data rows.")
+    with profiling.span("merge_partials", rows=part_rows):
+        out = _merge_partials(parts)
+
+    for c in COUNT_COLS:
+        if np.all(np.mod(out[c].to_numpy(), 1) == 0):
+            out[c] = out[c].astype(np.int64)
+    return out, n_rows
 
-    # Build a real date
-    dt = parse_month_day_to_date(df)
 
-    # Map your dataset columns -> standard schema
-    # campaign: campaign_number
-    # impressions: displays
-    # clicks: clicks
-    # cost: cost
-    # conversions: post_click_conversions
-    col_campaign = "campaign_number"
-    col_impr = "displays"
-    col_clicks = "clicks"
-    col_cost = "cost"
-    col_conv = "post_click_conversions"
+def main():
+    parser = argparse.ArgumentParser(description="Build the processed ads_daily store from the raw export.")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS, help="Raw rows per streamed chunk")
+    parser.add_argument(
+        "--layout", choices=["partitioned", "file"], default="partitioned",
+        help=f"Date-partitioned dataset at {OUT_DIR} or the legacy single file {OUT_PATH}",
+    )
+    parser.add_argument("--buckets", type=int, default=None, help="Campaign buckets per date partition (new stores only)")
+    parser.add_argument("--append", action="store_true", help="Only write dates newer than the store's last date")
+    parser.add_argument("--profile", default=None, help=f"Record stage timings to this trace file (or set {profiling.ENV_VAR})")
+    args = parser.parse_args()
+    profiling.configure(args.profile)
 
-    for c in [col_campaign, col_impr, col_clicks, col_cost, col_conv]:
-        if c not in df.columns:
-            raise ValueError(f"Expected column '{c}' not found. Available: {df.columns.tolist()}")
+    if not os.path.exists(RAW_PATH):
+        raise FileNotFoundError(f"Missing {RAW_PATH}. Put your dataset CSV at data/raw/ads.csv")
 
-    out = pd.DataFrame({
-        "date": dt.dt.date,
-        "campaign": df[col_campaign].astype(str).str.strip(),
-        "impressions": pd.to_numeric(df[col_impr], errors="coerce"),
-        "clicks": pd.to_numeric(df[col_clicks], errors="coerce"),
-        "cost": pd.to_numeric(df[col_cost], errors="coerce"),
-        "conversions": pd.to_numeric(df[col_conv], errors="coerce"),
-    }).fillna(0)
-
-    # Clean weird negatives
-    for c in ["impressions", "clicks", "cost", "conversions"]:
-        out[c] = out[c].clip(lower=0)
-
-    # Aggregate to daily per campaign
-    out = (
-        out.groupby(["date", "campaign"], as_index=False)
-           .agg({"impressions": "sum", "clicks": "sum", "cost": "sum", "conversions": "sum"})
-    )
+    t0 = time.perf_counter()
+    with profiling.span("read_raw") as s:
+        out, n_raw = read_raw_daily(RAW_PATH, chunksize=args.chunksize)
+        s.rows = n_raw
+    elapsed = time.perf_counter() - t0
+    print(f"Ingested {n_raw:,} raw rows in {elapsed:.2f}s ({n_raw / max(elapsed, 1e-9):,.0f} rows/sec)")
 
     # Derived KPIs (avoid divide by zero)
     out["ctr"] = out["clicks"] / out["impressions"].replace(0, 1)
@@ -136,9 +215,20 @@ def main():
             "Your raw dataset might contain only one day OR month/day parsing failed."
         )
 
-    os.makedirs(os.path.dirname(OUT_PATH), exist_ok=True)
-    out.to_parquet(OUT_PATH, index=False)
-    print(f"\nSaved {len(out):,} rows to {OUT_PATH}")
+    if args.layout == "file":
+        os.makedirs(os.path.dirname(OUT_PATH), exist_ok=True)
+        with profiling.span("write_parquet", rows=len(out)):
+            out.to_parquet(OUT_PATH, index=False)
+        print(f"\nSaved {len(out):,} rows to {OUT_PATH}")
+        return
+
+    if args.append and os.path.isdir(OUT_DIR):
+        existing = stored_dates(OUT_DIR)
+        if len(existing):
+            out = out[out["date"] > existing.max()]
+    with profiling.span("write_partitions", rows=len(out)):
+        written = write_partitions(out, OUT_DIR, buckets=args.buckets)
+    print(f"\nSaved {len(out):,} rows in {len(written)} date partition(s) to {OUT_DIR}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+import argparse
+import os
+
+import joblib
+
+from src.horizon import HORIZONS, horizon_totals, recursive_forecast
+from src.planner import load_context_state
+from src.store import default_daily_path
+
+DATA_PATH = default_daily_path()
+MODEL_PATH = "artifacts/models/forecaster_clicks.joblib"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recursive 7/14/28-day forecasts for every campaign.")
+    parser.add_argument("--horizon", type=int, default=max(HORIZONS))
+    args = parser.parse_args()
+
+    if not os.path.exists(DATA_PATH):
+        raise FileNotFoundError("Run build_dataset first.")
+    if not os.path.exists(MODEL_PATH):
+        raise FileNotFoundError("Run train_forecaster first.")
+
+    bundle = joblib.load(MODEL_PATH)
+    # Same campaigns as the planner's next-day context, sparse ones included
+    state = load_context_state(DATA_PATH, target=bundle.target)
+
+    scenarios = {
+        "Impressions +20%": {"impressions": 1.2},
+        "Impressions -20%": {"impressions": 0.8},
+        "CTR -10%": {"ctr": 0.9},
+        "CTR +10%": {"ctr": 1.1},
+    }
+    fc = recursive_forecast(bundle, state, horizon=args.horizon, scenarios=scenarios)
+    totals = horizon_totals(fc, [h for h in HORIZONS if h <= args.horizon] or [args.horizon])
+
+    print("\nCumulative forecast by horizon:")
+    print(totals.groupby(["scenario", "horizon_days"])[f"pred_{bundle.target}"].sum().unstack())
+
+    os.makedirs("artifacts/forecasts", exist_ok=True)
+    out_csv = f"artifacts/forecasts/horizon_{bundle.target}.csv"
+    fc.to_csv(out_csv, index=False)
+    print(f"\nSaved daily horizon forecasts to: {out_csv}")
+
+
+if __name__ == "__main__":
+    main()
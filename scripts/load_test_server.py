@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+
+async def _request(reader, writer, host: str, method: str, path: str, payload=None) -> tuple:
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    status = int(head[0].split(" ")[1])
+    length = next(int(line.split(":", 1)[1]) for line in head[1:] if line.lower().startswith("content-length"))
+    return status, await reader.readexactly(length)
+
+
+def random_request(rng: np.random.Generator, n_scenarios: int) -> dict:
+    scenarios = {
+        f"s{i}": {"impressions": round(float(rng.uniform(0.5, 1.5)), 3), "ctr": round(float(rng.uniform(0.8, 1.2)), 3)}
+        for i in range(n_scenarios)
+    }
+    return {"scenarios": scenarios, "deltas": True}
+
+
+async def _client(host: str, port: int, n_requests: int, n_scenarios: int, seed: int, latencies: list, errors: list):
+    rng = np.random.default_rng(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(n_requests):
+            t0 = time.perf_counter()
+            status, body = await _request(reader, writer, host, "POST", "/scenarios", random_request(rng, n_scenarios))
+            latencies.append(time.perf_counter() - t0)
+            if status != 200:
+                errors.append((status, body[:200]))
+    finally:
+        writer.close()
+
+
+async def run(host: str, port: int, clients: int, requests: int, n_scenarios: int, seed: int) -> dict:
+    latencies, errors = [], []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, requests, n_scenarios, seed + i, latencies, errors) for i in range(clients)
+    ))
+    elapsed = time.perf_counter() - t0
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, body = await _request(reader, writer, host, "GET", "/stats")
+    writer.close()
+
+    lat_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "req_per_sec": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+        "p99_ms": float(np.percentile(lat_ms, 99)),
+        "server": json.loads(body)["stats"],
+        "first_error": errors[0] if errors else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load generator for scripts.serve_forecasts.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent keep-alive connections")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--scenarios", type=int, default=3, help="Scenarios per request")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    res = asyncio.run(run(args.host, args.port, args.clients, args.requests, args.scenarios, args.seed))
+    print(f"Requests: {res['requests']:,} ({res['errors']} errors) in {res['seconds']:.2f}s "
+          f"-> {res['req_per_sec']:,.0f} req/s")
+    print(f"Latency ms: p50 {res['p50_ms']:.1f} | p95 {res['p95_ms']:.1f} | p99 {res['p99_ms']:.1f}")
+    print(f"Server: {res['server']['batches']:,} batches, mean batch size {res['server']['mean_batch_size']:.1f}, "
+          f"max {res['server']['max_batch_seen']}")
+    if res["first_error"]:
+        print("First error:", res["first_error"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import os
+import time
+
+import joblib
+
+from src.budget import allocate_budget
+from src.planner import load_context_rows
+from src.store import default_daily_path
+
+DATA_PATH = default_daily_path()
+MODEL_PATH = "artifacts/models/forecaster_clicks.joblib"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Allocate next-day budget across campaigns.")
+    parser.add_argument("--budget", type=float, default=None, help="Total budget (default: current total spend)")
+    parser.add_argument("--budget-mult", type=float, default=1.0, help="Scale the current total spend instead of --budget")
+    parser.add_argument("--min-mult", type=float, default=0.5)
+    parser.add_argument("--max-mult", type=float, default=1.5)
+    parser.add_argument("--points", type=int, default=41, help="Response-curve points per campaign")
+    args = parser.parse_args()
+
+    if not os.path.exists(DATA_PATH):
+        raise FileNotFoundError("Run build_dataset first.")
+    if not os.path.exists(MODEL_PATH):
+        raise FileNotFoundError("Run train_forecaster first.")
+
+    bundle = joblib.load(MODEL_PATH)
+    base = load_context_rows(DATA_PATH, target=bundle.target, feature_cols=bundle.feature_cols)
+    if len(base) == 0:
+        raise RuntimeError("No rows available for budget allocation.")
+
+    budget = args.budget if args.budget is not None else float(base["cost"].sum()) * args.budget_mult
+
+    t0 = time.perf_counter()
+    alloc = allocate_budget(
+        bundle, base, total_budget=budget, min_mult=args.min_mult, max_mult=args.max_mult, n_points=args.points,
+    )
+    elapsed = time.perf_counter() - t0
+
+    target = bundle.target
+    print(alloc)
+    print(f"\nBudget: {budget:,.2f} | Allocated: {alloc['alloc_cost'].sum():,.2f}")
+    print(f"Predicted {target}: {alloc[f'base_{target}'].sum():,.1f} -> {alloc[f'pred_{target}'].sum():,.1f}")
+    print(f"Solved {len(alloc):,} campaigns in {elapsed:.2f}s")
+
+    os.makedirs("artifacts/forecasts", exist_ok=True)
+    out_csv = f"artifacts/forecasts/budget_allocation_{target}.csv"
+    alloc.to_csv(out_csv, index=False)
+    print(f"\nSaved allocation to: {out_csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import copy
+import os
+
+from src import profiling
+from src.conformal import residuals_path
+from src.model import tuned_params_path
+from src.pipeline import MANIFEST_FILE, PIPELINE_DIR, Stage, dependencies, run_pipeline
+from src.store import DAILY_DIR
+
+RAW_PATH = "data/raw/ads.csv"
+MODEL_PATH = "artifacts/models/forecaster_clicks.joblib"
+
+# The nightly job; dependencies follow from the paths (train and backtest both read the store; train also
+# reads the params saved by scripts.tune_forecaster, so a new tuning run retrains)
+STAGES = [
+    Stage("build", "scripts.build_dataset", inputs=[RAW_PATH], outputs=[DAILY_DIR]),
+    Stage("train", "scripts.train_forecaster", inputs=[DAILY_DIR, tuned_params_path("clicks")], outputs=[MODEL_PATH]),
+    Stage(
+        "backtest", "scripts.backtest", inputs=[DAILY_DIR],
+        outputs=[
+            "artifacts/forecasts/backtest_clicks.csv",
+            "artifacts/forecasts/backtest_by_campaign_clicks.csv",
+            "artifacts/forecasts/backtest_by_dow_clicks.csv",
+            "artifacts/forecasts/backtest_by_horizon_clicks.csv",
+            residuals_path("clicks"),
+        ],
+    ),
+    Stage(
+        "scenarios", "scripts.scenario_analysis", inputs=[DAILY_DIR, MODEL_PATH],
+        outputs=["artifacts/forecasts/scenario_analysis_clicks.csv"],
+    ),
+]
+
+
+def main():
+    names = [s.name for s in STAGES]
+    parser = argparse.ArgumentParser(description="Run build -> train / backtest -> scenarios, skipping up-to-date stages.")
+    parser.add_argument("stages", nargs="*", help=f"Stages to bring up to date, with their upstream stages (default: all of {names})")
+    parser.add_argument("--force", nargs="+", default=[], choices=names, help="Run these stages even when up to date")
+    parser.add_argument("--workers", type=int, default=2, help="Stages run concurrently")
+    parser.add_argument("--backtest-workers", type=int, default=1, help="Process pool size inside the backtest stage")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which stages are stale")
+    parser.add_argument("--state-dir", default=PIPELINE_DIR, help="Pipeline state, logs and run manifests")
+    parser.add_argument("--profile", default=None, help=f"Record stage timings to this trace file (or set {profiling.ENV_VAR})")
+    args = parser.parse_args()
+    profiling.configure(args.profile)
+
+    stages = copy.deepcopy(STAGES)
+    if args.backtest_workers > 1:
+        next(s for s in stages if s.name == "backtest").args += ["--workers", str(args.backtest_workers)]
+
+    deps = dependencies(stages)
+    print("Pipeline: " + ", ".join(f"{n} <- {'+'.join(d) or '(raw)'}" for n, d in deps.items()))
+    manifest = run_pipeline(
+        stages, targets=args.stages or None, force=args.force, workers=args.workers,
+        dry_run=args.dry_run, state_dir=args.state_dir,
+    )
+
+    print(f"\nFinished in {manifest['seconds']:.1f}s")
+    for name, r in manifest["stages"].items():
+        print(f"  {name:<10} {r['status']:<8} {r['seconds']:7.1f}s  (hashing {r['hash_seconds'] * 1000:6.0f} ms)")
+    if not args.dry_run:
+        print(f"Saved run manifest to: {os.path.join(args.state_dir, MANIFEST_FILE)}")
+
+    failed = [n for n, r in manifest["stages"].items() if r["status"] in ("failed", "blocked")]
+    if failed:
+        raise RuntimeError(f"Pipeline stages did not complete: {failed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,43 @@
+import argparse
 import os
 import joblib
-import pandas as pd
-import numpy as np
 
-from src.features import make_supervised_frame
+from src import profiling
+from src.artifacts import model_version
+from src.planner import SCENARIO_CACHE_DIR, ScenarioCache, load_context_rows, scenario_table
+from src.store import default_daily_path
 
-DATA_PATH = "data/processed/ads_daily.parquet"
+DATA_PATH = default_daily_path()
 MODEL_PATH = "artifacts/models/forecaster_clicks.joblib"
 
 
-def apply_scenario(
-    df: pd.DataFrame,
-    scenario: dict,
-) -> pd.DataFrame:
-    """
-    Apply a scenario by modifying selected feature columns.
-    Example:
-      {"impressions": 1.2}  -> +20% impressions
-      {"ctr": 0.9}          -> -10% CTR
-    """
-    out = df.copy()
-    for col, multiplier in scenario.items():
-        if col not in out.columns:
-            raise ValueError(f"Scenario column '{col}' not found in dataframe.")
-        out[col] = out[col] * multiplier
-    return out
-
-
 def main():
+    parser = argparse.ArgumentParser(description="Scenario analysis on the latest context day.")
+    parser.add_argument("--cache-dir", default=SCENARIO_CACHE_DIR, help="Where scenario results persist between runs")
+    parser.add_argument("--no-cache", action="store_true", help="Predict every scenario, ignoring cached results")
+    parser.add_argument("--profile", default=None, help=f"Record stage timings to this trace file (or set {profiling.ENV_VAR})")
+    args = parser.parse_args()
+    profiling.configure(args.profile)
+
     if not os.path.exists(DATA_PATH):
         raise FileNotFoundError("Run build_dataset first.")
     if not os.path.exists(MODEL_PATH):
         raise FileNotFoundError("Run train_forecaster first.")
 
-    # Load data + model
-    df = pd.read_parquet(DATA_PATH)
-    df["date"] = pd.to_datetime(df["date"])
-
-    bundle = joblib.load(MODEL_PATH)
+    # Load model + latest context (only the recent partitions are read)
+    with profiling.span("load_model"):
+        bundle = joblib.load(MODEL_PATH)
     target = bundle.target
 
-    # Build supervised frame
-    sup = make_supervised_frame(df, target=target, group_col="campaign")
-
-    # Use the most recent available day as baseline
-    latest_date = sup["date"].max()
-    base = sup[sup["date"] == latest_date].copy()
+    # Use the most recent available day as baseline (built from per-campaign state)
+    base = load_context_rows(DATA_PATH, target=target, feature_cols=bundle.feature_cols)
 
     if len(base) == 0:
         raise RuntimeError("No rows available for scenario analysis.")
 
     # Baseline prediction
-    base_pred = bundle.predict(base)
+    with profiling.span("baseline_predict", rows=len(base)):
+        base_pred = bundle.predict(base)
     base["pred_clicks"] = base_pred
 
     print("\nBaseline forecast (next-day clicks):")
@@ -67,18 +53,14 @@ def main():
         "CTR +10%": {"ctr": 1.1},
     }
 
-    results = []
-
-    for name, changes in scenarios.items():
-        scen_df = apply_scenario(base, changes)
-        scen_pred = bundle.predict(scen_df)
-
-        tmp = base[["campaign"]].copy()
-        tmp["scenario"] = name
-        tmp["pred_clicks"] = scen_pred
-        results.append(tmp)
-
-    res = pd.concat(results, ignore_index=True)
+    cache = None if args.no_cache else ScenarioCache(path=args.cache_dir)
+    scen = scenario_table(bundle, base, scenarios, cache=cache, model_key=model_version(MODEL_PATH))
+    res = scen.loc[scen["scenario"] != "Baseline", ["campaign", "scenario", "pred_clicks"]]
+    # scenario_table sorts by scenario and prediction; keep scenario order, then context campaign order
+    scen_pos = {name: i for i, name in enumerate(scenarios)}
+    camp_pos = {c: i for i, c in enumerate(base["campaign"].astype(str))}
+    order = res["scenario"].map(scen_pos) * len(camp_pos) + res["campaign"].astype(str).map(camp_pos)
+    res = res.iloc[order.to_numpy().argsort(kind="stable")].reset_index(drop=True)
 
     print("\nScenario analysis results:")
     print(res)
@@ -86,8 +68,13 @@ def main():
     # Save results
     os.makedirs("artifacts/forecasts", exist_ok=True)
     out_csv = "artifacts/forecasts/scenario_analysis_clicks.csv"
-    res.to_csv(out_csv, index=False)
+    with profiling.span("write_results", rows=len(res)):
+        res.to_csv(out_csv, index=False)
     print(f"\nSaved scenario results to: {out_csv}")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Scenario cache: {stats['hits'] + stats['disk_hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate)")
 
 
 if __name__ == "__main__":
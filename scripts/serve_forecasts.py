@@ -0,0 +1,44 @@
+import argparse
+import asyncio
+import os
+
+from src.conformal import residuals_path
+from src.server import ForecastService
+from src.store import default_daily_path
+
+DATA_PATH = default_daily_path()
+MODEL_PATH = "artifacts/models/forecaster_clicks.joblib"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-lived micro-batching forecast / scenario HTTP server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--window-ms", type=float, default=5.0, help="How long a batch waits for more requests")
+    parser.add_argument("--max-batch", type=int, default=64, help="Requests coalesced into one predict at most")
+    parser.add_argument("--reload-interval", type=float, default=2.0, help="Seconds between artifact checks (0 = never)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        raise FileNotFoundError(f"Missing {args.data}. Run: python -m scripts.build_dataset")
+    if not os.path.exists(args.model):
+        raise FileNotFoundError(f"Missing {args.model}. Run: python -m scripts.train_forecaster")
+
+    service = ForecastService(
+        args.model,
+        args.data,
+        residuals_path=residuals_path("clicks"),
+        window_ms=args.window_ms,
+        max_batch=args.max_batch,
+        reload_interval=args.reload_interval,
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,150 @@
+import argparse
+import json
 import os
 import joblib
 import pandas as pd
 
-from src.features import make_supervised_frame
-from src.model import train_forecaster
+from src import profiling
+from src.feature_block import feature_block
+from src.feature_cache import cached_supervised_frame
+from src.store import default_daily_path, store_columns
+from src.features import TARGETS
+from src.model import load_tuned_params, train_forecaster, train_multi_target, tuned_params_path
+from src.out_of_core import MAX_FIT_BYTES, cached_disk_matrix, train_out_of_core
 
-DATA_PATH = "data/processed/ads_daily.parquet"
+DATA_PATH = default_daily_path()
 OUT_PATH = "artifacts/models/forecaster_clicks.joblib"
+MULTI_OUT_PATH = "artifacts/models/forecaster_multi.joblib"
+VAL_DAYS = 14
+
+
+def time_split(sup: pd.DataFrame, val_days: int = VAL_DAYS):
+    # Time split (last `val_days` days as validation)
+    max_date = sup["date"].max()
+    cutoff = max_date - pd.Timedelta(days=val_days)
+    return sup[sup["date"] <= cutoff].copy(), sup[sup["date"] > cutoff].copy()
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Train the next-day forecaster.")
+    parser.add_argument(
+        "--targets", nargs="+", default=["clicks"],
+        help="KPIs to train; more than one (or 'all') writes a multi-target bundle",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size for multi-target training")
+    parser.add_argument("--float32", action="store_true", help="Fit a single target on a contiguous float32 feature block")
+    parser.add_argument(
+        "--prune", type=float, default=None, metavar="SHARE",
+        help="Refit a single target on the fewest features covering this share of split gain (e.g. 0.99)",
+    )
+    parser.add_argument(
+        "--out-of-core", action="store_true",
+        help="Stream features into an on-disk float32 matrix and fit from it (single target)",
+    )
+    parser.add_argument(
+        "--params", default=None, metavar="JSON",
+        help="make_regressor overrides as a JSON object (default: the params saved by scripts.tune_forecaster, if any)",
+    )
+    parser.add_argument("--default-params", action="store_true", help="Ignore tuned params and fit make_regressor's defaults")
+    parser.add_argument("--max-rows", type=int, default=None, help="With --out-of-core: fit on a seeded subsample of this many rows")
+    parser.add_argument("--seed", type=int, default=0, help="Subsample seed for --max-rows")
+    parser.add_argument(
+        "--fit-budget-mb", type=float, default=MAX_FIT_BYTES / 1024 ** 2,
+        help="With --out-of-core: refuse fits estimated to need more memory than this (set --max-rows to stay under)",
+    )
+    parser.add_argument("--profile", default=None, help=f"Record stage timings to this trace file (or set {profiling.ENV_VAR})")
+    args = parser.parse_args()
+    profiling.configure(args.profile)
+
     if not os.path.exists(DATA_PATH):
         raise FileNotFoundError(f"Missing {DATA_PATH}. Run: python -m scripts.build_dataset")
 
-    df = pd.read_parquet(DATA_PATH)
-    df["date"] = pd.to_datetime(df["date"])
+    single = args.targets != ["all"] and len(args.targets) == 1
+    if args.out_of_core and not single:
+        raise ValueError("--out-of-core trains one target at a time.")
 
-    target = "clicks"  # start here
-    sup = make_supervised_frame(df, target=target, group_col="campaign")
+    params = None
+    if args.params is not None:
+        params = json.loads(args.params)
+        if not isinstance(params, dict):
+            raise ValueError("--params must be a JSON object.")
+    if single:
+        # Retrains keep the tuned model: the saved params apply unless overridden
+        source = "--params"
+        if params is None and not args.default_params:
+            params, source = load_tuned_params(args.targets[0]), tuned_params_path(args.targets[0])
+        print(f"Params: {params} (from {source})" if params else "Params: make_regressor defaults")
+    elif params is not None:
+        print("--params applies to single-target training only; ignoring it.")
 
-    # Time split (last 14 days as validation)
-    max_date = sup["date"].max()
-    cutoff = max_date - pd.Timedelta(days=14)
+    if args.out_of_core:
+        target = args.targets[0]
+        matrix = cached_disk_matrix(DATA_PATH, target=target)
+        dates = matrix.column("dates")
+        first, last = pd.Timestamp(dates.min()), pd.Timestamp(dates.max())
+        train_rows = matrix.rows_through(last - pd.Timedelta(days=VAL_DAYS))
+        n_train, n_val = len(train_rows), matrix.n_rows - len(train_rows)
+
+        with profiling.span("fit", rows=min(n_train, args.max_rows or n_train), target=target):
+            bundle = train_out_of_core(
+                matrix, rows=train_rows, max_rows=args.max_rows, seed=args.seed, prune=args.prune,
+                params=params, max_bytes=int(args.fit_budget_mb * 1024 ** 2),
+            )
+        if args.max_rows is not None and args.max_rows < n_train:
+            print(f"Fitted on a {args.max_rows:,}-row subsample (seed {args.seed})")
+    elif single:
+        target = args.targets[0]
+        sup = cached_supervised_frame(DATA_PATH, target=target, group_col="campaign")
+        train_df, val_df = time_split(sup)
+        n_train, n_val = len(train_df), len(val_df)
+        first, last = sup["date"].min(), sup["date"].max()
+
+        with profiling.span("fit", rows=len(train_df), target=target):
+            bundle = train_forecaster(
+                feature_block(train_df, target) if args.float32 else train_df, target=target,
+                prune=args.prune, params=params,
+            )
+
+    if single:
+        out_path = OUT_PATH if target == "clicks" else f"artifacts/models/forecaster_{target}.joblib"
+        feature_count = len(bundle.feature_cols)
+        if bundle.importance is not None:
+            dropped = [c for c in bundle.importance if c not in bundle.feature_cols]
+            print(f"Pruned {len(dropped)} of {len(bundle.importance)} features: {dropped}")
+    else:
+        columns = store_columns(DATA_PATH)
+        requested = TARGETS if args.targets == ["all"] else args.targets
+        targets = [t for t in requested if t in columns]
+        skipped = [t for t in requested if t not in columns]
+        if skipped:
+            print(f"Skipping targets missing from {DATA_PATH}: {skipped}")
 
-    train_df = sup[sup["date"] <= cutoff].copy()
-    val_df = sup[sup["date"] > cutoff].copy()
+        if args.prune is not None:
+            print("--prune applies to single-target training only; ignoring it.")
+        if args.float32:
+            print("--float32 applies to single-target training only; ignoring it.")
+        sup = cached_supervised_frame(DATA_PATH, target=targets, group_col="campaign")
+        train_df, val_df = time_split(sup)
+        n_train, n_val = len(train_df), len(val_df)
+        first, last = sup["date"].min(), sup["date"].max()
 
-    bundle = train_forecaster(train_df, target=target)
+        with profiling.span("fit", rows=len(train_df), targets=",".join(targets)):
+            bundle = train_multi_target(train_df, targets=targets, workers=args.workers)
+        out_path = MULTI_OUT_PATH
+        feature_count = len(set().union(*(b.feature_cols for b in bundle.bundles.values())))
+        print(f"Targets: {bundle.targets}")
 
-    os.makedirs(os.path.dirname(OUT_PATH), exist_ok=True)
-    joblib.dump(bundle, OUT_PATH)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with profiling.span("save_model"):
+        # Write then rename so a running forecast server never loads a half-written model
+        tmp_path = f"{out_path}.{os.getpid()}.tmp"
+        joblib.dump(bundle, tmp_path)
+        os.replace(tmp_path, out_path)
 
-    print(f"Saved model to: {OUT_PATH}")
-    print(f"Train rows: {len(train_df):,} | Val rows: {len(val_df):,}")
-    print(f"Feature count: {len(bundle.feature_cols)}")
-    print("Date range:", sup["date"].min().date(), "→", sup["date"].max().date())
+    print(f"Saved model to: {out_path}")
+    print(f"Train rows: {n_train:,} | Val rows: {n_val:,}")
+    print(f"Feature count: {feature_count}")
+    print("Date range:", first.date(), "→", last.date())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,248 @@
+"""
+Hyperparameter search for the next-day forecaster by successive halving.
+
+Every trial is scored on the rolling-backtest folds of one cached
+supervised frame. Early rungs fit few boosting iterations on a few of the
+most recent folds; after each rung only the best 1/eta configurations move
+on to more iterations and more folds, so weak configurations cost a small
+fraction of a full backtest. (config, fold) fits run in a shared_pool
+process pool over one memory-mapped copy of the feature matrix.
+
+The winner is refitted on the training split and saved as the forecaster
+bundle, with its params and the per-trial log (scores and timings). The
+params are also written next to the model, where train_forecaster picks
+them up on later retrains.
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from scripts.backtest import backtest_cutoffs
+from scripts.train_forecaster import OUT_PATH, time_split
+from src import profiling
+from src.feature_cache import cached_supervised_frame
+from src.metrics import MetricsAccumulator
+from src.model import feature_columns, make_regressor, save_tuned_params, train_forecaster
+from src.shared_pool import shared_array, shared_map
+from src.store import default_daily_path
+
+DATA_PATH = default_daily_path()
+TRIALS_PATH = "artifacts/forecasts/tuning_trials_{target}.csv"
+
+# make_regressor overrides sampled per configuration
+SEARCH_SPACE = {
+    "learning_rate": [0.03, 0.05, 0.1, 0.2],
+    "max_depth": [3, 4, 6, 8, None],
+    "max_leaf_nodes": [15, 31, 63],
+    "min_samples_leaf": [10, 20, 50, 100],
+    "l2_regularization": [0.0, 0.1, 1.0],
+}
+METRICS = ("mae", "rmse", "mape")
+
+
+def sample_configs(n_configs: int, space: dict = SEARCH_SPACE, seed: int = 0) -> list:
+    """
+    `n_configs` distinct parameter dicts drawn from `space`; the first is
+    make_regressor's defaults, so the current model is always a candidate.
+    """
+    grid_size = math.prod(len(v) for v in space.values())
+    if n_configs > grid_size:
+        raise ValueError(f"Asked for {n_configs} configs but the search space has only {grid_size}.")
+
+    configs, seen = [{}], {()}
+    rng = np.random.default_rng(seed)
+    while len(configs) < n_configs:
+        params = {name: values[rng.integers(len(values))] for name, values in space.items()}
+        key = tuple(sorted(params.items()))
+        if key not in seen:
+            seen.add(key)
+            configs.append(params)
+    return configs
+
+
+def halving_schedule(n_configs: int, n_folds: int, max_iter: int, eta: int = 3, min_iter: int = 10) -> list:
+    """
+    (configs, max_iter, folds) per rung. The last rung fits max_iter on all
+    folds; each earlier rung keeps eta times more configs on 1/eta of the
+    iterations and folds.
+    """
+    if eta < 2:
+        raise ValueError("eta must be at least 2.")
+    n_rungs = max(1, int(math.floor(math.log(n_configs, eta) + 1e-9)))
+    schedule = []
+    for r in range(n_rungs):
+        scale = eta ** (n_rungs - 1 - r)
+        schedule.append((
+            max(1, math.ceil(n_configs / eta ** r)),
+            max(min_iter, int(round(max_iter / scale))),
+            max(1, math.ceil(n_folds / scale)),
+        ))
+    return schedule
+
+
+def rung_folds(bounds: list, k: int) -> list:
+    """k folds spread over the backtest, always including the most recent."""
+    step = max(1, len(bounds) // k)
+    return sorted(bounds[::-1][::step][:k])
+
+
+def _score_trial(task) -> dict:
+    config_id, params, train_end, test_end = task
+    X, y = shared_array("X"), shared_array("y")
+
+    t0 = time.perf_counter()
+    model = make_regressor(**params)
+    model.fit(X[:train_end], y[:train_end])
+    totals = MetricsAccumulator().update(y[train_end:test_end], model.predict(X[train_end:test_end])).totals()
+    return {
+        "config": config_id,
+        "n_iter": model.n_iter_,
+        "seconds": time.perf_counter() - t0,
+        **{m: totals[m] for m in METRICS},
+    }
+
+
+@profiling.traced("successive_halving")
+def successive_halving(
+    sup: pd.DataFrame,
+    target: str,
+    configs: list,
+    max_iter: int = 500,
+    eta: int = 3,
+    metric: str = "mae",
+    min_train_days: int = 45,
+    step_days: int = 7,
+    workers: int = 1,
+):
+    """
+    Successive halving over `configs` (make_regressor overrides) on the
+    rolling-backtest folds of `sup`. Within a rung every configuration sees
+    the same folds and iteration budget, and is ranked by its mean `metric`
+    over them. Returns (best params, trial log with one row per config and
+    rung).
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}; expected one of {METRICS}.")
+    sup = sup.sort_values("date", kind="stable").reset_index(drop=True)
+    folds = backtest_cutoffs(sup["date"].to_numpy(), min_train_days=min_train_days, step_days=step_days)
+    if not folds:
+        raise ValueError("Not enough history for a single backtest fold.")
+    bounds = [(train_end, test_end) for _, train_end, test_end in folds]
+    schedule = halving_schedule(len(configs), len(bounds), max_iter, eta)
+
+    arrays = {
+        "X": sup[feature_columns(sup, target)].to_numpy(dtype=np.float64),
+        "y": sup[target].to_numpy(dtype=np.float64),
+    }
+
+    records = []
+    alive = list(range(len(configs)))
+
+    def run_rungs(run):
+        nonlocal alive
+        for rung, (_, n_iter, k) in enumerate(schedule):
+            chosen = rung_folds(bounds, k)
+            tasks = [
+                (c, {**configs[c], "max_iter": n_iter}, train_end, test_end)
+                for c in alive for train_end, test_end in chosen
+            ]
+            t0 = time.perf_counter()
+            with profiling.span("halving_rung", rung=rung, configs=len(alive), folds=k, max_iter=n_iter):
+                results = run(tasks)
+            wall = time.perf_counter() - t0
+
+            by_config = pd.DataFrame(results).groupby("config", sort=False)
+            scores = by_config[list(METRICS)].mean()
+            n_iters, fit_seconds = by_config["n_iter"].mean(), by_config["seconds"].sum()
+            ranked = scores[metric].sort_values(kind="stable").index.tolist()
+            survivors = ranked[:schedule[rung + 1][0]] if rung + 1 < len(schedule) else ranked[:1]
+            for c in alive:
+                records.append({
+                    "rung": rung,
+                    "config": c,
+                    "params": json.dumps(configs[c], sort_keys=True),
+                    "max_iter": n_iter,
+                    "folds": k,
+                    **scores.loc[c].to_dict(),
+                    "n_iter": float(n_iters[c]),
+                    "fit_seconds": float(fit_seconds[c]),
+                    "rung_wall_seconds": wall,
+                    "promoted": c in survivors,
+                })
+            print(f"Rung {rung}: {len(alive)} configs x {k} folds @ {n_iter} iters in {wall:.1f}s "
+                  f"(best {metric} {scores[metric].min():.4f})")
+            alive = survivors
+
+    # One pool for the whole search: workers map the matrix once
+    with shared_map(arrays, workers, prefix="tune_") as run:
+        run_rungs(lambda tasks: run(_score_trial, tasks))
+
+    best = {**configs[alive[0]], "max_iter": max_iter}
+    return best, pd.DataFrame(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the forecaster's hyperparameters by successive halving.")
+    parser.add_argument("--target", default="clicks")
+    parser.add_argument("--configs", type=int, default=27, help="Configurations in the first rung")
+    parser.add_argument("--eta", type=int, default=3, help="Keep the best 1/eta configurations per rung")
+    parser.add_argument("--max-iter", type=int, default=500, help="Boosting iterations in the final rung")
+    parser.add_argument("--metric", default="mae", choices=METRICS)
+    parser.add_argument("--step-days", type=int, default=7, help="Days between backtest cutoffs")
+    parser.add_argument("--workers", type=int, default=1, help="Process pool size for trials")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for sampling configurations")
+    parser.add_argument("--profile", default=None, help=f"Record stage timings to this trace file (or set {profiling.ENV_VAR})")
+    args = parser.parse_args()
+    profiling.configure(args.profile)
+
+    if not os.path.exists(DATA_PATH):
+        raise FileNotFoundError(f"Missing {DATA_PATH}. Run: python -m scripts.build_dataset")
+
+    target = args.target
+    sup = cached_supervised_frame(DATA_PATH, target=target, group_col="campaign")
+    configs = sample_configs(args.configs, seed=args.seed)
+
+    t0 = time.perf_counter()
+    best, trials = successive_halving(
+        sup, target, configs,
+        max_iter=args.max_iter, eta=args.eta, metric=args.metric,
+        step_days=args.step_days, workers=args.workers,
+    )
+    search_s = time.perf_counter() - t0
+    print(f"Search: {len(trials)} trials in {search_s:.1f}s ({trials['fit_seconds'].sum():.1f}s of fits)")
+    print(f"Best params: {best}")
+
+    train_df, _ = time_split(sup)
+    with profiling.span("fit", rows=len(train_df), target=target):
+        bundle = train_forecaster(train_df, target=target, params=best)
+    bundle.trials = trials.to_dict(orient="records")
+
+    out_path = OUT_PATH if target == "clicks" else f"artifacts/models/forecaster_{target}.joblib"
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with profiling.span("save_model"):
+        tmp_path = f"{out_path}.{os.getpid()}.tmp"
+        joblib.dump(bundle, tmp_path)
+        os.replace(tmp_path, out_path)
+
+    params_path = save_tuned_params(best, target)
+
+    trials_path = TRIALS_PATH.format(target=target)
+    os.makedirs(os.path.dirname(trials_path), exist_ok=True)
+    trials.to_csv(trials_path, index=False)
+
+    final = trials[trials["rung"] == trials["rung"].max()].sort_values(args.metric)
+    with pd.option_context("display.width", 160, "display.max_colwidth", 90, "display.float_format", "{:,.4f}".format):
+        print(final[["config", "params", "folds", "max_iter", *METRICS, "fit_seconds"]].to_string(index=False))
+    print(f"Saved model to: {out_path}")
+    print(f"Saved tuned params to: {params_path}")
+    print(f"Saved trial log to: {trials_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
+import pandas as pd
+
+from src.conformal import ResidualStore
+from src.planner import ScenarioCache, forecast_table, load_context_rows
+from src.store import path_version, read_daily
+
+# kind -> OrderedDict(key -> value); process-wide so Streamlit reruns reuse it
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def file_version(path: str) -> tuple:
+    """Cheap change detector for an artifact file: (mtime_ns, size)."""
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _cached(kind: str, key, build, maxsize: int = 1):
+    with _LOCK:
+        entries = _CACHE.setdefault(kind, OrderedDict())
+        if key in entries:
+            entries.move_to_end(key)
+            return entries[key]
+
+    value = build()
+    with _LOCK:
+        entries[key] = value
+        while len(entries) > maxsize:
+            entries.popitem(last=False)
+    return value
+
+
+def clear_cache() -> None:
+    with _LOCK:
+        _CACHE.clear()
+
+
+def model_version(path: str) -> str:
+    """Content hash of a model artifact, recomputed only when the file changes."""
+    def build():
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()[:16]
+
+    return _cached("model_version", (path, file_version(path)), build)
+
+
+def load_daily(path: str) -> pd.DataFrame:
+    """
+    The processed daily dataset, reloaded only when the store changes.
+    The returned frame is shared between callers; do not modify it in place.
+    """
+    return _cached("daily", (path, path_version(path)), lambda: read_daily(path))
+
+
+def load_bundle(path: str):
+    """The joblib model bundle, reloaded only when its content changes."""
+    return _cached("bundle", (path, model_version(path)), lambda: joblib.load(path))
+
+
+def load_residuals(path: str):
+    """The conformal ResidualStore written by the backtest, or None if it has not been run."""
+    if not os.path.exists(path):
+        return None
+    return _cached("residuals", (path, file_version(path)), lambda: ResidualStore.load(path))
+
+
+def context_rows(data_path: str, target: str = "clicks", feature_cols=None) -> pd.DataFrame:
+    """
+    Latest-date supervised rows for `data_path`, cached per dataset version.
+    Pass a bundle's feature_cols to build only the features it reads.
+    """
+    cols = tuple(feature_cols) if feature_cols is not None else None
+    return _cached(
+        "context",
+        (data_path, path_version(data_path), target, cols),
+        lambda: load_context_rows(data_path, target=target, feature_cols=cols),
+        maxsize=4,
+    )
+
+
+def baseline_forecast(model_path: str, data_path: str, residuals_path: str = None, coverage: float = 0.9) -> pd.DataFrame:
+    """
+    forecast_table for the latest context, memoized per (model version,
+    context date, residual store version, coverage).
+    """
+    bundle = load_bundle(model_path)
+    base = context_rows(data_path, target=bundle.target, feature_cols=bundle.feature_cols)
+    context_date = base["date"].max() if len(base) else None
+    residuals = load_residuals(residuals_path) if residuals_path else None
+    residuals_key = file_version(residuals_path) if residuals is not None else None
+    return _cached(
+        "baseline",
+        (model_version(model_path), data_path, path_version(data_path), context_date, residuals_key, coverage),
+        lambda: forecast_table(bundle, base, residuals=residuals, coverage=coverage),
+        maxsize=8,
+    )
+
+
+def scenario_cache() -> ScenarioCache:
+    """The process-wide ScenarioCache (in memory only), shared across Streamlit reruns and sessions."""
+    return _cached("scenario_cache", None, ScenarioCache)
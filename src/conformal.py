@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+# Written by scripts.backtest, read by the planner and the app
+RESIDUALS_PATH = "artifacts/forecasts/residuals_{target}.npz"
+
+
+def residuals_path(target: str = "clicks") -> str:
+    return RESIDUALS_PATH.format(target=target)
+
+
+@dataclass
+class ResidualStore:
+    """
+    Out-of-sample backtest residuals (y_true - y_pred) grouped by
+    (campaign, horizon), where horizon is the number of recursive forecast
+    steps. The rolling backtest only scores one-step-ahead predictions, so
+    its stores hold horizon 1 alone: widths are per campaign, and longer
+    horizons get the one-step width (which understates recursive error).
+
+    Absolute residuals are kept sorted per group in one flat array with
+    offsets, so the conformal quantile for any set of (campaign, horizon)
+    pairs is a single vectorized gather.
+    """
+    campaigns: np.ndarray      # campaign labels, index = campaign code
+    max_horizon: int
+    offsets: np.ndarray        # (n_campaigns * max_horizon + 1,) into sorted_abs
+    sorted_abs: np.ndarray     # float32, sorted within each group
+    pooled_offsets: np.ndarray  # (max_horizon + 1,) per-horizon pool across campaigns
+    pooled_abs: np.ndarray
+
+    @classmethod
+    def from_residuals(cls, campaigns, horizons, residuals) -> "ResidualStore":
+        labels, codes = np.unique(np.asarray(campaigns).astype(str), return_inverse=True)
+        horizons = np.asarray(horizons, dtype=np.int64)
+        abs_res = np.abs(np.asarray(residuals, dtype=np.float32))
+        max_h = int(horizons.max()) if len(horizons) else 1
+
+        group = codes * max_h + (horizons - 1)
+        order = np.lexsort((abs_res, group))
+        counts = np.bincount(group, minlength=len(labels) * max_h)
+
+        p_order = np.lexsort((abs_res, horizons))
+        p_counts = np.bincount(horizons - 1, minlength=max_h)
+
+        return cls(
+            campaigns=labels,
+            max_horizon=max_h,
+            offsets=np.concatenate(([0], np.cumsum(counts))),
+            sorted_abs=abs_res[order],
+            pooled_offsets=np.concatenate(([0], np.cumsum(p_counts))),
+            pooled_abs=abs_res[p_order],
+        )
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path,
+            campaigns=self.campaigns,
+            max_horizon=self.max_horizon,
+            offsets=self.offsets,
+            sorted_abs=self.sorted_abs,
+            pooled_offsets=self.pooled_offsets,
+            pooled_abs=self.pooled_abs,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "ResidualStore":
+        with np.load(path, allow_pickle=False) as z:
+            return cls(
+                campaigns=z["campaigns"],
+                max_horizon=int(z["max_horizon"]),
+                offsets=z["offsets"],
+                sorted_abs=z["sorted_abs"],
+                pooled_offsets=z["pooled_offsets"],
+                pooled_abs=z["pooled_abs"],
+            )
+
+    @staticmethod
+    def _quantile(offsets, values, groups, coverage):
+        start, n = offsets[groups], offsets[groups + 1] - offsets[groups]
+        # Split-conformal rank: ceil((n + 1) * coverage), capped at the largest residual
+        k = np.minimum(np.ceil((n + 1) * coverage).astype(np.int64), n) - 1
+        out = np.full(len(groups), np.nan)
+        ok = n > 0
+        out[ok] = values[start[ok] + k[ok]]
+        return out, n
+
+    def half_width(self, campaigns, horizon=1, coverage: float = 0.9, min_count: int = 10) -> np.ndarray:
+        """
+        Interval half-width per campaign at `coverage`. Groups with fewer than
+        `min_count` residuals (or unseen campaigns) fall back to the pool of
+        all campaigns at that horizon. Horizons beyond the backtest's reach
+        use the largest stored horizon.
+        """
+        if not 0 < coverage < 1:
+            raise ValueError("coverage must be in (0, 1)")
+        campaigns = np.asarray(campaigns).astype(str)
+        h = np.clip(np.broadcast_to(np.asarray(horizon, dtype=np.int64), campaigns.shape), 1, self.max_horizon) - 1
+
+        pos = np.searchsorted(self.campaigns, campaigns)
+        pos = np.minimum(pos, len(self.campaigns) - 1)
+        known = self.campaigns[pos] == campaigns
+
+        q, n = self._quantile(self.offsets, self.sorted_abs, np.where(known, pos, 0) * self.max_horizon + h, coverage)
+        pooled, _ = self._quantile(self.pooled_offsets, self.pooled_abs, h, coverage)
+        use_pool = ~known | (n < min_count)
+        return np.where(use_pool, pooled, q)
+
+    def intervals(self, campaigns, preds, horizon=1, coverage: float = 0.9, min_count: int = 10):
+        """(lower, upper) bounds around `preds`; lower is clipped at 0 like the point forecasts."""
+        w = self.half_width(campaigns, horizon=horizon, coverage=coverage, min_count=min_count)
+        preds = np.asarray(preds, dtype=np.float64)
+        return np.maximum(preds - w, 0.0), preds + w
@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from src.features import _frame_parts, lag_columns, rolling_columns
+
+BLOCK_DTYPE = np.float32
+
+
+@dataclass
+class FeatureBlock:
+    """
+    A supervised frame as one contiguous float32 feature matrix whose
+    columns are exactly a bundle's feature_cols, so model input is the
+    matrix itself (or a row slice of it) rather than a per-call DataFrame
+    conversion. The matrix is column-major: each feature is one contiguous
+    run, which is also the layout HistGradientBoosting predicts fastest on.
+    Campaigns are int32 codes into `campaigns`; the target stays float64.
+    """
+    values: np.ndarray          # (n_rows, n_features) float32, Fortran order
+    feature_cols: List[str]
+    target: str
+    y: np.ndarray               # float64
+    dates: np.ndarray           # datetime64[ns]
+    campaign_codes: np.ndarray  # int32
+    campaigns: np.ndarray       # code -> campaign label
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.values, self.y, self.dates, self.campaign_codes))
+
+    @property
+    def campaign(self) -> np.ndarray:
+        return self.campaigns[self.campaign_codes]
+
+    def rows(self, index) -> "FeatureBlock":
+        """Row subset; a slice keeps every array a view of this block."""
+        return FeatureBlock(
+            values=self.values[index],
+            feature_cols=self.feature_cols,
+            target=self.target,
+            y=self.y[index],
+            dates=self.dates[index],
+            campaign_codes=self.campaign_codes[index],
+            campaigns=self.campaigns,
+        )
+
+    def matrix(self, feature_cols: List[str]) -> np.ndarray:
+        """Model input for `feature_cols`: the block itself when the columns match, else a gathered copy."""
+        if list(feature_cols) == self.feature_cols:
+            return self.values
+        idx = {c: j for j, c in enumerate(self.feature_cols)}
+        missing = [c for c in feature_cols if c not in idx]
+        if missing:
+            raise ValueError(f"Feature block is missing columns {missing}.")
+        return np.asfortranarray(self.values[:, [idx[c] for c in feature_cols]])
+
+    def frame(self) -> pd.DataFrame:
+        """Back to a DataFrame (date, campaign, target, features), mainly for inspection."""
+        out = pd.DataFrame(self.values, columns=self.feature_cols)
+        out.insert(0, "date", self.dates)
+        out.insert(1, "campaign", self.campaign)
+        out.insert(2, self.target, self.y)
+        return out
+
+
+def feature_block(sup: pd.DataFrame, target: str) -> FeatureBlock:
+    """FeatureBlock from an existing supervised frame (make_supervised_frame / feature cache)."""
+    feature_cols = [c for c in sup.columns if c not in {"date", "campaign", target}]
+    values = np.empty((len(sup), len(feature_cols)), dtype=BLOCK_DTYPE, order="F")
+    for j, c in enumerate(feature_cols):
+        values[:, j] = sup[c].to_numpy()
+    codes, campaigns = pd.factorize(sup["campaign"].astype(str), sort=True)
+    return FeatureBlock(
+        values=values,
+        feature_cols=feature_cols,
+        target=target,
+        y=sup[target].to_numpy(dtype=np.float64),
+        dates=sup["date"].to_numpy(dtype="datetime64[ns]"),
+        campaign_codes=codes.astype(np.int32),
+        campaigns=np.asarray(campaigns, dtype=object),
+    )
+
+
+def make_feature_block(df: pd.DataFrame, target: str, group_col: str = "campaign") -> FeatureBlock:
+    """
+    make_supervised_frame written straight into a float32 block: same rows,
+    order and feature columns, without materializing the float64 frame.
+    """
+    out, block, keep = _frame_parts(df, group_col, lag_columns(target), rolling_columns(target))
+    base_cols = [c for c in out.columns if c not in {"date", group_col, target}]
+    feature_cols = base_cols + list(block)
+
+    n = int(keep.sum())
+    values = np.empty((n, len(feature_cols)), dtype=BLOCK_DTYPE, order="F")
+    for j, c in enumerate(base_cols):
+        values[:, j] = out[c].to_numpy()[keep]
+    for j, arr in enumerate(block.values(), start=len(base_cols)):
+        values[:, j] = arr[keep]
+
+    codes, campaigns = pd.factorize(out[group_col].to_numpy()[keep].astype(str), sort=True)
+    return FeatureBlock(
+        values=values,
+        feature_cols=feature_cols,
+        target=target,
+        y=out[target].to_numpy(dtype=np.float64)[keep],
+        dates=out["date"].to_numpy(dtype="datetime64[ns]")[keep],
+        campaign_codes=codes.astype(np.int32),
+        campaigns=np.asarray(campaigns, dtype=object),
+    )
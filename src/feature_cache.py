@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+from src import profiling
+from src.features import LAGS, WINDOWS, make_multi_target_frame, make_supervised_frame
+from src.store import path_digest, read_daily
+
+CACHE_DIR = "artifacts/cache/features"
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+
+# Bump when make_supervised_frame changes in a way that alters its output
+FEATURE_VERSION = 2
+
+
+def feature_key(data_digest: str, target, group_col: str = "campaign", lags=LAGS, windows=WINDOWS) -> str:
+    config = {
+        "data": data_digest,
+        "target": target if isinstance(target, str) else list(target),
+        "group_col": group_col,
+        "lags": list(lags),
+        "windows": list(windows),
+        "version": FEATURE_VERSION,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:24]
+
+
+def evict_lru(cache_dir: str = CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES, suffix: str = ".parquet") -> list:
+    """
+    Delete least-recently-used entries (files ending in `suffix`) until the
+    cache fits in `max_bytes`. Entry recency is the file mtime, refreshed on
+    every hit.
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(suffix):
+            st = os.stat(os.path.join(cache_dir, name))
+            entries.append((st.st_mtime, st.st_size, name))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for _, size, name in entries:
+        if total <= max_bytes:
+            break
+        os.remove(os.path.join(cache_dir, name))
+        total -= size
+        removed.append(name)
+    return removed
+
+
+@profiling.traced("cached_supervised_frame", rows=len)
+def cached_supervised_frame(
+    data_path: str,
+    target,
+    group_col: str = "campaign",
+    cache_dir: str = CACHE_DIR,
+    max_bytes: int = MAX_CACHE_BYTES,
+    verbose: bool = True,
+) -> pd.DataFrame:
+    """
+    make_supervised_frame over the daily store at `data_path` (partitioned
+    directory or legacy file), stored under `cache_dir` keyed by the store
+    content, target and feature configuration.
+    A list of targets builds the make_multi_target_frame instead.
+    """
+    t0 = time.perf_counter()
+    key = feature_key(path_digest(data_path), target=target, group_col=group_col)
+    path = os.path.join(cache_dir, f"{key}.parquet")
+
+    if os.path.exists(path):
+        with profiling.span("read_feature_cache"):
+            sup = pd.read_parquet(path)
+        os.utime(path)
+        if verbose:
+            print(f"Feature cache hit: {key} ({len(sup):,} rows, {time.perf_counter() - t0:.2f}s)")
+        return sup
+
+    with profiling.span("read_daily") as s:
+        df = read_daily(data_path)
+        s.rows = len(df)
+    with profiling.span("build_features", rows=len(df)):
+        if isinstance(target, str):
+            sup = make_supervised_frame(df, target=target, group_col=group_col)
+        else:
+            sup = make_multi_target_frame(df, targets=target, group_col=group_col)
+    build_s = time.perf_counter() - t0
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with profiling.span("write_feature_cache", rows=len(sup)):
+        sup.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    evicted = evict_lru(cache_dir, max_bytes)
+
+    if verbose:
+        print(f"Feature cache miss: {key} (built {len(sup):,} rows in {build_s:.2f}s)")
+        if evicted:
+            print(f"Feature cache evicted {len(evicted)} entr{'y' if len(evicted) == 1 else 'ies'}")
+    return sup
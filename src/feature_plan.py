@@ -0,0 +1,157 @@
+import re
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from src.features import (
+    LAGS,
+    TIME_FEATURES,
+    WINDOWS,
+    _assign_time_features,
+    derived_columns,
+    lag_values,
+    rolling_mean_std,
+    sort_by_group,
+)
+
+DERIVED_KINDS = ("lag", "mean", "std")
+
+# History make_supervised_frame requires before a row is kept (its longest lag / window)
+DEFAULT_MIN_HISTORY = max(max(LAGS), max(WINDOWS))
+
+_LAG = re.compile(r"^(?P<source>.+)_lag(?P<param>\d+)$")
+_ROLL = re.compile(r"^(?P<source>.+)_roll(?P<param>\d+)_(?P<stat>mean|std)$")
+
+
+def full_feature_columns(columns, target: str, group_col: str = "campaign") -> List[str]:
+    """feature_cols of make_supervised_frame over daily data with `columns`, without building it."""
+    base = [c for c in columns if c not in {"date", group_col, target}]
+    return base + list(TIME_FEATURES) + derived_columns(target, LAGS, WINDOWS)
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """
+    How one model feature is computed: `kind` is "raw" (the same-day value
+    of `source`), "time" (a calendar field of the date), "lag" (`source`
+    `param` days back) or "mean" / "std" (over the `param` days before).
+    """
+    name: str
+    kind: str
+    source: str
+    param: int = 0
+
+    @property
+    def history(self) -> int:
+        """Prior days of `source` the feature needs before it is defined."""
+        return self.param if self.kind in DERIVED_KINDS else 0
+
+
+def feature_spec(name: str) -> FeatureSpec:
+    """Spec for a feature name as produced by features.make_supervised_frame."""
+    if name in TIME_FEATURES:
+        return FeatureSpec(name, "time", "date")
+    m = _LAG.match(name)
+    if m:
+        return FeatureSpec(name, "lag", m["source"], int(m["param"]))
+    m = _ROLL.match(name)
+    if m:
+        return FeatureSpec(name, m["stat"], m["source"], int(m["param"]))
+    return FeatureSpec(name, "raw", name)
+
+
+@dataclass
+class FeaturePlan:
+    """
+    The features a model reads, resolved to specs. Building from a plan
+    computes only those columns: calendar fields, lags and rolling
+    statistics the model never uses are skipped (a rolling mean without its
+    std also skips the variance pass).
+
+    Rows are kept like make_supervised_frame: at least `min_history` prior
+    days in the campaign and no NA in the target or the planned features,
+    so a plan over a subset of columns selects the same training rows as
+    the full frame.
+    """
+    target: str
+    specs: List[FeatureSpec]
+    min_history: int = DEFAULT_MIN_HISTORY
+
+    @classmethod
+    def from_columns(cls, feature_cols, target: str, min_history: int = None) -> "FeaturePlan":
+        specs = [feature_spec(c) for c in feature_cols]
+        if min_history is None:
+            min_history = max([DEFAULT_MIN_HISTORY] + [s.history for s in specs])
+        return cls(target=target, specs=specs, min_history=min_history)
+
+    @property
+    def feature_cols(self) -> List[str]:
+        return [s.name for s in self.specs]
+
+    @property
+    def time_fields(self) -> List[str]:
+        return [s.name for s in self.specs if s.kind == "time"]
+
+    @property
+    def derived(self) -> List[FeatureSpec]:
+        return [s for s in self.specs if s.kind in DERIVED_KINDS]
+
+    @property
+    def sources(self) -> List[str]:
+        """Daily columns the plan reads (besides the date), in order of first use."""
+        return list(dict.fromkeys(s.source for s in self.specs if s.kind != "time"))
+
+    def compute(self, df: pd.DataFrame, pos: np.ndarray) -> dict:
+        """
+        Lag/rolling columns of the plan for a frame already sorted by
+        (group, date); `pos` comes from sort_by_group. Returns {name: ndarray}.
+        """
+        with_std = {(s.source, s.param) for s in self.derived if s.kind == "std"}
+        values, rolls, block = {}, {}, {}
+        for s in self.derived:
+            if s.source not in values:
+                values[s.source] = df[s.source].to_numpy(dtype=np.float64)
+            if s.kind == "lag":
+                block[s.name] = lag_values(values[s.source], pos, s.param)
+                continue
+            key = (s.source, s.param)
+            if key not in rolls:
+                rolls[key] = rolling_mean_std(values[s.source], pos, s.param, with_std=key in with_std)
+            block[s.name] = rolls[key][0 if s.kind == "mean" else 1]
+        return block
+
+    def parts(self, df: pd.DataFrame, group_col: str = "campaign"):
+        """
+        Sorted base frame (with the planned calendar fields), the planned
+        lag/rolling block and the mask of rows that are kept.
+        """
+        missing = [c for c in self.sources if c not in df.columns]
+        if missing:
+            raise ValueError(f"Daily data is missing columns {missing} required by the feature plan.")
+
+        base_cols = ["date", group_col] + [c for c in dict.fromkeys([self.target] + self.sources) if c in df.columns]
+        out, pos = sort_by_group(df[base_cols], group_col)
+        _assign_time_features(out, self.time_fields)
+        block = self.compute(out, pos)
+
+        keep = (pos >= self.min_history) & out.notna().all(axis=1).to_numpy()
+        for arr in block.values():
+            keep &= ~np.isnan(arr)
+        return out, block, keep
+
+    def columns(self, out: pd.DataFrame, block: dict):
+        """(name, values) of every planned feature in order, from parts()."""
+        for s in self.specs:
+            yield s.name, block[s.name] if s.name in block else out[s.name].to_numpy()
+
+    def build(self, df: pd.DataFrame, group_col: str = "campaign") -> pd.DataFrame:
+        """
+        Supervised frame with only the plan's features: date, group_col, the
+        target (when present in `df`), then feature_cols in plan order.
+        """
+        out, block, keep = self.parts(df, group_col)
+        head = ["date", group_col] + ([self.target] if self.target in out.columns else [])
+        feats = {name: values[keep] for name, values in self.columns(out, block)}
+        return pd.concat([out.loc[keep, head].reset_index(drop=True), pd.DataFrame(feats)], axis=1)
@@ -0,0 +1,223 @@
+from dataclasses import dataclass
+from typing import List
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.feature_plan import FeaturePlan, feature_spec
+from src.features import (
+    LAGS,
+    TIME_FEATURES,
+    WINDOWS,
+    _assign_time_features,
+    derived_columns,
+    sort_by_group,
+)
+
+
+@dataclass
+class FeatureState:
+    """
+    Per-campaign ring buffers holding the most recent `depth` days of every
+    column in the daily frame. Enough history to emit the latest-date rows of
+    `make_supervised_frame` without touching older data.
+
+    buffers[i, s, j] holds column j of campaign i for its day number `n`
+    where s = n % depth; counts[i] is the number of days seen so far.
+    """
+    target: str
+    group_col: str
+    frame_columns: List[str]
+    value_columns: List[str]
+    dtypes: dict
+    campaigns: np.ndarray
+    last_dates: np.ndarray
+    counts: np.ndarray
+    buffers: np.ndarray
+    lags: tuple = LAGS
+    windows: tuple = WINDOWS
+
+    @property
+    def depth(self) -> int:
+        return max(max(self.lags), max(self.windows)) + 1
+
+    @classmethod
+    def from_daily(
+        cls,
+        df: pd.DataFrame,
+        target: str,
+        group_col: str = "campaign",
+        lags=LAGS,
+        windows=WINDOWS,
+    ) -> "FeatureState":
+        value_columns = [c for c in df.columns if c not in {"date", group_col}]
+        depth = max(max(lags), max(windows)) + 1
+
+        out, pos = sort_by_group(df, group_col)
+        keys = out[group_col].to_numpy()
+        is_last = np.ones(len(out), dtype=bool)
+        is_last[:-1] = keys[1:] != keys[:-1]
+
+        campaigns = keys[is_last]
+        counts = pos[is_last] + 1
+        group_idx = np.cumsum(pos == 0) - 1
+
+        # Only the trailing `depth` rows of each campaign are kept
+        recent = pos >= np.repeat(counts, counts) - depth
+        buffers = np.full((len(campaigns), depth, len(value_columns)), np.nan)
+        buffers[group_idx[recent], pos[recent] % depth] = out.loc[recent, value_columns].to_numpy(dtype=np.float64)
+
+        return cls(
+            target=target,
+            group_col=group_col,
+            frame_columns=list(df.columns),
+            value_columns=value_columns,
+            dtypes={c: out[c].dtype for c in value_columns},
+            campaigns=campaigns,
+            last_dates=out["date"].to_numpy()[is_last],
+            counts=counts.astype(np.int64),
+            buffers=buffers,
+            lags=tuple(lags),
+            windows=tuple(windows),
+        )
+
+    def update(self, day_df: pd.DataFrame) -> None:
+        """
+        Append one day of ads_daily rows (one row per campaign). Unknown
+        campaigns are added with an empty history.
+        """
+        if len(day_df) == 0:
+            return
+        dates = pd.to_datetime(day_df["date"]).to_numpy()
+        if (dates != dates[0]).any():
+            raise ValueError("update() expects rows for a single date.")
+        keys = day_df[self.group_col].to_numpy()
+        if pd.Series(keys).duplicated().any():
+            raise ValueError("update() expects at most one row per campaign.")
+
+        lookup = {c: i for i, c in enumerate(self.campaigns)}
+        new = [c for c in keys if c not in lookup]
+        if new:
+            self._add_campaigns(new)
+            lookup.update({c: len(self.campaigns) - len(new) + k for k, c in enumerate(new)})
+
+        idx = np.array([lookup[c] for c in keys], dtype=np.int64)
+        seen = self.counts[idx] > 0
+        if (self.last_dates[idx][seen] >= dates[0]).any():
+            raise ValueError(f"State already contains data on or after {pd.Timestamp(dates[0]).date()}.")
+
+        slot = self.counts[idx] % self.depth
+        self.buffers[idx, slot] = day_df[self.value_columns].to_numpy(dtype=np.float64)
+        self.counts[idx] += 1
+        self.last_dates[idx] = dates[0]
+
+    def _add_campaigns(self, names) -> None:
+        k = len(names)
+        self.campaigns = np.concatenate([self.campaigns, np.array(names, dtype=self.campaigns.dtype)])
+        self.last_dates = np.concatenate([self.last_dates, np.full(k, np.datetime64("NaT"), dtype=self.last_dates.dtype)])
+        self.counts = np.concatenate([self.counts, np.zeros(k, dtype=np.int64)])
+        pad = np.full((k,) + self.buffers.shape[1:], np.nan)
+        self.buffers = np.concatenate([self.buffers, pad])
+
+    def latest_rows(self, feature_cols=None) -> pd.DataFrame:
+        """
+        Rows of `make_supervised_frame` for the latest available date, built
+        from the buffers only (same values and column order). With
+        `feature_cols` (e.g. a bundle's) only the calendar and lag/rolling
+        columns those features need are computed; the same-day daily columns
+        are always included so scenarios can reference any of them.
+        """
+        time_fields, derived = self._planned(feature_cols)
+        depth = self.depth
+        col = {c: j for j, c in enumerate(self.value_columns)}
+
+        sel = np.flatnonzero(self.counts >= depth)
+        counts = self.counts[sel]
+
+        def back(c, k):
+            return self.buffers[sel, (counts - 1 - k) % depth, col[c]]
+
+        block, means = {}, {}
+        for spec in map(feature_spec, derived):
+            c, w = spec.source, spec.param
+            if spec.kind == "lag":
+                block[spec.name] = back(c, w)
+                continue
+            if (c, w) not in means:
+                # Same summation order as features.rolling_mean_std
+                total = np.zeros(len(sel))
+                for k in range(1, w + 1):
+                    total += back(c, k)
+                means[c, w] = total / w
+            m = means[c, w]
+            if spec.kind == "mean":
+                block[spec.name] = m
+                continue
+            sq = np.zeros(len(sel))
+            for k in range(1, w + 1):
+                d = back(c, k) - m
+                sq += d * d
+            block[spec.name] = np.sqrt(sq / (w - 1))
+
+        # Drop campaigns whose latest row would have NA features
+        current = {c: back(c, 0) for c in self.value_columns}
+        valid = np.ones(len(sel), dtype=bool)
+        for arr in list(block.values()) + list(current.values()):
+            valid &= ~np.isnan(arr)
+        if not valid.any():
+            return self._empty_frame(time_fields, derived)
+
+        dates = self.last_dates[sel]
+        keep = valid & (dates == dates[valid].max())
+        keep = np.flatnonzero(keep)
+        keep = keep[np.argsort(self.campaigns[sel][keep].astype(str), kind="stable")]
+
+        base = {}
+        for c in self.frame_columns:
+            if c == "date":
+                base[c] = dates[keep]
+            elif c == self.group_col:
+                base[c] = self.campaigns[sel][keep]
+            else:
+                base[c] = current[c][keep].astype(self.dtypes[c])
+        out = pd.DataFrame(base)
+        _assign_time_features(out, time_fields)
+
+        feats = pd.DataFrame({name: arr[keep] for name, arr in block.items()})
+        return pd.concat([out, feats], axis=1)
+
+    def history(self, campaigns) -> np.ndarray:
+        """
+        Buffered values for `campaigns`, shape (n, depth, n_value_columns),
+        ordered oldest -> newest along axis 1.
+        """
+        lookup = {c: i for i, c in enumerate(self.campaigns)}
+        idx = np.array([lookup[c] for c in campaigns], dtype=np.int64)
+        slots = (self.counts[idx, None] - self.depth + np.arange(self.depth)[None, :]) % self.depth
+        return self.buffers[idx[:, None], slots]
+
+    def _planned(self, feature_cols=None) -> tuple:
+        """Calendar fields and lag/rolling names to emit: everything, or what `feature_cols` needs."""
+        if feature_cols is None:
+            return list(TIME_FEATURES), derived_columns(self.target, self.lags, self.windows)
+        plan = FeaturePlan.from_columns(feature_cols, self.target)
+        for spec in plan.derived:
+            if spec.source not in self.value_columns:
+                raise ValueError(f"Feature '{spec.name}' needs column '{spec.source}', which the state does not hold.")
+            if spec.history >= self.depth:
+                raise ValueError(f"Feature '{spec.name}' needs more history than the state keeps ({self.depth - 1} days).")
+        return plan.time_fields, [s.name for s in plan.derived]
+
+    def _empty_frame(self, time_fields, derived) -> pd.DataFrame:
+        out = pd.DataFrame({c: [] for c in self.frame_columns})
+        out["date"] = pd.to_datetime(out["date"])
+        _assign_time_features(out, time_fields)
+        return pd.concat([out, pd.DataFrame(columns=derived, dtype=float)], axis=1)
+
+    def save(self, path: str) -> None:
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path: str) -> "FeatureState":
+        return joblib.load(path)
@@ -1,50 +1,224 @@
+import numpy as np
 import pandas as pd
 
 TARGETS = ["clicks", "cost", "conversions", "revenue"]  # revenue exists in raw, but not saved yet unless you add it
 NUMERIC_COLS = ["impressions", "clicks", "cost", "conversions", "ctr", "cpc", "cvr"]
 
+LAGS = (1, 7, 14)
+WINDOWS = (7, 14)
+TIME_FEATURES = ("dow", "dom", "week")
+
+
+def lag_columns(target: str) -> list:
+    """Source columns that get lag features, de-duplicated in order."""
+    return list(dict.fromkeys([target, "impressions", "ctr", "cpc", "cvr"]))
+
+
+def rolling_columns(target: str) -> list:
+    """Source columns that get rolling mean/std features, de-duplicated in order."""
+    return list(dict.fromkeys([target, "clicks", "cost", "conversions"]))
+
+
 def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
     out = df.copy()
     out["date"] = pd.to_datetime(out["date"])
-    out["dow"] = out["date"].dt.dayofweek  # 0=Mon
-    out["dom"] = out["date"].dt.day
-    out["week"] = out["date"].dt.isocalendar().week.astype(int)
+    _assign_time_features(out)
     return out
 
-def add_lag_features(df: pd.DataFrame, group_col: str, cols, lags=(1, 7, 14)) -> pd.DataFrame:
-    out = df.copy()
-    out = out.sort_values([group_col, "date"])
-    for c in cols:
-        for l in lags:
-            out[f"{c}_lag{l}"] = out.groupby(group_col)[c].shift(l)
+
+def _assign_time_features(out: pd.DataFrame, fields=TIME_FEATURES) -> None:
+    # Calendar fields are computed once per distinct date, then broadcast
+    codes, uniq = pd.factorize(out["date"])
+    uniq = pd.DatetimeIndex(uniq)
+    if "dow" in fields:
+        out["dow"] = uniq.dayofweek.to_numpy()[codes]  # 0=Mon
+    if "dom" in fields:
+        out["dom"] = uniq.day.to_numpy()[codes]
+    if "week" in fields:
+        out["week"] = uniq.isocalendar().week.to_numpy().astype(int)[codes]
+
+
+def sort_by_group(df: pd.DataFrame, group_col: str):
+    """
+    Sort once by (group_col, date) and locate the group boundaries.
+    Returns the sorted frame (with a datetime `date` column) and each row's
+    position within its group.
+    """
+    codes = pd.factorize(df[group_col], sort=True)[0]
+    dates = pd.to_datetime(df["date"]).to_numpy()
+    order = np.lexsort((dates, codes))
+
+    out = df.take(order)
+    out["date"] = dates[order]
+    return out, group_positions(codes[order])
+
+
+def group_positions(keys: np.ndarray) -> np.ndarray:
+    """
+    Position of each row within its contiguous group (0 for the first row).
+    `keys` must already be sorted so each group is one contiguous segment.
+    """
+    n = len(keys)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    starts = np.concatenate(([0], starts))
+    lengths = np.diff(np.append(starts, n))
+    return np.arange(n, dtype=np.int64) - np.repeat(starts, lengths)
+
+
+def lag_values(x: np.ndarray, pos: np.ndarray, lag: int) -> np.ndarray:
+    """x shifted by `lag` rows within each group (NaN where history is too short)."""
+    out = np.full(len(x), np.nan)
+    if lag < len(x):
+        out[lag:] = x[:-lag]
+    out[pos < lag] = np.nan
     return out
 
-def add_rolling_features(df: pd.DataFrame, group_col: str, cols, windows=(7, 14)) -> pd.DataFrame:
-    out = df.copy()
-    out = out.sort_values([group_col, "date"])
-    for c in cols:
+
+def rolling_mean_std(x: np.ndarray, pos: np.ndarray, window: int, with_std: bool = True):
+    """
+    Mean and sample std of the `window` values strictly before each row,
+    restricted to the row's own group (NaN until a full window exists).
+    With with_std=False the variance pass is skipped and std is None.
+    """
+    n = len(x)
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan) if with_std else None
+    if n <= window:
+        return mean, std
+
+    # Row i (i >= window) uses x[i - window : i]; sum the window as shifted slices
+    total = np.zeros(n - window)
+    for k in range(1, window + 1):
+        total += x[window - k:n - k]
+    m = total / window
+    if not with_std:
+        mean[window:] = m
+        mean[pos < window] = np.nan
+        return mean, None
+
+    # Second pass for the variance; `d` is reused to avoid per-slice temporaries
+    sq = np.zeros(n - window)
+    d = np.empty(n - window)
+    for k in range(1, window + 1):
+        np.subtract(x[window - k:n - k], m, out=d)
+        np.multiply(d, d, out=d)
+        sq += d
+
+    mean[window:] = m
+    std[window:] = np.sqrt(sq / (window - 1))
+
+    short = pos < window
+    mean[short] = np.nan
+    std[short] = np.nan
+    return mean, std
+
+
+def lag_rolling_block(
+    df: pd.DataFrame,
+    pos: np.ndarray,
+    lag_cols,
+    roll_cols,
+    lags=LAGS,
+    windows=WINDOWS,
+) -> dict:
+    """
+    Compute every lag and rolling feature in one pass over a frame that is
+    already sorted by (group, date); `pos` comes from `sort_by_group`.
+    Returns {column name: ndarray}.
+    """
+    block = {}
+    for c in lag_cols:
+        x = df[c].to_numpy(dtype=np.float64)
+        for l in lags:
+            block[f"{c}_lag{l}"] = lag_values(x, pos, l)
+    for c in roll_cols:
+        x = df[c].to_numpy(dtype=np.float64)
         for w in windows:
-            out[f"{c}_roll{w}_mean"] = (
-                out.groupby(group_col)[c].shift(1).rolling(w).mean().reset_index(level=0, drop=True)
-            )
-            out[f"{c}_roll{w}_std"] = (
-                out.groupby(group_col)[c].shift(1).rolling(w).std().reset_index(level=0, drop=True)
-            )
-    return out
+            mean, std = rolling_mean_std(x, pos, w)
+            block[f"{c}_roll{w}_mean"] = mean
+            block[f"{c}_roll{w}_std"] = std
+    return block
+
+
+def add_lag_features(df: pd.DataFrame, group_col: str, cols, lags=LAGS) -> pd.DataFrame:
+    out, pos = sort_by_group(df, group_col)
+    block = lag_rolling_block(out, pos, cols, [], lags=lags)
+    return pd.concat([out, pd.DataFrame(block, index=out.index)], axis=1)
+
+
+def add_rolling_features(df: pd.DataFrame, group_col: str, cols, windows=WINDOWS) -> pd.DataFrame:
+    out, pos = sort_by_group(df, group_col)
+    block = lag_rolling_block(out, pos, [], cols, windows=windows)
+    return pd.concat([out, pd.DataFrame(block, index=out.index)], axis=1)
+
+
+def derived_columns(target: str, lags=LAGS, windows=WINDOWS) -> list:
+    """Names of the lag/rolling columns make_supervised_frame adds for `target`, in order."""
+    names = [f"{c}_lag{l}" for c in lag_columns(target) for l in lags]
+    names += [
+        f"{c}_roll{w}_{stat}"
+        for c in rolling_columns(target)
+        for w in windows
+        for stat in ("mean", "std")
+    ]
+    return names
+
+
+def _frame_parts(df: pd.DataFrame, group_col: str, lag_cols, roll_cols):
+    """
+    Sorted base frame (with calendar features), the derived lag/rolling
+    block and the mask of rows that survive NA dropping.
+    """
+    out, pos = sort_by_group(df, group_col)
+    _assign_time_features(out)
+
+    block = lag_rolling_block(out, pos, lag_cols=lag_cols, roll_cols=roll_cols)
+
+    # Drop rows with NA created by lag/rolling
+    keep = out.notna().all(axis=1).to_numpy().copy()
+    for arr in block.values():
+        keep &= ~np.isnan(arr)
+    return out, block, keep
+
+
+def _build_frame(df: pd.DataFrame, group_col: str, lag_cols, roll_cols) -> pd.DataFrame:
+    out, block, keep = _frame_parts(df, group_col, lag_cols, roll_cols)
+
+    feats = np.empty((int(keep.sum()), len(block)))
+    for j, arr in enumerate(block.values()):
+        feats[:, j] = arr[keep]
+
+    out = out.loc[keep].reset_index(drop=True)
+    return pd.concat([out, pd.DataFrame(feats, columns=list(block))], axis=1)
+
 
 def make_supervised_frame(df: pd.DataFrame, target: str, group_col: str = "campaign") -> pd.DataFrame:
     """
     Build a supervised learning frame for next-day prediction:
       y_t = target at date t
       X_t = features derived from data up to t-1 (lags/rolling)
+
+    The frame is sorted once by (group_col, date); all lag/rolling features are
+    then computed per contiguous campaign segment in a single vectorized pass.
     """
-    out = df.copy()
-    out["date"] = pd.to_datetime(out["date"])
+    return _build_frame(df, group_col, lag_columns(target), rolling_columns(target))
 
-    out = add_time_features(out)
-    out = add_lag_features(out, group_col=group_col, cols=[target, "impressions", "ctr", "cpc", "cvr"], lags=(1, 7, 14))
-    out = add_rolling_features(out, group_col=group_col, cols=[target, "clicks", "cost", "conversions"], windows=(7, 14))
 
-    # Drop rows with NA created by lag/rolling
-    out = out.dropna().reset_index(drop=True)
-    return out
+def make_multi_target_frame(df: pd.DataFrame, targets, group_col: str = "campaign") -> pd.DataFrame:
+    """
+    One supervised frame carrying the features of every target in `targets`.
+    The shared lag/rolling/calendar block is built once; each target only
+    contributes the columns it adds on top. Use target_columns() to select
+    the exact columns make_supervised_frame would return for one target.
+    """
+    lag_cols = list(dict.fromkeys(c for t in targets for c in lag_columns(t)))
+    roll_cols = list(dict.fromkeys(c for t in targets for c in rolling_columns(t)))
+    return _build_frame(df, group_col, lag_cols, roll_cols)
+
+
+def target_columns(frame: pd.DataFrame, targets, target: str) -> list:
+    """Columns of a make_multi_target_frame output that make up `target`'s frame."""
+    derived = {c for t in targets for c in derived_columns(t)}
+    return [c for c in frame.columns if c not in derived] + derived_columns(target)
@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+
+@dataclass
+class FlatForest:
+    """
+    Every tree of a fitted HistGradientBoostingRegressor in flat arrays.
+    Node ids are global across trees; leaves point to themselves with an
+    infinite threshold, so a fixed number of vectorized steps (the deepest
+    tree's depth) walks every (row, tree) pair to its leaf.
+    """
+    feature: np.ndarray        # int64 per node (0 for leaves)
+    threshold: np.ndarray      # float64 raw-value threshold (+inf for leaves)
+    missing_left: np.ndarray   # bool: NaN goes left
+    children: np.ndarray       # (n_nodes, 2) int64: left, right
+    value: np.ndarray          # float64 leaf value (0 for splits)
+    roots: np.ndarray          # int64 root node id per tree, in boosting order
+    baseline: float
+    depth: int
+    n_features: int
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node id for every (row, tree): shape (n_rows, n_trees)."""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        n = len(X)
+        flat_x = X.ravel()
+        row_off = (np.arange(n, dtype=np.int64) * X.shape[1])[:, None]
+        has_nan = bool(np.isnan(flat_x).any())
+
+        node = np.broadcast_to(self.roots, (n, self.n_trees)).copy()
+        for _ in range(self.depth):
+            x = flat_x[row_off + self.feature[node]]
+            go_left = x <= self.threshold[node]
+            if has_nan:
+                go_left |= np.isnan(x) & self.missing_left[node]
+            node = self.children[node, (~go_left).view(np.uint8)]
+        return node
+
+    def predict(self, X: np.ndarray, max_cells: int = 1 << 22) -> np.ndarray:
+        """
+        Same result as HistGradientBoostingRegressor.predict: leaf values are
+        accumulated onto the baseline in boosting order (a sequential cumsum),
+        matching sklearn's summation order. Rows are processed in chunks of
+        about `max_cells` (row, tree) pairs.
+        """
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected a 2-D matrix with {self.n_features} columns, got shape {X.shape}.")
+        out = np.empty(len(X))
+        per_chunk = max(1, max_cells // max(self.n_trees, 1))
+        for lo in range(0, len(X), per_chunk):
+            hi = min(lo + per_chunk, len(X))
+            vals = np.empty((hi - lo, self.n_trees + 1))
+            vals[:, 0] = self.baseline
+            vals[:, 1:] = self.value[self.leaves(X[lo:hi])]
+            out[lo:hi] = np.cumsum(vals, axis=1)[:, -1]
+        return out
+
+
+def export_forest(model: HistGradientBoostingRegressor) -> FlatForest:
+    """Flatten a fitted single-output HistGradientBoostingRegressor with an identity link."""
+    link = type(model._loss.link).__name__
+    if link != "IdentityLink":
+        raise ValueError(f"Only identity-link losses can be flattened (model uses {link}).")
+    if model.n_trees_per_iteration_ != 1:
+        raise ValueError("Only single-output models can be flattened.")
+    if model.is_categorical_ is not None and np.any(model.is_categorical_):
+        raise ValueError("Models with categorical features cannot be flattened.")
+
+    features, thresholds, missing, children, values, roots = [], [], [], [], [], []
+    offset, depth = 0, 0
+    for (predictor,) in model._predictors:
+        nodes = predictor.nodes
+        leaf = nodes["is_leaf"].astype(bool)
+        ids = offset + np.arange(len(nodes), dtype=np.int64)
+
+        features.append(np.where(leaf, 0, nodes["feature_idx"]).astype(np.int64))
+        thresholds.append(np.where(leaf, np.inf, nodes["num_threshold"]))
+        missing.append(np.where(leaf, True, nodes["missing_go_to_left"].astype(bool)))
+        left = np.where(leaf, ids, offset + nodes["left"].astype(np.int64))
+        right = np.where(leaf, ids, offset + nodes["right"].astype(np.int64))
+        children.append(np.column_stack([left, right]))
+        values.append(np.where(leaf, nodes["value"], 0.0))
+
+        roots.append(offset)
+        depth = max(depth, int(nodes["depth"].max()))
+        offset += len(nodes)
+
+    return FlatForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        missing_left=np.concatenate(missing),
+        children=np.concatenate(children),
+        value=np.concatenate(values),
+        roots=np.array(roots, dtype=np.int64),
+        baseline=float(np.ravel(model._baseline_prediction)[0]),
+        depth=depth,
+        n_features=int(model.n_features_in_),
+    )
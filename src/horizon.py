@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from src.feature_plan import feature_spec
+from src.feature_state import FeatureState
+
+HORIZONS = (7, 14, 28)
+
+
+def _column_plan(feature_cols, value_columns) -> list:
+    """
+    How to fill each model feature from the history array:
+    (kind, value column index, parameter) per entry of feature_cols.
+    """
+    col = {c: j for j, c in enumerate(value_columns)}
+    plan = []
+    for spec in map(feature_spec, feature_cols):
+        if spec.kind == "time":
+            plan.append(("time", None, spec.name))
+        elif spec.source not in col:
+            raise ValueError(f"Don't know how to roll feature '{spec.name}' forward.")
+        else:
+            plan.append((spec.kind, col[spec.source], spec.param or None))
+    return plan
+
+
+def recursive_forecast(
+    bundle,
+    state: FeatureState,
+    horizon: int = max(HORIZONS),
+    scenarios: dict = None,
+) -> pd.DataFrame:
+    """
+    Forecast the bundle's target for the next `horizon` days after the
+    state's latest date, for every campaign and scenario at once.
+
+    Each step appends a synthetic day per campaign: the target comes from
+    the previous step's prediction, other daily drivers are held at their
+    latest observed values times the scenario multipliers (so a scenario
+    applies to the whole horizon). Lag and rolling features are updated in
+    place on preallocated arrays and every step is one batched predict
+    over all (scenario, campaign) rows.
+    """
+    base = state.latest_rows(bundle.feature_cols)
+    scenarios = {"Baseline": {}, **(scenarios or {})}
+    target = bundle.target
+    cols = state.value_columns
+    t_idx = cols.index(target)
+
+    campaigns = base[state.group_col].to_numpy()
+    n_scen, n_camp, depth = len(scenarios), len(campaigns), state.depth
+    if n_camp == 0:
+        return pd.DataFrame(columns=["scenario", "campaign", "step", "date", f"pred_{target}"])
+
+    # hist[s, c, t, j]: actual history in [0, depth), forecast days after
+    hist = np.empty((n_scen, n_camp, depth + horizon, len(cols)))
+    hist[:, :, :depth] = state.history(campaigns)[None]
+
+    drivers = hist[:, :, depth - 1].copy()
+    for s, changes in enumerate(scenarios.values()):
+        for c, mult in changes.items():
+            if c == target:
+                raise ValueError(f"Scenario column '{c}' is the forecast target.")
+            if c not in cols:
+                raise ValueError(f"Scenario column '{c}' not found in model features.")
+            drivers[s, :, cols.index(c)] *= float(mult)
+
+    plan = _column_plan(bundle.feature_cols, cols)
+    X = np.empty((n_scen * n_camp, len(plan)))
+    preds = np.empty((horizon, n_scen, n_camp))
+    last_date = pd.Timestamp(base["date"].max())
+    dates = pd.date_range(last_date + pd.Timedelta(days=1), periods=horizon, freq="D")
+    cal = {
+        "dow": dates.dayofweek.to_numpy(),
+        "dom": dates.day.to_numpy(),
+        "week": dates.isocalendar().week.to_numpy().astype(int),
+    }
+
+    for h in range(horizon):
+        t = depth + h
+        hist[:, :, t] = drivers
+
+        for i, (kind, j, p) in enumerate(plan):
+            if kind == "time":
+                X[:, i] = cal[p][h]
+            elif kind == "raw":
+                X[:, i] = hist[:, :, t, j].ravel()
+            elif kind == "lag":
+                X[:, i] = hist[:, :, t - p, j].ravel()
+            elif kind == "mean":
+                X[:, i] = hist[:, :, t - p:t, j].mean(axis=2).ravel()
+            else:
+                X[:, i] = hist[:, :, t - p:t, j].std(axis=2, ddof=1).ravel()
+
+        step = np.maximum(bundle.predict_array(X), 0.0).reshape(n_scen, n_camp)
+        preds[h] = step
+        hist[:, :, t, t_idx] = step
+
+    names = np.array(list(scenarios), dtype=object)
+    return pd.DataFrame({
+        "scenario": np.tile(np.repeat(names, n_camp), horizon),
+        "campaign": np.tile(np.tile(campaigns, n_scen), horizon),
+        "step": np.repeat(np.arange(1, horizon + 1), n_scen * n_camp),
+        "date": np.repeat(dates.to_numpy(), n_scen * n_camp),
+        f"pred_{target}": preds.ravel(),
+    })
+
+
+def horizon_totals(fc: pd.DataFrame, horizons=HORIZONS) -> pd.DataFrame:
+    """Cumulative forecast per scenario and campaign over each horizon (e.g. 7/14/28 days)."""
+    pred_col = [c for c in fc.columns if c.startswith("pred_")][0]
+    out = []
+    for h in horizons:
+        tot = fc[fc["step"] <= h].groupby(["scenario", "campaign"], as_index=False)[pred_col].sum()
+        tot.insert(2, "horizon_days", h)
+        out.append(tot)
+    return pd.concat(out, ignore_index=True)
@@ -1,4 +1,5 @@
 import numpy as np
+import pandas as pd
 
 def mae(y_true, y_pred) -> float:
     y_true = np.asarray(y_true)
@@ -15,3 +16,89 @@ def mape(y_true, y_pred, eps: float = 1e-9) -> float:
     y_pred = np.asarray(y_pred)
     denom = np.maximum(np.abs(y_true), eps)
     return float(np.mean(np.abs((y_true - y_pred) / denom)))
+
+
+class MetricsAccumulator:
+    """
+    Streaming MAE / RMSE / MAPE per group key.
+
+    Each update adds per-group sums of |e|, e^2 and |e|/|y| in one bincount
+    pass; partial accumulators (e.g. from parallel folds or chunks) combine
+    with merge. Global metrics come from the same sums.
+    """
+
+    _FIELDS = ("n", "abs_err", "sq_err", "ape")
+
+    def __init__(self, eps: float = 1e-9):
+        self.eps = eps
+        self.keys = []
+        self._pos = {}
+        self.sums = np.zeros((0, len(self._FIELDS)))
+
+    def _rows(self, keys) -> np.ndarray:
+        new = [k for k in keys if k not in self._pos]
+        if new:
+            for k in new:
+                self._pos[k] = len(self.keys)
+                self.keys.append(k)
+            self.sums = np.vstack([self.sums, np.zeros((len(new), len(self._FIELDS)))])
+        return np.array([self._pos[k] for k in keys], dtype=np.int64)
+
+    def update(self, y_true, y_pred, groups=None) -> "MetricsAccumulator":
+        """Add a batch of predictions; `groups` gives each row's key (None = one "all" group)."""
+        y_true = np.asarray(y_true, dtype=np.float64)
+        err = np.abs(y_true - np.asarray(y_pred, dtype=np.float64))
+        if groups is None:
+            codes, uniq = np.zeros(len(err), dtype=np.int64), ["all"]
+        else:
+            codes, uniq = pd.factorize(np.asarray(groups), sort=True)
+            uniq = uniq.tolist()
+
+        k = len(uniq)
+        batch = np.column_stack([
+            np.bincount(codes, minlength=k),
+            np.bincount(codes, weights=err, minlength=k),
+            np.bincount(codes, weights=err * err, minlength=k),
+            np.bincount(codes, weights=err / np.maximum(np.abs(y_true), self.eps), minlength=k),
+        ])
+        rows = self._rows(uniq)
+        self.sums[rows] += batch
+        return self
+
+    def merge(self, other: "MetricsAccumulator") -> "MetricsAccumulator":
+        if other.keys:
+            rows = self._rows(other.keys)
+            self.sums[rows] += other.sums
+        return self
+
+    @staticmethod
+    def _metrics(sums: np.ndarray) -> dict:
+        n = sums[..., 0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return {
+                "n": n.astype(np.int64),
+                "mae": sums[..., 1] / n,
+                "rmse": np.sqrt(sums[..., 2] / n),
+                "mape": sums[..., 3] / n,
+            }
+
+    def totals(self) -> dict:
+        """Global metrics over every row seen, as plain floats (n as int)."""
+        out = self._metrics(self.sums.sum(axis=0))
+        return {k: (int(v) if k == "n" else float(v)) for k, v in out.items()}
+
+    def finalize(self, name: str = "group") -> pd.DataFrame:
+        """Tidy per-group table: one row per key with n, mae, rmse and mape."""
+        order = np.argsort(np.array(self.keys, dtype=object), kind="stable") if self.keys else np.array([], dtype=np.int64)
+        out = pd.DataFrame({name: pd.Series(self.keys, dtype=object).iloc[order].to_numpy()})
+        for col, vals in self._metrics(self.sums[order]).items():
+            out[col] = vals
+        return out
+
+
+def grouped_metrics(y_true, y_pred, groups, name: str = "group") -> pd.DataFrame:
+    """
+    MAE / RMSE / MAPE per key of `groups` in one pass, as the tidy table of
+    MetricsAccumulator.finalize (key column `name`, then n, mae, rmse, mape).
+    """
+    return MetricsAccumulator().update(y_true, y_pred, groups).finalize(name)
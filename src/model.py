@@ -1,34 +1,269 @@
+import json
+import os
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List, Optional
 
+import joblib
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import HistGradientBoostingRegressor
 
+from src.feature_block import FeatureBlock
+from src.feature_plan import FeaturePlan
+from src.flat_trees import export_forest
+from src.shared_pool import shared_array, shared_map
+from src.features import target_columns
+
+
+# Up to this many rows the flattened-tree evaluator beats sklearn's per-call overhead
+FLAT_MAX_ROWS = 256
+ENGINES = ("auto", "sklearn", "flat")
+
+# Written by scripts.tune_forecaster, read by scripts.train_forecaster
+TUNED_PARAMS_PATH = "artifacts/models/params_{target}.json"
+
 
 @dataclass
 class ForecastBundle:
     model: HistGradientBoostingRegressor
     feature_cols: List[str]
     target: str
+    # Input precision the model was fitted on; "float32" when trained from a FeatureBlock
+    dtype: str = "float64"
+    # Split-gain share of every candidate feature when training pruned feature_cols
+    importance: Optional[Dict[str, float]] = None
+    # make_regressor overrides the model was fitted with, and the search log that chose them
+    params: Optional[Dict] = None
+    trials: Optional[List[dict]] = None
+
+    @property
+    def plan(self) -> FeaturePlan:
+        """What to build for this model: only the calendar/lag/rolling columns feature_cols reads."""
+        return FeaturePlan.from_columns(self.feature_cols, self.target)
 
-    def predict(self, df: pd.DataFrame) -> np.ndarray:
-        X = df[self.feature_cols].to_numpy()
+    def predict(self, data, engine: str = "auto") -> np.ndarray:
+        """Predict from a DataFrame or a FeatureBlock (whose matrix is used without conversion)."""
+        return self.predict_array(self.model_input(data), engine=engine)
+
+    def model_input(self, data) -> np.ndarray:
+        """
+        Matrix for predict_array: a FeatureBlock in the bundle's dtype as is,
+        otherwise the DataFrame's feature columns converted to it (a copy).
+        Only the conversion here is saved: both engines still copy the input
+        to contiguous float64 before walking the trees.
+        """
+        if isinstance(data, FeatureBlock):
+            # Rounded inputs can land in different bins of a model fitted on float64
+            if data.values.dtype != np.dtype(self.dtype):
+                raise ValueError(
+                    f"Feature block is {data.values.dtype} but the model was fitted on {self.dtype} inputs; "
+                    "retrain from a FeatureBlock or predict from the DataFrame."
+                )
+            return data.matrix(self.feature_cols)
+        return data[self.feature_cols].to_numpy(dtype=self.dtype)
+
+    def predict_array(self, X: np.ndarray, engine: str = "auto") -> np.ndarray:
+        """
+        Predict from a matrix whose columns are ordered like feature_cols.
+        Inputs are rounded to the training precision (no copy when it already
+        matches), then cast to float64 by either engine, as sklearn does.
+
+        engine="flat" walks the exported FlatForest (identical results, no
+        per-call sklearn overhead); "auto" uses it up to FLAT_MAX_ROWS rows.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"engine must be one of {ENGINES}")
+        X = np.asarray(X, dtype=self.dtype)
+        if engine == "flat" or (engine == "auto" and len(X) <= FLAT_MAX_ROWS):
+            forest = self.flat_forest()
+            if forest is not None:
+                return forest.predict(X)
+            if engine == "flat":
+                raise ValueError("This model cannot be flattened; use engine='sklearn'.")
         return self.model.predict(X)
 
+    def flat_forest(self):
+        """The model's FlatForest, exported once per fitted model (None if it can't be flattened)."""
+        key = (id(self.model), getattr(self.model, "n_iter_", None))
+        cached = self.__dict__.get("_flat")
+        if cached is None or cached[0] != key:
+            try:
+                forest = export_forest(self.model)
+            except (ValueError, AttributeError):
+                forest = None
+            cached = self.__dict__["_flat"] = (key, forest)
+        return cached[1]
+
+    def fingerprint(self) -> str:
+        """Content hash of the bundle (stable across loads of the same artifact), computed once per fitted model."""
+        key = (id(self.model), getattr(self.model, "n_iter_", None))
+        cached = self.__dict__.get("_fingerprint")
+        if cached is None or cached[0] != key:
+            digest = joblib.hash(self)[:16]
+            cached = self.__dict__["_fingerprint"] = (key, digest)
+        return cached[1]
+
+    def __getstate__(self):
+        # The exported forest and fingerprint are derived data; rebuild them after unpickling
+        state = self.__dict__.copy()
+        state.pop("_flat", None)
+        state.pop("_fingerprint", None)
+        return state
 
-def train_forecaster(df: pd.DataFrame, target: str) -> ForecastBundle:
-    feature_cols = [c for c in df.columns if c not in {"date", "campaign", target}]
 
-    X = df[feature_cols].to_numpy()
-    y = df[target].to_numpy()
+def feature_columns(df: pd.DataFrame, target: str) -> List[str]:
+    return [c for c in df.columns if c not in {"date", "campaign", target}]
 
-    model = HistGradientBoostingRegressor(
+
+def make_regressor(**overrides) -> HistGradientBoostingRegressor:
+    params = dict(
         max_depth=6,
         learning_rate=0.05,
         max_iter=500,
         random_state=42,
     )
-    model.fit(X, y)
+    params.update(overrides)
+    return HistGradientBoostingRegressor(**params)
+
+
+def tuned_params_path(target: str = "clicks") -> str:
+    return TUNED_PARAMS_PATH.format(target=target)
+
+
+def load_tuned_params(target: str = "clicks") -> Optional[Dict]:
+    """make_regressor overrides saved by scripts.tune_forecaster, or None if it has not been run."""
+    path = tuned_params_path(target)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_tuned_params(params: Dict, target: str = "clicks") -> str:
+    path = tuned_params_path(target)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(params, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+    return path
+
+
+def split_gain_importance(model: HistGradientBoostingRegressor) -> np.ndarray:
+    """Each input feature's share of the total split gain over all trees."""
+    gain = np.zeros(model.n_features_in_)
+    for predictors in model._predictors:
+        for predictor in predictors:
+            nodes = predictor.nodes
+            split = ~nodes["is_leaf"].astype(bool)
+            np.add.at(gain, nodes["feature_idx"][split].astype(np.int64), nodes["gain"][split])
+    total = gain.sum()
+    return gain / total if total > 0 else gain
+
+
+def prune_columns(feature_cols: List[str], importance: np.ndarray, keep_share: float) -> List[str]:
+    """
+    Fewest features (most important first) whose importance adds up to
+    `keep_share` of the total, returned in their original order.
+    """
+    if not 0 < keep_share <= 1:
+        raise ValueError("keep_share must be in (0, 1]")
+    order = np.argsort(-importance, kind="stable")
+    covered = np.cumsum(importance[order])
+    n = int(np.searchsorted(covered, keep_share * covered[-1] * (1 - 1e-12))) + 1
+    keep = np.sort(order[:min(n, len(order))])
+    return [feature_cols[j] for j in keep]
+
+
+def train_forecaster(df, target: str, prune: float = None, params: Dict = None) -> ForecastBundle:
+    """
+    Fit on a supervised DataFrame, or on a FeatureBlock (float32 inputs, no copy of the matrix).
+    `params` override make_regressor's defaults (e.g. tuned hyperparameters).
+
+    With `prune` (e.g. 0.99) the model is fitted once on every feature,
+    then refitted on the fewest features covering that share of the split
+    gain; the bundle's feature_cols (and so its plan) become that subset
+    and `importance` records the share of every candidate.
+    """
+    if isinstance(df, FeatureBlock):
+        if df.target != target:
+            raise ValueError(f"Feature block was built for '{df.target}', not '{target}'.")
+        feature_cols, dtype = list(df.feature_cols), "float32"
+        inputs, y = df.matrix, df.y
+    else:
+        feature_cols, dtype = feature_columns(df, target), "float64"
+        inputs, y = (lambda cols: df[cols].to_numpy()), df[target].to_numpy()
+
+    params = dict(params) if params else None
+    model = make_regressor(**(params or {}))
+    model.fit(inputs(feature_cols), y)
+    if prune is None:
+        return ForecastBundle(model=model, feature_cols=feature_cols, target=target, dtype=dtype, params=params)
+
+    importance = split_gain_importance(model)
+    kept = prune_columns(feature_cols, importance, prune)
+    if len(kept) < len(feature_cols):
+        model = make_regressor(**(params or {}))
+        model.fit(inputs(kept), y)
+    return ForecastBundle(
+        model=model,
+        feature_cols=kept,
+        target=target,
+        dtype=dtype,
+        importance={c: float(v) for c, v in zip(feature_cols, importance)},
+        params=params,
+    )
+
+
+@dataclass
+class MultiTargetBundle:
+    """One ForecastBundle per KPI, predicted together from a multi-target frame."""
+    bundles: Dict[str, ForecastBundle]
+
+    @property
+    def targets(self) -> List[str]:
+        return list(self.bundles)
+
+    def predict(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Predictions for every target, one column per KPI (pred_<target>)."""
+        return pd.DataFrame(
+            {f"pred_{t}": b.predict(df) for t, b in self.bundles.items()},
+            index=df.index,
+        )
+
+
+def _fit_columns(task):
+    feat_idx, target_idx = task
+    W = shared_array("W")
+    model = make_regressor()
+    model.fit(W[:, feat_idx], W[:, target_idx])
+    return model
+
+
+def train_multi_target(df: pd.DataFrame, targets, workers: int = None) -> MultiTargetBundle:
+    """
+    Train one regressor per target from a make_multi_target_frame output.
+    Each target uses exactly the columns its single-target frame would have.
+    Models train concurrently in a process pool reading one memory-mapped
+    copy of the numeric columns; OpenMP threads per worker are capped so
+    the pool doesn't oversubscribe cores.
+    """
+    targets = list(targets)
+    numeric = [c for c in df.columns if c not in {"date", "campaign"}]
+    pos = {c: j for j, c in enumerate(numeric)}
+
+    feature_cols, tasks = {}, []
+    for t in targets:
+        cols = feature_columns(df[target_columns(df, targets, t)], t)
+        feature_cols[t] = cols
+        tasks.append(([pos[c] for c in cols], pos[t]))
+
+    workers = min(workers or os.cpu_count() or 1, len(targets))
+    arrays = {"W": df[numeric].to_numpy(dtype=np.float64)}
+    with shared_map(arrays, workers, prefix="multi_target_") as run:
+        models = run(_fit_columns, tasks)
 
-    return ForecastBundle(model=model, feature_cols=feature_cols, target=target)
+    return MultiTargetBundle(bundles={
+        t: ForecastBundle(model=m, feature_cols=feature_cols[t], target=t)
+        for t, m in zip(targets, models)
+    })
@@ -0,0 +1,286 @@
+"""
+Out-of-core training data.
+
+build_disk_matrix streams the daily store in campaign batches (each batch
+holds complete campaign histories, so lag/rolling features never cross a
+batch), builds each batch's features with a FeaturePlan and appends them
+as raw float32 rows to a file on disk; memory use is one batch whatever
+the dataset size. DiskMatrix memory-maps that file for training: the
+selected rows (optionally a seeded subsample) are gathered chunk by chunk
+and each chunk's pages are released once copied, so the process only
+holds the rows the model is fitted on.
+"""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from src import profiling
+from src.feature_block import BLOCK_DTYPE, FeatureBlock
+from src.feature_cache import feature_key
+from src.feature_plan import FeaturePlan, full_feature_columns
+from src.model import ForecastBundle, train_forecaster
+from src.store import campaign_batches, path_digest, read_daily, store_columns
+
+OOC_DIR = "artifacts/cache/ooc"
+# Matrices are full-size copies of the features; older ones are evicted past this
+MAX_OOC_BYTES = 8 * 1024 ** 3
+# Fit memory allowed for train_out_of_core's gathered rows and sklearn's float64 copies
+MAX_FIT_BYTES = 4 * 1024 ** 3
+# Daily rows read and featurized at a time
+BATCH_ROWS = 1 << 18
+
+META_FILE = "meta.json"
+MATRIX_FILE = "X.f32"
+# Per-row arrays stored next to the matrix: name -> on-disk dtype (dates as int64 ns)
+ROW_ARRAYS = {"y": np.float64, "dates": np.int64, "codes": np.int32}
+
+
+@dataclass
+class DiskMatrix:
+    """
+    A supervised frame on disk: the (n_rows, n_features) float32 matrix,
+    row-major in X.f32, plus the float64 target, dates and int32 campaign
+    codes. Rows are ordered by (campaign batch, campaign, date).
+    """
+    root: str
+    feature_cols: List[str]
+    target: str
+    campaigns: np.ndarray  # code -> campaign label
+    n_rows: int
+
+    @classmethod
+    def open(cls, root: str) -> "DiskMatrix":
+        with open(os.path.join(root, META_FILE)) as f:
+            meta = json.load(f)
+        return cls(
+            root=root,
+            feature_cols=meta["feature_cols"],
+            target=meta["target"],
+            campaigns=np.asarray(meta["campaigns"], dtype=object),
+            n_rows=meta["n_rows"],
+        )
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_cols)
+
+    @property
+    def nbytes(self) -> int:
+        return self.n_rows * (self.n_features * np.dtype(BLOCK_DTYPE).itemsize + sum(
+            np.dtype(t).itemsize for t in ROW_ARRAYS.values()
+        ))
+
+    def column(self, name: str) -> np.ndarray:
+        """A per-row array (y, dates or codes) as a read-only memory map; dates are datetime64[ns]."""
+        arr = np.memmap(os.path.join(self.root, f"{name}.bin"), dtype=ROW_ARRAYS[name], mode="r", shape=(self.n_rows,))
+        return arr.view("datetime64[ns]") if name == "dates" else arr
+
+    def rows_through(self, cutoff) -> np.ndarray:
+        """Indices of rows dated on or before `cutoff`."""
+        return np.flatnonzero(self.column("dates") <= np.datetime64(pd.Timestamp(cutoff), "ns"))
+
+    def sample(self, rows=None, max_rows: int = None, seed: int = 0) -> np.ndarray:
+        """Sorted row indices: `rows` (default all), cut to a seeded random subset of at most `max_rows`."""
+        rows = np.arange(self.n_rows) if rows is None else np.asarray(rows, dtype=np.int64)
+        if max_rows is not None and len(rows) > max_rows:
+            rows = np.random.default_rng(seed).choice(rows, size=max_rows, replace=False)
+        return np.sort(rows)
+
+    def block(self, rows, chunk_rows: int = 1 << 16) -> FeatureBlock:
+        """The rows at sorted indices `rows`, gathered from the memory map into a FeatureBlock."""
+        rows = np.asarray(rows, dtype=np.int64)
+        values = np.empty((len(rows), self.n_features), dtype=BLOCK_DTYPE, order="F")
+        row_bytes = self.n_features * np.dtype(BLOCK_DTYPE).itemsize
+
+        with open(os.path.join(self.root, MATRIX_FILE), "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                X = np.frombuffer(mm, dtype=BLOCK_DTYPE).reshape(self.n_rows, self.n_features)
+                for lo in range(0, len(rows), chunk_rows):
+                    idx = rows[lo:lo + chunk_rows]
+                    values[lo:lo + len(idx)] = X[idx]
+                    # The copied pages are page cache; drop them from this process's resident set
+                    start = int(idx[0]) * row_bytes // mmap.PAGESIZE * mmap.PAGESIZE
+                    mm.madvise(mmap.MADV_DONTNEED, start, (int(idx[-1]) + 1) * row_bytes - start)
+                del X
+
+        return FeatureBlock(
+            values=values,
+            feature_cols=list(self.feature_cols),
+            target=self.target,
+            y=np.asarray(self.column("y")[rows]),
+            dates=np.asarray(self.column("dates")[rows]),
+            campaign_codes=np.asarray(self.column("codes")[rows]),
+            campaigns=self.campaigns,
+        )
+
+
+@profiling.traced("build_disk_matrix", rows=lambda m: m.n_rows)
+def build_disk_matrix(
+    data_path: str,
+    target: str,
+    root: str,
+    feature_cols=None,
+    group_col: str = "campaign",
+    batch_rows: int = BATCH_ROWS,
+) -> DiskMatrix:
+    """
+    Featurize the store at `data_path` into a DiskMatrix at `root`, one
+    campaign batch of about `batch_rows` daily rows at a time. Builds the
+    full make_supervised_frame columns, or only `feature_cols` (e.g. a
+    pruned bundle's) when given. The directory is swapped in when complete.
+    """
+    if feature_cols is None:
+        feature_cols = full_feature_columns(store_columns(data_path), target, group_col)
+    plan = FeaturePlan.from_columns(feature_cols, target)
+    batches = campaign_batches(data_path, batch_rows)
+    campaigns = pd.Index(sorted(c for batch in batches for c in batch))
+
+    tmp = f"{root}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    files = {name: open(os.path.join(tmp, f"{name}.bin"), "wb") for name in ROW_ARRAYS}
+    files["X"] = open(os.path.join(tmp, MATRIX_FILE), "wb")
+    n_rows = 0
+    try:
+        for batch in batches:
+            with profiling.span("featurize_batch", campaigns=len(batch)) as s:
+                out, block, keep = plan.parts(read_daily(data_path, campaigns=batch), group_col=group_col)
+                n = int(keep.sum())
+                # Row-major so batches append as contiguous rows of the file
+                X = np.empty((n, len(plan.specs)), dtype=BLOCK_DTYPE)
+                for j, (_, values) in enumerate(plan.columns(out, block)):
+                    X[:, j] = values[keep]
+                X.tofile(files["X"])
+                out[target].to_numpy(dtype=np.float64)[keep].tofile(files["y"])
+                out["date"].to_numpy(dtype="datetime64[ns]")[keep].view(np.int64).tofile(files["dates"])
+                codes = campaigns.get_indexer(out[group_col].astype(str).to_numpy()[keep])
+                codes.astype(np.int32).tofile(files["codes"])
+                n_rows += n
+                s.rows = n
+    finally:
+        for f in files.values():
+            f.close()
+
+    if n_rows == 0:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise ValueError(f"No supervised rows in {data_path}; campaigns need more than {plan.min_history} days.")
+
+    with open(os.path.join(tmp, META_FILE), "w") as f:
+        json.dump({
+            "target": target,
+            "feature_cols": plan.feature_cols,
+            "campaigns": campaigns.tolist(),
+            "n_rows": n_rows,
+        }, f)
+    shutil.rmtree(root, ignore_errors=True)
+    os.replace(tmp, root)
+    return DiskMatrix.open(root)
+
+
+def evict_matrices(cache_dir: str = OOC_DIR, max_bytes: int = MAX_OOC_BYTES, keep: str = None) -> list:
+    """
+    Delete least-recently-used matrix directories under `cache_dir` until
+    they fit in `max_bytes`, never `keep`. Like feature_cache.evict_lru,
+    recency is the mtime of the entry's meta.json, refreshed on every hit;
+    directories without one (builds in progress) are left alone.
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for name in os.listdir(cache_dir):
+        root = os.path.join(cache_dir, name)
+        meta = os.path.join(root, META_FILE)
+        if not os.path.isfile(meta):
+            continue
+        size = sum(e.stat().st_size for e in os.scandir(root) if e.is_file())
+        entries.append((os.stat(meta).st_mtime, size, name))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for _, size, name in entries:
+        if total <= max_bytes:
+            break
+        if name == keep:
+            continue
+        shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+        total -= size
+        removed.append(name)
+    return removed
+
+
+def cached_disk_matrix(
+    data_path: str,
+    target: str,
+    feature_cols=None,
+    cache_dir: str = OOC_DIR,
+    max_bytes: int = MAX_OOC_BYTES,
+    batch_rows: int = BATCH_ROWS,
+    verbose: bool = True,
+) -> DiskMatrix:
+    """
+    build_disk_matrix under `cache_dir`, keyed like the feature cache (plus
+    the planned columns). After a build, least-recently-used matrices are
+    evicted to keep the directory under `max_bytes`.
+    """
+    t0 = time.perf_counter()
+    key = feature_key(path_digest(data_path), target=target)
+    if feature_cols is not None:
+        key += "-" + hashlib.sha256(json.dumps(list(feature_cols)).encode()).hexdigest()[:8]
+    root = os.path.join(cache_dir, key)
+
+    if os.path.exists(os.path.join(root, META_FILE)):
+        os.utime(os.path.join(root, META_FILE))  # refresh recency for evict_matrices
+        matrix = DiskMatrix.open(root)
+        if verbose:
+            print(f"Disk matrix hit: {key} ({matrix.n_rows:,} rows)")
+        return matrix
+
+    matrix = build_disk_matrix(data_path, target, root, feature_cols=feature_cols, batch_rows=batch_rows)
+    evicted = evict_matrices(cache_dir, max_bytes, keep=key)
+    if verbose:
+        print(f"Disk matrix built: {key} ({matrix.n_rows:,} rows, {matrix.nbytes / 1024 ** 2:,.0f} MB "
+              f"in {time.perf_counter() - t0:.1f}s)")
+        if evicted:
+            print(f"Disk matrix cache evicted {len(evicted)} entr{'y' if len(evicted) == 1 else 'ies'}")
+    return matrix
+
+
+def train_out_of_core(
+    matrix: DiskMatrix,
+    rows=None,
+    max_rows: int = None,
+    seed: int = 0,
+    prune: float = None,
+    params: dict = None,
+    max_bytes: int = MAX_FIT_BYTES,
+) -> ForecastBundle:
+    """
+    train_forecaster on rows of a DiskMatrix (default all). With `max_rows`
+    the model is fitted on a seeded random subset, which bounds memory:
+    HistGradientBoosting copies its input to float64 (and again for its
+    early-stopping split) before binning, so fit memory scales with the
+    rows it is given, not with the matrix on disk. Without it every row is
+    gathered, so a fit whose estimated memory exceeds `max_bytes` raises
+    ValueError before anything is read.
+    """
+    rows = matrix.sample(rows, max_rows=max_rows, seed=seed)
+    # float32 gather + float64 copy + float64 early-stopping split, per cell
+    fit_bytes = len(rows) * matrix.n_features * (np.dtype(BLOCK_DTYPE).itemsize + 2 * 8)
+    if fit_bytes > max_bytes:
+        raise ValueError(
+            f"Fitting {len(rows):,} rows x {matrix.n_features} features needs about {fit_bytes / 1024 ** 2:,.0f} MB "
+            f"(budget {max_bytes / 1024 ** 2:,.0f} MB); pass {'a smaller ' if max_rows else ''}max_rows "
+            f"(--max-rows) to fit on a subsample."
+        )
+    with profiling.span("gather_rows", rows=len(rows)):
+        block = matrix.block(rows)
+    return train_forecaster(block, matrix.target, prune=prune, params=params)
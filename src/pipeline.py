@@ -0,0 +1,280 @@
+"""
+Incremental, dependency-tracked runner for the pipeline scripts.
+
+Each Stage is a `python -m` module with declared input and output paths;
+a stage depends on every stage that writes one of its inputs. A stage's
+key hashes its module, arguments, the source code and the content of its
+inputs. It is skipped when the key matches the last successful run and
+its outputs still hash to what that run wrote, so an unchanged pipeline
+costs about the time it takes to hash the files. Stages whose
+dependencies are done run concurrently in subprocesses; every run writes
+a manifest with per-stage status and durations.
+"""
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List
+
+from src import profiling
+
+PIPELINE_DIR = "artifacts/pipeline"
+STATE_FILE = "state.json"
+MANIFEST_FILE = "manifest.json"
+# Hashed into every stage key: a code change reruns the pipeline
+CODE_PATHS = ("src",)
+
+DONE = ("ran", "skipped")
+
+
+@dataclass
+class Stage:
+    """One pipeline step: `python -m module *args`, reading `inputs` and writing `outputs`."""
+    name: str
+    module: str
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    args: List[str] = field(default_factory=list)
+
+    @property
+    def source(self) -> str:
+        return os.path.join(*self.module.split(".")) + ".py"
+
+
+def dependencies(stages: List[Stage]) -> Dict[str, List[str]]:
+    """Stage name -> names of the stages writing its inputs; raises on duplicate writers or cycles."""
+    writers = {}
+    for s in stages:
+        for path in s.outputs:
+            if path in writers:
+                raise ValueError(f"'{path}' is written by both '{writers[path]}' and '{s.name}'.")
+            writers[path] = s.name
+    deps = {s.name: sorted({writers[p] for p in s.inputs if p in writers and writers[p] != s.name}) for s in stages}
+
+    visiting, ordered = set(), set()
+
+    def visit(name, chain):
+        if name in ordered:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline has a cycle: {' -> '.join(chain + [name])}")
+        visiting.add(name)
+        for d in deps[name]:
+            visit(d, chain + [name])
+        visiting.discard(name)
+        ordered.add(name)
+
+    for name in deps:
+        visit(name, [])
+    return deps
+
+
+class Hasher:
+    """
+    sha256 of files and directories. A file's digest is reused while its
+    (mtime_ns, size) is unchanged, like artifacts.model_version; `memo`
+    persists in the pipeline state between runs.
+    """
+
+    def __init__(self, memo: dict = None, chunk_size: int = 1 << 20):
+        self.memo = memo if memo is not None else {}
+        self.chunk_size = chunk_size
+
+    def file(self, path: str) -> str:
+        st = os.stat(path)
+        cached = self.memo.get(path)
+        if cached is not None and cached[:2] == [st.st_mtime_ns, st.st_size]:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                h.update(chunk)
+        self.memo[path] = [st.st_mtime_ns, st.st_size, h.hexdigest()]
+        return h.hexdigest()
+
+    def path(self, path: str, suffix: str = "") -> str:
+        """Digest of a file, or of a directory's files (relative paths included); None if missing."""
+        if os.path.isfile(path):
+            return self.file(path)
+        if not os.path.isdir(path):
+            return None
+        h = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            # Skip in-progress temp files and caches (dot-prefixed, __pycache__)
+            dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d != "__pycache__")
+            for name in sorted(files):
+                if name.startswith(".") or not name.endswith(suffix):
+                    continue
+                f = os.path.join(root, name)
+                h.update(os.path.relpath(f, path).encode())
+                h.update(self.file(f).encode())
+        return h.hexdigest()
+
+
+def _write_json(path: str, obj) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _run_stage(stage: Stage, log_path: str) -> tuple:
+    t0 = time.perf_counter()
+    with open(log_path, "w") as log:
+        proc = subprocess.run([sys.executable, "-m", stage.module, *stage.args], stdout=log, stderr=subprocess.STDOUT)
+    return proc.returncode, time.perf_counter() - t0
+
+
+def run_pipeline(
+    stages: List[Stage],
+    targets: List[str] = None,
+    force: List[str] = (),
+    workers: int = 2,
+    dry_run: bool = False,
+    state_dir: str = PIPELINE_DIR,
+    verbose: bool = True,
+) -> dict:
+    """
+    Bring `targets` (default: every stage) and their upstream stages up to
+    date. Stages in `force` run even when up to date. With dry_run nothing
+    runs; stale stages (and everything downstream) are reported as
+    "stale". Returns the run manifest, also written to state_dir.
+    """
+    deps = dependencies(stages)
+    by_name = {s.name: s for s in stages}
+    unknown = [n for n in list(targets or []) + list(force) if n not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown}; expected some of {list(by_name)}.")
+
+    selected, todo = set(), list(targets or by_name)
+    while todo:
+        name = todo.pop()
+        if name not in selected:
+            selected.add(name)
+            todo.extend(deps[name])
+
+    os.makedirs(os.path.join(state_dir, "logs"), exist_ok=True)
+    state_path = os.path.join(state_dir, STATE_FILE)
+    state = {"stages": {}, "files": {}}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+    hasher = Hasher(state.setdefault("files", {}))
+
+    started = datetime.now()
+    t_run = time.perf_counter()
+    with profiling.span("hash_code"):
+        code = hashlib.sha256("".join(hasher.path(p, suffix=".py") or "" for p in CODE_PATHS).encode()).hexdigest()
+
+    results = {}
+
+    def stage_key(stage: Stage) -> tuple:
+        inputs = {p: hasher.path(p) for p in stage.inputs}
+        config = {
+            "module": stage.module,
+            "args": stage.args,
+            "source": hasher.path(stage.source),
+            "code": code,
+            "inputs": inputs,
+        }
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:24], inputs
+
+    def up_to_date(stage: Stage, key: str) -> bool:
+        last = state["stages"].get(stage.name)
+        if last is None or last["key"] != key or stage.name in force:
+            return False
+        return all(hasher.path(p) == last["outputs"].get(p) for p in stage.outputs)
+
+    def report(name: str) -> None:
+        r = results[name]
+        if verbose:
+            took = f" in {r['seconds']:.1f}s" if r["status"] in ("ran", "failed") else ""
+            print(f"[{name}] {r['status']}{took} (hashing {r['hash_seconds'] * 1000:.0f} ms)")
+
+    def start(name: str, pool, running: dict) -> None:
+        stage = by_name[name]
+        t0 = time.perf_counter()
+        with profiling.span("hash_stage", stage=name):
+            key, inputs = stage_key(stage)
+            fresh = up_to_date(stage, key)
+        result = {"key": key, "inputs": inputs, "hash_seconds": time.perf_counter() - t0, "seconds": 0.0}
+        results[name] = result
+        if fresh:
+            result.update(status="skipped", outputs=state["stages"][name]["outputs"])
+            report(name)
+        elif dry_run:
+            result["status"] = "stale"
+            report(name)
+        else:
+            result.update(status="running", log=os.path.join(state_dir, "logs", f"{name}.log"))
+            if verbose:
+                print(f"[{name}] running: python -m {stage.module} {' '.join(stage.args)}".rstrip())
+            running[pool.submit(_run_stage, stage, result["log"])] = name
+
+    def finish(name: str, returncode: int, seconds: float) -> None:
+        stage, result = by_name[name], results[name]
+        result.update(seconds=seconds, returncode=returncode)
+        outputs = {p: hasher.path(p) for p in stage.outputs}
+        missing = [p for p, digest in outputs.items() if digest is None]
+        if returncode != 0 or missing:
+            result["status"] = "failed"
+            if missing and returncode == 0:
+                result["error"] = f"declared outputs not written: {missing}"
+        else:
+            result.update(status="ran", outputs=outputs)
+            state["stages"][name] = {"key": result["key"], "outputs": outputs}
+            _write_json(state_path, state)
+        report(name)
+        if result["status"] == "failed" and verbose:
+            with open(result["log"]) as f:
+                tail = f.read().strip().splitlines()[-5:]
+            print("\n".join(f"  {line}" for line in tail + ([result["error"]] if "error" in result else [])))
+
+    pending = [s.name for s in stages if s.name in selected]
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while pending or running:
+            for name in list(pending):
+                statuses = [results[d]["status"] for d in deps[name] if d in results]
+                if any(s in ("failed", "blocked") for s in statuses):
+                    results[name] = {"status": "blocked", "seconds": 0.0, "hash_seconds": 0.0}
+                    report(name)
+                elif dry_run and "stale" in statuses:
+                    results[name] = {"status": "stale", "seconds": 0.0, "hash_seconds": 0.0}
+                    report(name)
+                elif len(statuses) == len(deps[name]) and all(s in DONE + ("stale",) for s in statuses):
+                    start(name, pool, running)
+                else:
+                    continue
+                pending.remove(name)
+            if running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    finish(running.pop(future), *future.result())
+            elif pending and not any(
+                all(d in results for d in deps[name]) for name in pending
+            ):
+                raise RuntimeError(f"Pipeline stalled with stages {pending} pending.")
+
+    # Forget digests of files that are gone (e.g. replaced partitions)
+    state["files"] = {p: v for p, v in state["files"].items() if os.path.exists(p)}
+    _write_json(state_path, state)
+    manifest = {
+        "started": started.isoformat(timespec="seconds"),
+        "seconds": time.perf_counter() - t_run,
+        "workers": workers,
+        "dry_run": dry_run,
+        "code": code[:24],
+        "stages": {name: results[name] for name in by_name if name in results},
+    }
+    if not dry_run:
+        runs = os.path.join(state_dir, "runs")
+        os.makedirs(runs, exist_ok=True)
+        _write_json(os.path.join(runs, f"{started:%Y%m%dT%H%M%S}.json"), manifest)
+        _write_json(os.path.join(state_dir, MANIFEST_FILE), manifest)
+    return manifest
@@ -1,7 +1,29 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
 import numpy as np
 import pandas as pd
 
-from src.features import make_supervised_frame
+from src import profiling
+from src.feature_cache import evict_lru
+from src.feature_state import FeatureState
+from src.features import LAGS, WINDOWS
+from src.store import read_daily, read_recent
+
+# Calendar days read for next-day context: twice the 15-row feature window,
+# leaving room for campaigns with a few missing days
+CONTEXT_DAYS = 30
+# Rows per campaign the context state needs (features count rows, not days)
+CONTEXT_ROWS = max(max(LAGS), max(WINDOWS)) + 1
+
+SCENARIO_CACHE_DIR = "artifacts/cache/scenarios"
+SCENARIO_CACHE_BYTES = 64 * 1024 ** 2
+SCENARIO_DISK_BYTES = 512 * 1024 ** 2
 
 
 def softmax(x: np.ndarray) -> np.ndarray:
@@ -10,15 +32,47 @@ def softmax(x: np.ndarray) -> np.ndarray:
     return e / np.sum(e)
 
 
-def latest_supervised_rows(df_daily: pd.DataFrame, target: str = "clicks") -> pd.DataFrame:
+def latest_supervised_rows(df_daily: pd.DataFrame, target: str = "clicks", feature_cols=None) -> pd.DataFrame:
     """
-    Build supervised frame and return rows for the latest available date
+    Return supervised rows for the latest available date
     (these rows represent the next-day prediction context).
+    Only the trailing window of history per campaign is used; see FeatureState.
+    With `feature_cols` (a bundle's) only the features it reads are built.
+    """
+    state = FeatureState.from_daily(df_daily, target=target, group_col="campaign")
+    return state.latest_rows(feature_cols)
+
+
+def load_context_state(data_path: str, target: str = "clicks") -> FeatureState:
+    """
+    FeatureState over the daily store, reading only the most recent
+    CONTEXT_DAYS (date filter pushed down to the Parquet scan) for
+    campaigns that have CONTEXT_ROWS rows in that window. Sparser campaigns
+    also get their older rows read (campaign filter pushed down), and a
+    state with no complete campaign falls back to the whole store, so its
+    latest rows are the same as latest_supervised_rows over the full
+    history.
     """
-    sup = make_supervised_frame(df_daily, target=target, group_col="campaign")
-    latest_date = sup["date"].max()
-    base = sup[sup["date"] == latest_date].copy()
-    return base
+    df = read_recent(data_path, CONTEXT_DAYS)
+    if len(df):
+        counts = df["campaign"].astype(str).value_counts()
+        short = counts.index[counts < CONTEXT_ROWS].tolist()
+        if short:
+            with profiling.span("read_sparse_history", campaigns=len(short)):
+                older = read_daily(data_path, end=df["date"].min() - pd.Timedelta(days=1), campaigns=short)
+            if len(older):
+                df = pd.concat([older, df], ignore_index=True)
+    state = FeatureState.from_daily(df, target=target, group_col="campaign")
+    if len(df) and not (state.counts >= state.depth).any():
+        # Only campaigns whose last row predates the window could still qualify
+        state = FeatureState.from_daily(read_daily(data_path), target=target, group_col="campaign")
+    return state
+
+
+@profiling.traced("load_context_rows", rows=len)
+def load_context_rows(data_path: str, target: str = "clicks", feature_cols=None) -> pd.DataFrame:
+    """Next-day context rows (latest_supervised_rows) from load_context_state."""
+    return load_context_state(data_path, target=target).latest_rows(feature_cols)
 
 
 def apply_scenario(base_df: pd.DataFrame, scenario: dict) -> pd.DataFrame:
@@ -34,9 +88,12 @@ def apply_scenario(base_df: pd.DataFrame, scenario: dict) -> pd.DataFrame:
     return out
 
 
-def forecast_table(bundle, base_df: pd.DataFrame) -> pd.DataFrame:
+@profiling.traced("forecast_table", rows=len)
+def forecast_table(bundle, base_df: pd.DataFrame, residuals=None, coverage: float = 0.9) -> pd.DataFrame:
     """
     Return predictions per campaign from a ForecastBundle loaded via joblib.
+    With a conformal ResidualStore, pred_clicks_lo / pred_clicks_hi give the
+    next-day interval at `coverage`.
     """
     preds = bundle.predict(base_df)
     out = pd.DataFrame({
@@ -44,43 +101,404 @@ def forecast_table(bundle, base_df: pd.DataFrame) -> pd.DataFrame:
         "pred_clicks": preds,
     })
     out["pred_clicks"] = out["pred_clicks"].clip(lower=0)
+    if residuals is not None:
+        _assign_intervals(out, residuals.half_width(out["campaign"].to_numpy(), coverage=coverage))
     return out.sort_values("pred_clicks", ascending=False).reset_index(drop=True)
 
 
-def scenario_table(bundle, base_df: pd.DataFrame, scenarios: dict) -> pd.DataFrame:
+def _assign_intervals(out: pd.DataFrame, half_width: np.ndarray) -> None:
+    pred = out["pred_clicks"].to_numpy(dtype=np.float64)
+    out["pred_clicks_lo"] = np.maximum(pred - half_width, 0.0)
+    out["pred_clicks_hi"] = pred + half_width
+
+
+def scenario_matrix(bundle, base_df: pd.DataFrame, scenarios: dict) -> np.ndarray:
+    """
+    Multiplier matrix of shape (n_scenarios + 1, n_features); row 0 is the
+    baseline (all ones). Columns not used by the model leave predictions unchanged.
+    """
+    col_idx = {c: j for j, c in enumerate(bundle.feature_cols)}
+    mults = np.ones((len(scenarios) + 1, len(bundle.feature_cols)))
+    for i, changes in enumerate(scenarios.values(), start=1):
+        for col, mult in changes.items():
+            if col not in base_df.columns:
+                raise ValueError(f"Scenario column '{col}' not found in model features.")
+            if col in col_idx:
+                mults[i, col_idx[col]] *= float(mult)
+    return mults
+
+
+def normalize_scenario(bundle, base_df: pd.DataFrame, changes: dict) -> tuple:
+    """
+    Canonical form of a scenario: sorted (column, multiplier) pairs without
+    the ones that cannot change predictions (columns the model doesn't read,
+    multipliers of 1). Equivalent scenarios share a form; the baseline is ().
+    """
+    features = set(bundle.feature_cols)
+    out = {}
+    for col, mult in changes.items():
+        if col not in base_df.columns:
+            raise ValueError(f"Scenario column '{col}' not found in model features.")
+        if col in features and float(mult) != 1.0:
+            out[col] = float(mult)
+    return tuple(sorted(out.items()))
+
+
+def context_fingerprint(base_df: pd.DataFrame, X: np.ndarray) -> str:
+    """Content hash of a scenario context: its date, campaigns and model input matrix."""
+    h = hashlib.sha256()
+    if "date" in base_df.columns and len(base_df):
+        h.update(str(pd.Timestamp(base_df["date"].max())).encode())
+    h.update("\0".join(base_df["campaign"].astype(str)).encode())
+    h.update(f"{X.dtype}{X.shape}".encode())
+    h.update(np.ascontiguousarray(X))
+    return h.hexdigest()[:16]
+
+
+class ScenarioCache:
+    """
+    Scenario predictions (one float64 per campaign) keyed by (model key,
+    context fingerprint, normalized scenario), evicted least recently used
+    once they exceed `max_bytes`. With `path`, entries are also written
+    there as .npy files and read back on a memory miss, so results survive
+    restarts; the directory is trimmed to `max_disk_bytes` like the feature
+    cache. Safe to share between threads.
+    """
+
+    def __init__(self, max_bytes: int = SCENARIO_CACHE_BYTES, path: str = None, max_disk_bytes: int = SCENARIO_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def _file(self, key) -> str:
+        digest = hashlib.sha256(json.dumps([key[0], key[1], list(key[2])]).encode()).hexdigest()[:24]
+        return os.path.join(self.path, f"{digest}.npy")
+
+    def get(self, key) -> Optional[np.ndarray]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if self.path is not None:
+            path = self._file(key)
+            try:
+                preds = np.load(path)
+                os.utime(path)  # refresh recency for evict_lru
+            except (FileNotFoundError, ValueError):
+                preds = None
+            if preds is not None:
+                self._remember(key, preds)
+                with self._lock:
+                    self.disk_hits += 1
+                return preds
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, preds: np.ndarray) -> None:
+        preds = self._remember(key, preds)
+        if self.path is not None:
+            os.makedirs(self.path, exist_ok=True)
+            path = self._file(key)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, preds)
+            os.replace(tmp, path)
+            evict_lru(self.path, self.max_disk_bytes, suffix=".npy")
+
+    def _remember(self, key, preds: np.ndarray) -> np.ndarray:
+        preds = np.array(preds, dtype=np.float64)
+        preds.setflags(write=False)
+        with self._lock:
+            if key in self._entries:
+                self._nbytes -= self._entries.pop(key).nbytes
+            if preds.nbytes <= self.max_bytes:
+                self._entries[key] = preds
+                self._nbytes += preds.nbytes
+            while self._nbytes > self.max_bytes:
+                self._nbytes -= self._entries.popitem(last=False)[1].nbytes
+                self.evictions += 1
+        return preds
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._nbytes,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        """Drop the in-memory entries and reset the statistics (files under `path` are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+
+@profiling.traced("cached_scenario_predictions", rows=np.size)
+def cached_scenario_predictions(
+    bundle,
+    base_df: pd.DataFrame,
+    scenarios: dict,
+    cache: ScenarioCache,
+    model_key: str = None,
+    max_rows: int = 1 << 16,
+) -> np.ndarray:
+    """
+    predict_scenarios for the baseline plus `scenarios`, served from `cache`
+    where possible: only scenarios it has not seen for this model and
+    context are predicted (as one batch) and then stored. model_key defaults
+    to the bundle's fingerprint; a loaded artifact can pass its
+    artifacts.model_version instead.
+    """
+    keys = [()] + [normalize_scenario(bundle, base_df, changes) for changes in scenarios.values()]
+    X = bundle.model_input(base_df)
+    prefix = (model_key or bundle.fingerprint(), context_fingerprint(base_df, X))
+
+    found = {}
+    for key in dict.fromkeys(keys):
+        preds = cache.get(prefix + (key,))
+        if preds is not None:
+            found[key] = preds
+    new = [key for key in dict.fromkeys(keys) if key not in found]
+    if new:
+        col_idx = {c: j for j, c in enumerate(bundle.feature_cols)}
+        mults = np.ones((len(new), len(bundle.feature_cols)))
+        for i, key in enumerate(new):
+            for col, mult in key:
+                mults[i, col_idx[col]] = mult
+        for key, preds in zip(new, _predict_multipliers(bundle, X, mults, max_rows)):
+            cache.put(prefix + (key,), preds)
+            found[key] = preds
+    return np.stack([found[key] for key in keys])
+
+
+@profiling.traced("predict_scenarios", rows=np.size)
+def predict_scenarios(bundle, base_df: pd.DataFrame, mults: np.ndarray, max_rows: int = 1 << 16) -> np.ndarray:
+    """
+    Predictions of shape (n_scenarios, n_campaigns) for each multiplier row,
+    scored in as few `predict` calls as `max_rows` allows.
+    """
+    X = bundle.model_input(base_df)
+    return _predict_multipliers(bundle, X, mults, max_rows)
+
+
+def _predict_multipliers(bundle, X: np.ndarray, mults: np.ndarray, max_rows: int) -> np.ndarray:
+    """
+    Predictions (n_scenarios, n_campaigns) for X scaled by each row of
+    `mults`, in batches of about `max_rows` rows. Every batch is a new
+    matrix in X's dtype, so a FeatureBlock input would not save a copy.
+    """
+    n_scen, n_camp = len(mults), len(X)
+    per_batch = max(1, max_rows // max(n_camp, 1))
+
+    preds = np.empty((n_scen, n_camp))
+    for lo in range(0, n_scen, per_batch):
+        hi = min(lo + per_batch, n_scen)
+        batch = np.multiply(X[None, :, :], mults[lo:hi, None, :], dtype=X.dtype).reshape(-1, X.shape[1])
+        preds[lo:hi] = bundle.predict_array(batch).reshape(hi - lo, n_camp)
+    return np.maximum(preds, 0.0)
+
+
+@profiling.traced("scenario_table", rows=len)
+def scenario_table(
+    bundle,
+    base_df: pd.DataFrame,
+    scenarios: dict,
+    deltas: bool = False,
+    residuals=None,
+    coverage: float = 0.9,
+    cache: Optional[ScenarioCache] = None,
+    model_key: str = None,
+) -> pd.DataFrame:
     """
     Run multiple scenarios and return a tidy table.
+    All scenarios are scored as one stacked feature matrix; with deltas=True
+    the add_deltas columns are included. With a conformal ResidualStore the
+    per-campaign interval widths are looked up once and applied to every
+    scenario (pred_clicks_lo / pred_clicks_hi). With a ScenarioCache only
+    scenarios it hasn't seen are predicted (see cached_scenario_predictions).
     """
-    base_pred = bundle.predict(base_df)
-    rows = []
+    names = ["Baseline"] + list(scenarios)
+    campaigns = base_df["campaign"].astype(str).to_numpy()
+    if cache is not None:
+        preds = cached_scenario_predictions(bundle, base_df, scenarios, cache, model_key=model_key)
+    else:
+        preds = predict_scenarios(bundle, base_df, scenario_matrix(bundle, base_df, scenarios))
+    half_width = residuals.half_width(campaigns, coverage=coverage) if residuals is not None else None
+    return tidy_scenarios(names, campaigns, preds, deltas=deltas, half_width=half_width)
 
-    # Baseline
-    for camp, val in zip(base_df["campaign"].astype(str).values, base_pred):
-        rows.append({"scenario": "Baseline", "campaign": camp, "pred_clicks": max(0.0, float(val))})
 
-    # Scenarios
-    for name, changes in scenarios.items():
-        scen_df = apply_scenario(base_df, changes)
-        scen_pred = bundle.predict(scen_df)
-        for camp, val in zip(base_df["campaign"].astype(str).values, scen_pred):
-            rows.append({"scenario": name, "campaign": camp, "pred_clicks": max(0.0, float(val))})
+def tidy_scenarios(names, campaigns: np.ndarray, preds: np.ndarray, deltas: bool = False, half_width=None) -> pd.DataFrame:
+    """
+    scenario_table layout for predictions of shape (len(names), n_campaigns)
+    whose first row is the baseline; half_width adds interval columns.
+    """
+    n_camp = len(campaigns)
+    out = pd.DataFrame({
+        "scenario": np.repeat(np.array(names, dtype=object), n_camp),
+        "campaign": np.tile(campaigns, len(names)),
+        "pred_clicks": preds.ravel(),
+    })
+    if deltas:
+        baseline = np.tile(preds[0], len(names))
+        _assign_deltas(out, baseline)
+    if half_width is not None:
+        _assign_intervals(out, np.tile(half_width, len(names)))
 
-    out = pd.DataFrame(rows)
     return out.sort_values(["scenario", "pred_clicks"], ascending=[True, False]).reset_index(drop=True)
 
 
+def _assign_deltas(out: pd.DataFrame, baseline: np.ndarray) -> None:
+    out["baseline_clicks"] = baseline
+    out["delta_clicks"] = out["pred_clicks"] - baseline
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["delta_pct"] = np.where(baseline > 0, out["delta_clicks"].to_numpy() / baseline, np.nan)
+
+
 def add_deltas(scen_df: pd.DataFrame) -> pd.DataFrame:
     """
     Adds delta vs baseline per campaign.
     """
-    base = scen_df[scen_df["scenario"] == "Baseline"][["campaign", "pred_clicks"]].rename(
-        columns={"pred_clicks": "baseline_clicks"}
-    )
-    out = scen_df.merge(base, on="campaign", how="left")
-    out["delta_clicks"] = out["pred_clicks"] - out["baseline_clicks"]
-    out["delta_pct"] = np.where(
-        out["baseline_clicks"] > 0,
-        out["delta_clicks"] / out["baseline_clicks"],
-        np.nan
-    )
+    base = scen_df.loc[scen_df["scenario"] == "Baseline"].set_index("campaign")["pred_clicks"]
+    out = scen_df.copy()
+    _assign_deltas(out, out["campaign"].map(base).to_numpy(dtype=np.float64))
     return out
+
+
+# In-memory per-campaign predictions allowed by scenario_sweep without out_path
+MAX_SWEEP_BYTES = 256 * 1024 ** 2
+
+
+@dataclass
+class SweepResult:
+    """
+    Output of scenario_sweep. preds has shape (*grid_shape, n_campaigns) and
+    may be a memory-mapped .npy file (None when streamed to Parquet);
+    totals is the portfolio-total surface with shape grid_shape.
+    """
+    axes: Dict[str, np.ndarray]
+    campaigns: np.ndarray
+    totals: np.ndarray
+    preds: Optional[np.ndarray] = None
+
+    @property
+    def grid_shape(self) -> tuple:
+        return tuple(len(v) for v in self.axes.values())
+
+    def campaign_surface(self, campaign: str) -> np.ndarray:
+        if self.preds is None:
+            raise ValueError("Per-campaign predictions were streamed to Parquet; read them from there.")
+        idx = np.flatnonzero(self.campaigns == campaign)
+        if len(idx) == 0:
+            raise ValueError(f"Unknown campaign '{campaign}'.")
+        return np.asarray(self.preds[..., idx[0]])
+
+    def surface_frame(self, campaign: Optional[str] = None) -> pd.DataFrame:
+        """Long-form surface: one row per grid point with the multipliers and pred_clicks."""
+        values = self.totals if campaign is None else self.campaign_surface(campaign)
+        mesh = np.meshgrid(*self.axes.values(), indexing="ij")
+        out = pd.DataFrame({col: m.ravel() for col, m in zip(self.axes, mesh)})
+        out["pred_clicks"] = values.ravel()
+        return out
+
+
+@profiling.traced("scenario_sweep", rows=lambda r: r.totals.size * len(r.campaigns))
+def scenario_sweep(
+    bundle,
+    base_df: pd.DataFrame,
+    ranges: dict,
+    out_path: Optional[str] = None,
+    max_rows: int = 1 << 16,
+    max_memory_bytes: int = MAX_SWEEP_BYTES,
+) -> SweepResult:
+    """
+    Evaluate the Cartesian grid of per-column multipliers, e.g.
+      {"impressions": np.linspace(0.5, 1.5, 50), "ctr": np.linspace(0.8, 1.2, 50)}
+
+    Grid points are scored in chunks of about `max_rows` feature rows, so
+    scoring memory is bounded; the per-campaign predictions are one float32
+    per (grid point, campaign). With out_path ending in .npy they go to a
+    memory-mapped array; with .parquet they are streamed as
+    (multipliers..., campaign, pred_clicks) row groups. Without out_path
+    they are kept in memory, which is refused (ValueError) above
+    `max_memory_bytes`: e.g. 50x50x20 points over 5,000 campaigns is 1 GB.
+    """
+    col_idx = {c: j for j, c in enumerate(bundle.feature_cols)}
+    for col in ranges:
+        if col not in base_df.columns:
+            raise ValueError(f"Scenario column '{col}' not found in model features.")
+
+    axes = {col: np.asarray(vals, dtype=np.float64) for col, vals in ranges.items()}
+    shape = tuple(len(v) for v in axes.values())
+    n_grid = int(np.prod(shape))
+    campaigns = base_df["campaign"].astype(str).to_numpy()
+    n_camp = len(campaigns)
+
+    X = bundle.model_input(base_df)
+    totals = np.empty(n_grid)
+
+    writer = None
+    preds = None
+    if out_path is not None and out_path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    elif out_path is not None and out_path.endswith(".npy"):
+        preds = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.float32, shape=(n_grid, n_camp))
+    elif out_path is not None:
+        raise ValueError("out_path must end with .npy or .parquet")
+    elif n_grid * n_camp * 4 > max_memory_bytes:
+        raise ValueError(
+            f"{n_grid:,} grid points x {n_camp:,} campaigns need {n_grid * n_camp * 4 / 1024 ** 2:,.1f} MB of "
+            f"predictions; pass out_path (.npy or .parquet) to keep them on disk."
+        )
+    else:
+        preds = np.empty((n_grid, n_camp), dtype=np.float32)
+
+    per_chunk = max(1, max_rows // max(n_camp, 1))
+    try:
+        for lo in range(0, n_grid, per_chunk):
+            hi = min(lo + per_chunk, n_grid)
+            idx = np.unravel_index(np.arange(lo, hi), shape)
+
+            mults = np.ones((hi - lo, X.shape[1]))
+            for (col, vals), ix in zip(axes.items(), idx):
+                if col in col_idx:
+                    mults[:, col_idx[col]] *= vals[ix]
+
+            chunk = _predict_multipliers(bundle, X, mults, max_rows)
+            totals[lo:hi] = chunk.sum(axis=1)
+
+            if preds is not None:
+                preds[lo:hi] = chunk
+            else:
+                table = {col: np.repeat(vals[ix], n_camp) for (col, vals), ix in zip(axes.items(), idx)}
+                table["campaign"] = np.tile(campaigns, hi - lo)
+                table["pred_clicks"] = chunk.ravel().astype(np.float32)
+                batch = pa.Table.from_pydict(table)
+                if writer is None:
+                    writer = pq.ParquetWriter(out_path, batch.schema)
+                writer.write_table(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if preds is not None:
+        if isinstance(preds, np.memmap):
+            preds.flush()
+        preds = preds.reshape(shape + (n_camp,))
+
+    return SweepResult(axes=axes, campaigns=campaigns, totals=totals.reshape(shape), preds=preds)
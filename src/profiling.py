@@ -0,0 +1,237 @@
+"""
+Lightweight stage instrumentation.
+
+Disabled by default: span() returns a shared no-op context and traced()
+wrappers make one flag check before calling through. Enable with the
+ADS_PROFILE environment variable (a trace path, or "1" for the default
+path) or enable() / a script's --profile flag. Enabled runs record nested
+wall-time spans with row throughput, tracemalloc current/peak deltas and
+process RSS, and export them as a Chrome trace (chrome://tracing, Perfetto)
+when the process exits.
+"""
+import atexit
+import functools
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+
+ENV_VAR = "ADS_PROFILE"
+DEFAULT_TRACE = "artifacts/profiles/trace.json"
+
+_enabled = False
+_state = {"path": None, "memory": True, "owner": None, "spans": [], "t0": 0}
+_local = threading.local()
+
+
+class _NullSpan:
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL = _NullSpan()
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux /proc), falling back to the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Span:
+    """One timed stage; set `rows` (or call set()) inside the block to record throughput."""
+
+    def __init__(self, name: str, rows=None, attrs=None):
+        self.name = name
+        self.rows = rows
+        self.attrs = attrs or {}
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.depth = len(stack)
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+
+        if _state["memory"] and tracemalloc.is_tracing():
+            cur, peak = tracemalloc.get_traced_memory()
+            if stack[:-1]:
+                stack[-2].peak_seen = max(stack[-2].peak_seen, peak)
+            tracemalloc.reset_peak()
+            self.mem_start = self.peak_seen = cur
+        else:
+            self.mem_start = None
+        self.rss_start = _rss_mb()
+        self.t_start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        t_end = time.perf_counter_ns()
+        stack = _local.stack
+        stack.pop()
+
+        record = {
+            "name": self.name,
+            "parent": self.parent,
+            "depth": self.depth,
+            "start_ms": (self.t_start - _state["t0"]) / 1e6,
+            "seconds": (t_end - self.t_start) / 1e9,
+            "rows": self.rows,
+            "rows_per_sec": self.rows / ((t_end - self.t_start) / 1e9) if self.rows and t_end > self.t_start else None,
+            "rss_mb": _rss_mb(),
+            "rss_delta_mb": None,
+            "alloc_delta_mb": None,
+            "alloc_peak_mb": None,
+            "thread": threading.get_ident(),
+            "error": exc_type.__name__ if exc_type else None,
+            **self.attrs,
+        }
+        record["rss_delta_mb"] = record["rss_mb"] - self.rss_start
+
+        if self.mem_start is not None and tracemalloc.is_tracing():
+            cur, peak = tracemalloc.get_traced_memory()
+            self.peak_seen = max(self.peak_seen, peak)
+            record["alloc_delta_mb"] = (cur - self.mem_start) / 1024 ** 2
+            record["alloc_peak_mb"] = (self.peak_seen - self.mem_start) / 1024 ** 2
+            if stack:
+                stack[-1].peak_seen = max(stack[-1].peak_seen, self.peak_seen)
+            tracemalloc.reset_peak()
+
+        _state["spans"].append(record)
+        return False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, rows=None, **attrs):
+    """Context manager timing one stage; a shared no-op when profiling is off."""
+    if not _enabled:
+        return _NULL
+    return Span(name, rows=rows, attrs=attrs)
+
+
+def traced(name: str = None, rows=None):
+    """
+    Decorator form of span(). `rows` is an optional callable applied to the
+    return value (e.g. len) to record throughput.
+    """
+    def wrap(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(label) as s:
+                result = fn(*args, **kwargs)
+                if rows is not None:
+                    s.rows = rows(result)
+                return result
+        return inner
+    return wrap
+
+
+def enable(path: str = None, memory: bool = True) -> None:
+    """Start recording; spans are exported to `path` when the process exits."""
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    _state.update(path=path or DEFAULT_TRACE, memory=memory, owner=os.getpid(), spans=[], t0=time.perf_counter_ns())
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    atexit.register(_export_at_exit)
+
+
+def disable() -> list:
+    """Stop recording and return the spans collected so far."""
+    global _enabled
+    _enabled = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return list(_state["spans"])
+
+
+def configure(path: str = None) -> bool:
+    """
+    Enable profiling from a script's --profile value or, failing that, the
+    ADS_PROFILE environment variable. Returns whether profiling is on.
+    """
+    env = os.environ.get(ENV_VAR, "")
+    if path is None and env and env.lower() not in ("0", "false", "no"):
+        path = None if env.lower() in ("1", "true", "yes") else env
+        enable(path)
+    elif path is not None:
+        enable(path)
+    return _enabled
+
+
+def spans() -> list:
+    return list(_state["spans"])
+
+
+def chrome_trace(records: list) -> dict:
+    """Chrome trace-event JSON (complete "X" events, microseconds)."""
+    pid = _state["owner"] or os.getpid()
+    events = []
+    for r in records:
+        args = {k: v for k, v in r.items() if k not in ("name", "start_ms", "seconds", "thread", "parent", "depth")}
+        events.append({
+            "name": r["name"],
+            "ph": "X",
+            "ts": r["start_ms"] * 1000,
+            "dur": r["seconds"] * 1e6,
+            "pid": pid,
+            "tid": r["thread"],
+            "args": args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms", "spans": records}
+
+
+def export(path: str = None) -> str:
+    path = path or _state["path"] or DEFAULT_TRACE
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(chrome_trace(_state["spans"]), f, indent=1, default=str)
+    return path
+
+
+def summary(records: list = None) -> str:
+    """Indented per-span table in completion order of the top-level stages."""
+    records = _state["spans"] if records is None else records
+    ordered = sorted(records, key=lambda r: r["start_ms"])
+    lines = [f"{'stage':<40s} {'seconds':>9s} {'rows/s':>12s} {'alloc peak MB':>14s} {'RSS MB':>9s}"]
+    for r in ordered:
+        label = ("  " * r["depth"] + r["name"])[:40]
+        rate = f"{r['rows_per_sec']:,.0f}" if r["rows_per_sec"] else ""
+        peak = f"{r['alloc_peak_mb']:.1f}" if r["alloc_peak_mb"] is not None else ""
+        lines.append(f"{label:<40s} {r['seconds']:9.3f} {rate:>12s} {peak:>14s} {r['rss_mb']:9.1f}")
+    return "\n".join(lines)
+
+
+def _export_at_exit() -> None:
+    # Forked workers inherit the enabled flag; only the process that enabled profiling writes
+    if not _enabled or _state["owner"] != os.getpid() or not _state["spans"]:
+        return
+    path = export()
+    print(f"\nProfile ({len(_state['spans'])} spans):\n{summary()}")
+    print(f"Saved profile trace to: {path}")
@@ -0,0 +1,329 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.artifacts import context_rows, file_version, load_bundle, load_residuals, model_version
+from src.planner import _predict_multipliers, scenario_matrix, tidy_scenarios
+from src.store import path_version
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+@dataclass
+class ServingState:
+    """Everything a batch needs, built off-loop and swapped in as one object on reload."""
+    bundle: object
+    base: pd.DataFrame
+    X: np.ndarray
+    campaigns: np.ndarray
+    residuals: object
+    model_version: str
+    context_date: str
+    key: tuple
+
+
+def artifact_key(model_path: str, data_path: str, residuals_path: Optional[str] = None) -> tuple:
+    """Cheap change detector over the model, the daily store and the residual store."""
+    residuals_key = file_version(residuals_path) if residuals_path and os.path.exists(residuals_path) else None
+    return (file_version(model_path), path_version(data_path), residuals_key)
+
+
+def load_state(model_path: str, data_path: str, residuals_path: Optional[str] = None) -> ServingState:
+    key = artifact_key(model_path, data_path, residuals_path)
+    bundle = load_bundle(model_path)
+    base = context_rows(data_path, target=bundle.target, feature_cols=bundle.feature_cols)
+    if base.empty:
+        raise RuntimeError("No context rows available; the store needs at least ~14 days per campaign.")
+    return ServingState(
+        bundle=bundle,
+        base=base,
+        X=bundle.model_input(base),
+        campaigns=base["campaign"].astype(str).to_numpy(),
+        residuals=load_residuals(residuals_path) if residuals_path else None,
+        model_version=model_version(model_path),
+        context_date=str(pd.Timestamp(base["date"].max()).date()),
+        key=key,
+    )
+
+
+def _parse_scenarios(payload) -> dict:
+    scenarios = payload.get("scenarios", {}) if isinstance(payload, dict) else None
+    if not isinstance(scenarios, dict):
+        raise ValueError("'scenarios' must be an object of {name: {column: multiplier}}.")
+    for name, changes in scenarios.items():
+        # bool is an int subclass; true/false are not multipliers
+        if not isinstance(changes, dict) or not all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in changes.values()
+        ):
+            raise ValueError(f"Scenario '{name}' must map column names to numeric multipliers.")
+    return scenarios
+
+
+def _parse_coverage(coverage) -> Optional[float]:
+    if coverage is None:
+        return None
+    if isinstance(coverage, bool):
+        raise ValueError("coverage must be a number in (0, 1)")
+    try:
+        coverage = float(coverage)
+    except (TypeError, ValueError):
+        raise ValueError("coverage must be a number in (0, 1)") from None
+    if not 0 < coverage < 1:
+        raise ValueError("coverage must be in (0, 1)")
+    return coverage
+
+
+class ForecastService:
+    """
+    Keeps the bundle and latest context rows resident and answers scenario
+    requests. Requests that arrive within `window_ms` of each other (up to
+    `max_batch`) are stacked into one multiplier matrix and scored with a
+    single predict pass; while a batch is predicting, new requests queue up
+    and form the next batch.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        data_path: str,
+        residuals_path: Optional[str] = None,
+        window_ms: float = 5.0,
+        max_batch: int = 64,
+        max_rows: int = 1 << 18,
+        reload_interval: float = 2.0,
+    ):
+        self.model_path = model_path
+        self.data_path = data_path
+        self.residuals_path = residuals_path
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_rows = max_rows
+        self.reload_interval = reload_interval
+
+        self.state = load_state(model_path, data_path, residuals_path)
+        self.stats = {"requests": 0, "batches": 0, "predict_rows": 0, "max_batch_seen": 0, "reloads": 0, "errors": 0}
+        self._queue = None
+
+    # --- batching -------------------------------------------------------
+
+    async def submit(self, scenarios: dict, deltas: bool = False, coverage: Optional[float] = None) -> bytes:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((scenarios, deltas, coverage, future))
+        return await future
+
+    async def _batch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Pin the state for the whole batch; a concurrent reload only affects later batches
+            state = self.state
+            try:
+                results = await asyncio.to_thread(self._run_batch, state, [item[:3] for item in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+
+            self.stats["batches"] += 1
+            self.stats["requests"] += len(batch)
+            self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+            for (_, _, _, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _run_batch(self, state: ServingState, requests: list) -> list:
+        """Score every valid request of a batch in one stacked predict; returns JSON bytes or exceptions."""
+        mats, results = [], [None] * len(requests)
+        for i, (scenarios, _, _) in enumerate(requests):
+            try:
+                mats.append((i, scenario_matrix(state.bundle, state.base, scenarios)))
+            except ValueError as e:
+                results[i] = e
+        if not mats:
+            return results
+
+        stacked = np.vstack([m for _, m in mats])
+        preds = _predict_multipliers(state.bundle, state.X, stacked, self.max_rows)
+        self.stats["predict_rows"] += preds.size
+
+        offset = 0
+        for i, m in mats:
+            scenarios, deltas, coverage = requests[i]
+            part = preds[offset:offset + len(m)]
+            offset += len(m)
+            # A request that fails here must not fail the others coalesced into this batch
+            try:
+                half_width = None
+                if coverage is not None and state.residuals is not None:
+                    half_width = state.residuals.half_width(state.campaigns, coverage=coverage)
+                table = tidy_scenarios(["Baseline"] + list(scenarios), state.campaigns, part, deltas=deltas, half_width=half_width)
+                results[i] = (
+                    f'{{"model_version":"{state.model_version}","context_date":"{state.context_date}","rows":'.encode()
+                    + table.to_json(orient="records").encode()
+                    + b"}"
+                )
+            except Exception as e:
+                results[i] = e
+        return results
+
+    # --- reload ---------------------------------------------------------
+
+    async def reload(self, force: bool = False) -> bool:
+        """
+        Load new artifacts off-loop and swap them in as one object. A failed
+        load (e.g. a model file caught mid-write) keeps serving the old state.
+        """
+        try:
+            key = artifact_key(self.model_path, self.data_path, self.residuals_path)
+        except OSError:
+            return False
+        if not force and key == self.state.key:
+            return False
+        try:
+            new = await asyncio.to_thread(load_state, self.model_path, self.data_path, self.residuals_path)
+        except Exception as e:
+            print(f"Reload failed, still serving model {self.state.model_version}: {e}")
+            return False
+        self.state = new
+        self.stats["reloads"] += 1
+        print(f"Reloaded: model {new.model_version}, context date {new.context_date}")
+        return True
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.reload()
+
+    # --- HTTP -----------------------------------------------------------
+
+    def info(self) -> dict:
+        s = self.state
+        stats = dict(self.stats)
+        stats["mean_batch_size"] = stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+        return {
+            "status": "ok",
+            "target": s.bundle.target,
+            "model_version": s.model_version,
+            "context_date": s.context_date,
+            "campaigns": len(s.campaigns),
+            "intervals": s.residuals is not None,
+            "stats": stats,
+        }
+
+    async def route(self, method: str, path: str, body: bytes) -> tuple:
+        if path in ("/health", "/stats"):
+            return 200, json.dumps(self.info()).encode()
+        if path == "/forecast":
+            if method != "GET":
+                return 405, json.dumps({"error": "Use GET /forecast"}).encode()
+            return 200, await self.submit({}, coverage=0.9 if self.state.residuals is not None else None)
+        if path == "/scenarios":
+            if method != "POST":
+                return 405, json.dumps({"error": "Use POST /scenarios"}).encode()
+            payload = json.loads(body or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("Request body must be a JSON object.")
+            scenarios = _parse_scenarios(payload)
+            coverage = _parse_coverage(payload.get("coverage"))
+            return 200, await self.submit(scenarios, deltas=bool(payload.get("deltas", False)), coverage=coverage)
+        if path == "/reload":
+            if method != "POST":
+                return 405, json.dumps({"error": "Use POST /reload"}).encode()
+            reloaded = await self.reload(force=True)
+            return 200, json.dumps({"reloaded": reloaded, "model_version": self.state.model_version}).encode()
+        return 404, json.dumps({"error": f"Unknown path {path}"}).encode()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Minimal HTTP/1.1 with keep-alive; bodies are JSON with Content-Length."""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError
+                except ValueError:
+                    # The body can't be delimited, so the connection can't be reused
+                    error = json.dumps({"error": "Invalid Content-Length header."}).encode()
+                    await self._respond(writer, 400, error, keep_alive=False)
+                    break
+                try:
+                    body = await reader.readexactly(length)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                try:
+                    status, payload = await self.route(method, target.split("?", 1)[0], body)
+                except (ValueError, json.JSONDecodeError) as e:
+                    status, payload = 400, json.dumps({"error": str(e)}).encode()
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    status, payload = 500, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode()
+
+                keep_alive = version.strip() == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload: bytes, keep_alive: bool) -> None:
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+            + payload
+        )
+        await writer.drain()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765) -> None:
+        self._queue = asyncio.Queue()
+        server = await asyncio.start_server(self.handle, host, port)
+        tasks = [asyncio.create_task(self._batch_loop())]
+        if self.reload_interval > 0:
+            tasks.append(asyncio.create_task(self._watch()))
+        s = self.state
+        print(f"Serving {s.bundle.target} forecasts on http://{host}:{port} "
+              f"(model {s.model_version}, context {s.context_date}, {len(s.campaigns)} campaigns)")
+        t0 = time.perf_counter()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for t in tasks:
+                t.cancel()
+            print(f"Served {self.stats['requests']:,} requests in {self.stats['batches']:,} batches "
+                  f"over {time.perf_counter() - t0:.0f}s")
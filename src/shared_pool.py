@@ -0,0 +1,56 @@
+"""
+Process pools over memory-mapped shared arrays.
+
+The arrays are saved once as .npy files and every worker memory-maps
+them in its initializer, so tasks only carry small arguments (row bounds,
+column indices, params) and read the data through shared_array. OpenMP
+threads per worker are capped so the pool doesn't oversubscribe cores.
+With one worker the tasks run in-process on the arrays themselves.
+"""
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+# name -> array visible to tasks (memory-mapped in pool processes)
+_ARRAYS = {}
+
+
+def shared_array(name: str) -> np.ndarray:
+    return _ARRAYS[name]
+
+
+def _init_worker(paths: dict, n_threads: int):
+    for name, path in paths.items():
+        _ARRAYS[name] = np.load(path, mmap_mode="r")
+    threadpool_limits(limits=n_threads)
+
+
+@contextmanager
+def shared_map(arrays: dict, workers: int = 1, prefix: str = "shared_"):
+    """
+    Yields run(fn, tasks) -> list of fn(task) in task order, with `arrays`
+    readable through shared_array inside fn. With workers > 1 the arrays
+    are written to a temp dir and `arrays` is emptied, so the caller's
+    in-memory copies can be freed while the pool runs.
+    """
+    if workers <= 1:
+        _ARRAYS.update(arrays)
+        try:
+            yield lambda fn, tasks: [fn(task) for task in tasks]
+        finally:
+            _ARRAYS.clear()
+        return
+
+    n_threads = max(1, (os.cpu_count() or 1) // workers)
+    with tempfile.TemporaryDirectory(prefix=prefix) as tmp:
+        paths = {}
+        for name, arr in arrays.items():
+            paths[name] = os.path.join(tmp, f"{name}.npy")
+            np.save(paths[name], arr)
+        arrays.clear()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(paths, n_threads)) as pool:
+            yield lambda fn, tasks: list(pool.map(fn, tasks))
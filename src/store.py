@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import shutil
+import zlib
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Legacy single-file layout and the date-partitioned dataset that replaces it
+DAILY_FILE = "data/processed/ads_daily.parquet"
+DAILY_DIR = "data/processed/ads_daily"
+
+META_FILE = "_store.json"
+PARTITION_SCHEMA = pa.schema([("date", pa.date32())])
+
+
+def default_daily_path() -> str:
+    """The partitioned store when it exists, otherwise the legacy single file."""
+    return DAILY_DIR if os.path.isdir(DAILY_DIR) else DAILY_FILE
+
+
+def is_partitioned(path: str) -> bool:
+    return os.path.isdir(path)
+
+
+def campaign_bucket(campaigns, n_buckets: int) -> np.ndarray:
+    """Stable campaign -> bucket assignment (crc32, independent of process hash seed)."""
+    return np.array([zlib.crc32(str(c).encode()) % n_buckets for c in campaigns], dtype=np.int64)
+
+
+def _read_meta(root: str) -> dict:
+    path = os.path.join(root, META_FILE)
+    if not os.path.exists(path):
+        return {"buckets": None}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _data_files(path: str) -> list:
+    if not is_partitioned(path):
+        return [path]
+    files = []
+    for dirpath, dirs, names in os.walk(path):
+        # Skip staged and swapped-out partitions, as the dataset scan does
+        dirs[:] = [d for d in dirs if not d.startswith((".", "_"))]
+        files += [os.path.join(dirpath, n) for n in names if n.endswith(".parquet")]
+    return sorted(files)
+
+
+def path_version(path: str) -> tuple:
+    """Cheap change detector for a store (file or partition directory)."""
+    stats = [os.stat(f) for f in _data_files(path)]
+    return (len(stats), max((s.st_mtime_ns for s in stats), default=0), sum(s.st_size for s in stats))
+
+
+def path_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """Content hash of a store; partition files are hashed with their relative paths."""
+    h = hashlib.sha256()
+    for f in _data_files(path):
+        if is_partitioned(path):
+            h.update(os.path.relpath(f, path).encode())
+        with open(f, "rb") as fh:
+            for chunk in iter(lambda: fh.read(chunk_size), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def write_partitions(
+    df: pd.DataFrame,
+    root: str = DAILY_DIR,
+    buckets: int = None,
+    part_name: str = "part-0",
+    replace: bool = True,
+) -> list:
+    """
+    Write each date of `df` as its own partition (root/date=YYYY-MM-DD/...),
+    optionally split into campaign buckets. Only the dates present in `df`
+    are touched: re-ingesting a day replaces that partition, and older
+    history is never rewritten. Returns the partition directories written.
+
+    With replace=False the rows are added to existing partitions as new
+    `part_name` files instead; bulk loads use this to write history one
+    batch of campaigns at a time (each batch must bring new campaigns).
+    """
+    meta = _read_meta(root)
+    if meta["buckets"] is not None and buckets is not None and meta["buckets"] != buckets:
+        raise ValueError(f"Store at {root} uses {meta['buckets']} campaign buckets, not {buckets}.")
+    buckets = meta["buckets"] if meta["buckets"] is not None else buckets
+
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, META_FILE), "w") as f:
+        json.dump({"buckets": buckets, "columns": list(df.columns)}, f)
+
+    dates = pd.to_datetime(df["date"])
+    written = []
+    for day, part in df.drop(columns="date").groupby(dates.dt.date, sort=True):
+        part_dir = os.path.join(root, f"date={day.isoformat()}")
+        # Staged under a dot-prefixed name, which dataset scans skip
+        out_dir = os.path.join(root, f".date={day.isoformat()}.tmp") if replace else part_dir
+        if replace:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+        if buckets:
+            b = campaign_bucket(part["campaign"].to_numpy(), buckets)
+            for k in np.unique(b):
+                sub = os.path.join(out_dir, f"bucket={k}")
+                os.makedirs(sub, exist_ok=True)
+                _write_file(part[b == k], os.path.join(sub, f"{part_name}.parquet"))
+        else:
+            os.makedirs(out_dir, exist_ok=True)
+            _write_file(part, os.path.join(out_dir, f"{part_name}.parquet"))
+
+        if replace:
+            # Swap the finished partition in: the old one is moved aside and
+            # only deleted once the new one is in place
+            old_dir = os.path.join(root, f".date={day.isoformat()}.old")
+            shutil.rmtree(old_dir, ignore_errors=True)
+            if os.path.exists(part_dir):
+                os.replace(part_dir, old_dir)
+            os.replace(out_dir, part_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        written.append(part_dir)
+    return written
+
+
+def _write_file(df: pd.DataFrame, path: str) -> None:
+    # Dot-prefixed while being written, so dataset scans skip it
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp)
+    os.replace(tmp, path)
+
+
+def stored_dates(path: str) -> pd.DatetimeIndex:
+    """Dates available in the store (partition names only for the partitioned layout)."""
+    if is_partitioned(path):
+        days = [n.split("=", 1)[1] for n in os.listdir(path) if n.startswith("date=")]
+        return pd.DatetimeIndex(sorted(pd.to_datetime(days)))
+    dates = pq.read_table(path, columns=["date"]).column("date").to_pandas()
+    return pd.DatetimeIndex(sorted(pd.to_datetime(dates).unique()))
+
+
+def store_columns(path: str) -> list:
+    """Column names of the store without reading any rows."""
+    if is_partitioned(path):
+        return _read_meta(path).get("columns") or []
+    return pq.read_schema(path).names
+
+
+def _dataset(path: str) -> ds.Dataset:
+    """Arrow dataset over the store, with date (and bucket) partition fields for the partitioned layout."""
+    if not is_partitioned(path):
+        return ds.dataset(path, format="parquet")
+    schema = PARTITION_SCHEMA
+    if _read_meta(path)["buckets"]:
+        schema = schema.append(pa.field("bucket", pa.int64()))
+    return ds.dataset(
+        path,
+        format="parquet",
+        partitioning=ds.partitioning(schema, flavor="hive"),
+        ignore_prefixes=[".", "_"],
+    )
+
+
+def campaign_batches(path: str, max_rows: int) -> list:
+    """
+    The store's campaigns grouped into batches of about `max_rows` daily
+    rows; a campaign is never split, so each batch holds complete
+    histories. Only the campaign column is scanned. In a bucketed store
+    campaigns are ordered by bucket, so a batch reads few bucket partitions.
+    """
+    # File by file: a dataset scan over thousands of small partition files holds far more memory
+    counts = {}
+    for f in _data_files(path):
+        for batch in pq.ParquetFile(f).iter_batches(columns=["campaign"]):
+            vc = pc.value_counts(batch.column(0))
+            for name, n in zip(vc.field("values").to_pylist(), vc.field("counts").to_pylist()):
+                counts[name] = counts.get(name, 0) + n
+
+    names = sorted(counts)
+    buckets = _read_meta(path)["buckets"] if is_partitioned(path) else None
+    if buckets:
+        order = np.lexsort((np.arange(len(names)), campaign_bucket(names, buckets)))
+        names = [names[i] for i in order]
+
+    batches, current, rows = [], [], 0
+    for name in names:
+        if current and rows + counts[name] > max_rows:
+            batches.append(current)
+            current, rows = [], 0
+        current.append(name)
+        rows += counts[name]
+    if current:
+        batches.append(current)
+    return batches
+
+
+def read_daily(path: str, start=None, end=None, campaigns=None) -> pd.DataFrame:
+    """
+    Read ads_daily rows, pushing date (inclusive bounds) and campaign
+    filters down to the Parquet scan so only matching partitions / row
+    groups are read. Works for the partitioned store and the legacy file.
+    """
+    filt = None
+
+    def _and(expr):
+        nonlocal filt
+        filt = expr if filt is None else filt & expr
+
+    dataset = _dataset(path)
+    if is_partitioned(path):
+        meta = _read_meta(path)
+        if start is not None:
+            _and(ds.field("date") >= pd.Timestamp(start).date())
+        if end is not None:
+            _and(ds.field("date") <= pd.Timestamp(end).date())
+        if campaigns is not None:
+            campaigns = [str(c) for c in campaigns]
+            _and(ds.field("campaign").isin(campaigns))
+            if meta["buckets"]:
+                buckets = sorted(set(campaign_bucket(campaigns, meta["buckets"]).tolist()))
+                _and(ds.field("bucket").isin(buckets))
+        table = dataset.to_table(filter=filt)
+        columns = meta.get("columns")
+    else:
+        ts_type = dataset.schema.field("date").type
+        if start is not None:
+            _and(ds.field("date") >= pa.scalar(pd.Timestamp(start), type=ts_type))
+        if end is not None:
+            _and(ds.field("date") <= pa.scalar(pd.Timestamp(end), type=ts_type))
+        if campaigns is not None:
+            _and(ds.field("campaign").isin([str(c) for c in campaigns]))
+        table = dataset.to_table(filter=filt)
+        columns = None
+
+    out = table.to_pandas()
+    out["date"] = pd.to_datetime(out["date"]).astype("datetime64[ns]")
+    if columns:
+        out = out[columns]
+    return out.sort_values(["date", "campaign"], kind="stable").reset_index(drop=True)
+
+
+def read_recent(path: str, days: int) -> pd.DataFrame:
+    """Rows from the last `days` calendar days of the store."""
+    dates = stored_dates(path)
+    if len(dates) == 0:
+        return read_daily(path)
+    return read_daily(path, start=dates.max() - pd.Timedelta(days=days - 1))
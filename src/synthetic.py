@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+
+def synthetic_daily(
+    n_campaigns: int,
+    n_days: int,
+    seed: int = 0,
+    start: str = "2024-01-01",
+    weekly_amp: float = 0.2,
+    yearly_amp: float = 0.1,
+    trend: float = 0.0,
+    noise: float = 0.3,
+) -> pd.DataFrame:
+    """
+    Seeded ads_daily-schema frame (date-major order, like build_dataset writes).
+
+    Each campaign gets its own scale, CTR, CPC and CVR levels and a weekly
+    phase. Daily impressions follow
+      scale * (1 + weekly_amp * sin(weekly)) * (1 + yearly_amp * sin(yearly)) * (1 + trend)^(t / 365)
+    with lognormal noise of sigma `noise`. Clicks and conversions are
+    binomial draws from the noisy rates, so all ratios stay consistent.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=n_days, freq="D")
+    t = np.arange(n_days, dtype=np.float64)[:, None]
+
+    scale = rng.lognormal(mean=11.0, sigma=1.2, size=n_campaigns)[None, :]
+    base_ctr = rng.uniform(0.003, 0.03, size=n_campaigns)[None, :]
+    base_cpc = rng.uniform(0.02, 0.2, size=n_campaigns)[None, :]
+    base_cvr = rng.uniform(0.05, 0.3, size=n_campaigns)[None, :]
+    phase = rng.uniform(0, 2 * np.pi, size=n_campaigns)[None, :]
+
+    season = (1 + weekly_amp * np.sin(2 * np.pi * t / 7 + phase)) * (1 + yearly_amp * np.sin(2 * np.pi * t / 365.25))
+    level = scale * season * (1 + trend) ** (t / 365.0)
+    shape = (n_days, n_campaigns)
+
+    impressions = rng.poisson(level * rng.lognormal(-noise ** 2 / 2, noise, size=shape)).ravel()
+    ctr = np.clip(base_ctr * rng.lognormal(0, noise / 2, size=shape), 0, 1).ravel()
+    clicks = rng.binomial(impressions, ctr)
+    cost = clicks * (base_cpc * rng.lognormal(0, noise / 2, size=shape)).ravel()
+    cvr = np.clip(base_cvr * rng.lognormal(0, noise / 2, size=shape), 0, 1).ravel()
+    conversions = rng.binomial(clicks, cvr)
+
+    out = pd.DataFrame({
+        "date": np.repeat(dates.values, n_campaigns),
+        "campaign": np.tile(np.array([f"camp {i + 1}" for i in range(n_campaigns)], dtype=object), n_days),
+        "impressions": impressions,
+        "clicks": clicks,
+        "cost": cost,
+        "conversions": conversions,
+    })
+    out["ctr"] = out["clicks"] / out["impressions"].replace(0, 1)
+    out["cpc"] = out["cost"] / out["clicks"].replace(0, 1)
+    out["cvr"] = out["conversions"] / out["clicks"].replace(0, 1)
+    return out